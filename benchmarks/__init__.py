@@ -0,0 +1,5 @@
+"""
+Benchmarks for the logcat and ndk-stack parsers
+
+Run ``python -m benchmarks.run_benchmarks --help`` from the repository root.
+"""
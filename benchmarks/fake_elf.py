@@ -0,0 +1,85 @@
+import struct
+from typing import List, Tuple
+
+# ELF 常量（只写出 AArch64 共享库需要的部分）
+_ET_DYN = 3
+_EM_AARCH64 = 183
+_SHT_PROGBITS = 1
+_SHT_SYMTAB = 2
+_SHT_STRTAB = 3
+_SHT_NOTE = 7
+_SHT_NOBITS = 8
+_SHF_ALLOC = 0x2
+_SHF_EXECINSTR = 0x4
+_STB_GLOBAL = 1
+_STT_FUNC = 2
+_NT_GNU_BUILD_ID = 3
+
+_EHDR = struct.Struct('<16sHHIQQQIHHHHHH')
+_SHDR = struct.Struct('<IIQQQQIIQQ')
+_SYM = struct.Struct('<IBBHQQ')
+
+
+def _strtab(names: List[str]) -> Tuple[bytes, List[int]]:
+    """Build a string table, returning it and the offset of each name"""
+    data = bytearray(b'\0')
+    offsets = []
+    for name in names:
+        offsets.append(len(data))
+        data += name.encode() + b'\0'
+    return bytes(data), offsets
+
+
+def write_elf(path: str, functions: List[Tuple[str, int, int]], build_id: bytes):
+    """Write a minimal 64-bit AArch64 shared object holding only symbols
+
+    functions is a list of (name, address, size). The file has a GNU
+    build-id note, a .symtab and no code: .text is SHT_NOBITS, so the file
+    stays small however large the address range is.
+    """
+    text_start = min(addr for _, addr, _ in functions)
+    text_end = max(addr + size for _, addr, size in functions)
+
+    symstr, name_offsets = _strtab([name for name, _, _ in functions])
+    symtab = bytearray(_SYM.size)  # 第 0 项为空符号
+    for (_, addr, size), name_offset in zip(functions, name_offsets):
+        symtab += _SYM.pack(name_offset, (_STB_GLOBAL << 4) | _STT_FUNC, 0, 1, addr, size)
+
+    note = struct.pack('<III', 4, len(build_id), _NT_GNU_BUILD_ID) + b'GNU\0' + build_id
+    note += b'\0' * (-len(note) % 4)
+
+    section_names = ['.text', '.note.gnu.build-id', '.symtab', '.strtab', '.shstrtab']
+    shstr, sh_name = _strtab(section_names)
+
+    # 文件布局：ELF 头、note、symtab、strtab、shstrtab、节头表
+    body = bytearray()
+    offset = _EHDR.size
+    note_off = offset + len(body)
+    body += note
+    body += b'\0' * (-(offset + len(body)) % 8)
+    symtab_off = offset + len(body)
+    body += symtab
+    symstr_off = offset + len(body)
+    body += symstr
+    shstr_off = offset + len(body)
+    body += shstr
+    body += b'\0' * (-(offset + len(body)) % 8)
+    shoff = offset + len(body)
+
+    headers = [
+        _SHDR.pack(0, 0, 0, 0, 0, 0, 0, 0, 0, 0),
+        _SHDR.pack(sh_name[0], _SHT_NOBITS, _SHF_ALLOC | _SHF_EXECINSTR, text_start, shoff,
+                   text_end - text_start, 0, 0, 16, 0),
+        _SHDR.pack(sh_name[1], _SHT_NOTE, _SHF_ALLOC, 0, note_off, len(note), 0, 0, 4, 0),
+        # sh_link 指向 .strtab，sh_info 为第一个非局部符号的下标
+        _SHDR.pack(sh_name[2], _SHT_SYMTAB, 0, 0, symtab_off, len(symtab), 4, 1, 8, _SYM.size),
+        _SHDR.pack(sh_name[3], _SHT_STRTAB, 0, 0, symstr_off, len(symstr), 0, 0, 1, 0),
+        _SHDR.pack(sh_name[4], _SHT_STRTAB, 0, 0, shstr_off, len(shstr), 0, 0, 1, 0),
+    ]
+    ident = b'\x7fELF' + bytes([2, 1, 1]) + b'\0' * 9
+    header = _EHDR.pack(ident, _ET_DYN, _EM_AARCH64, 1, text_start, 0, shoff, 0,
+                        _EHDR.size, 0, 0, _SHDR.size, len(headers), len(headers) - 1)
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(body)
+        f.write(b''.join(headers))
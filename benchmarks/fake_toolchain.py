@@ -0,0 +1,166 @@
+import os
+import re
+import sys
+import stat
+import argparse
+from typing import List, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from src.elf_symbols import ElfSymbolTable, ElfError, read_build_id
+
+# 工具脚本只是一个启动器，真正的实现在本模块中
+_LAUNCHER = '''#!{python}
+import sys
+sys.path.insert(0, {root!r})
+from benchmarks.fake_toolchain import {entry}
+sys.exit({entry}(sys.argv[1:]))
+'''
+
+_FRAME_PATTERN = re.compile(
+    r'#(?P<num>\d+)\s+pc\s+(?P<addr>[0-9a-f]+)\s+(?P<lib_path>\S+)(?:.*?\(BuildId:\s+(?P<build_id>[0-9a-f]+)\))?'
+)
+
+
+def host_tag() -> str:
+    """Prebuilt directory name the parsers look for on this host"""
+    return 'darwin-x86_64' if sys.platform == 'darwin' else 'linux-x86_64'
+
+
+def _write_tool(path: str, entry: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(_LAUNCHER.format(python=sys.executable, root=REPO_ROOT, entry=entry))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def create_fake_ndk(ndk_dir: str) -> str:
+    """Lay out an NDK directory with stand-in ndk-stack, llvm-addr2line and llvm-readelf
+
+    The tools answer from the ELF symbol tables of the symbol files, with
+    made-up but deterministic file:line information.
+    """
+    bin_dir = os.path.join(ndk_dir, 'toolchains', 'llvm', 'prebuilt', host_tag(), 'bin')
+    _write_tool(os.path.join(ndk_dir, 'ndk-stack'), 'ndk_stack_main')
+    _write_tool(os.path.join(bin_dir, 'llvm-addr2line'), 'addr2line_main')
+    _write_tool(os.path.join(bin_dir, 'llvm-readelf'), 'readelf_main')
+    _write_tool(os.path.join(bin_dir, 'readelf'), 'readelf_main')
+    return ndk_dir
+
+
+def _describe(table: Optional[ElfSymbolTable], addr: int) -> Optional[Tuple[str, str]]:
+    """Return (function, file:line) for addr, or None"""
+    if table is None:
+        return None
+    i = table.find(addr)
+    if i < 0:
+        return None
+    base = os.path.splitext(os.path.basename(table.path))[0]
+    line = 10 + (i * 7) % 900 + (addr - table.addrs[i]) // 4
+    return table.name(i), f'jni/{base}/file{i % 32}.cpp:{line}'
+
+
+def _load_table(path: str) -> Optional[ElfSymbolTable]:
+    try:
+        return ElfSymbolTable(path)
+    except (OSError, ElfError):
+        return None
+
+
+def addr2line_main(argv: List[str]) -> int:
+    """llvm-addr2line -e <lib> [-f] [-C] [-p] [addr...]; reads addresses from stdin if none are given"""
+    parser = argparse.ArgumentParser(prog='llvm-addr2line')
+    parser.add_argument('-e', '--exe', '--obj', dest='exe', required=True)
+    for flag in ('-f', '-C', '-p', '-i', '-a'):
+        parser.add_argument(flag, action='store_true')
+    parser.add_argument('addrs', nargs='*')
+    args = parser.parse_args(argv)
+    table = _load_table(args.exe)
+
+    def answer(addr: str):
+        found = _describe(table, int(addr, 16))
+        func, location = found if found else ('??', '??:0')
+        if args.p:
+            sys.stdout.write(f'{func} at {location}\n' if args.f else f'{location}\n')
+        else:
+            sys.stdout.write(f'{func}\n{location}\n' if args.f else f'{location}\n')
+        # 与真实的 llvm-addr2line 一样，从 stdin 读取时每个地址都立即刷新输出
+        sys.stdout.flush()
+
+    if args.addrs:
+        for addr in args.addrs:
+            answer(addr)
+    else:
+        for line in sys.stdin:
+            if line.strip():
+                answer(line.strip())
+    return 0
+
+
+def readelf_main(argv: List[str]) -> int:
+    """readelf -n | -s <file>: prints the build ID note or the function symbols"""
+    parser = argparse.ArgumentParser(prog='readelf')
+    parser.add_argument('-n', '--notes', action='store_true')
+    parser.add_argument('-s', '--syms', '--symbols', '--dyn-syms', dest='syms', action='store_true')
+    parser.add_argument('-W', '--wide', action='store_true')
+    parser.add_argument('file')
+    args = parser.parse_args(argv)
+    try:
+        if args.notes:
+            build_id = read_build_id(args.file)
+            if build_id:
+                print("Displaying notes found in: .note.gnu.build-id")
+                print("  Owner                Data size \tDescription")
+                print(f"  GNU                  0x{len(build_id) // 2:08x}\tNT_GNU_BUILD_ID (unique build ID bitstring)")
+                print(f"    Build ID: {build_id}")
+        if args.syms:
+            table = ElfSymbolTable(args.file)
+            print(f"Symbol table '.symtab' contains {len(table)} entries:")
+            print("   Num:    Value          Size Type    Bind   Vis      Ndx Name")
+            for i in range(len(table)):
+                print(f"{i:6d}: {table.addrs[i]:016x} {table.sizes[i]:5d} FUNC    GLOBAL DEFAULT    1 {table._names[i]}")
+    except (OSError, ElfError) as e:
+        print(f"readelf: Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def ndk_stack_main(argv: List[str]) -> int:
+    """ndk-stack -sym <dir> -dump <file>: symbolicates a tombstone like the NDK's ndk-stack"""
+    parser = argparse.ArgumentParser(prog='ndk-stack')
+    parser.add_argument('-sym', '--sym', dest='sym', required=True)
+    parser.add_argument('-dump', '-i', '--dump', dest='dump')
+    args = parser.parse_args(argv)
+
+    tables = {}
+    lines = open(args.dump, errors='replace') if args.dump else sys.stdin
+    in_crash = False
+    with lines:
+        for line in lines:
+            line = line.rstrip('\n')
+            if line.startswith('*** *** ***'):
+                in_crash = True
+                print('********** Crash dump: **********')
+                continue
+            if not in_crash:
+                continue
+            match = _FRAME_PATTERN.search(line)
+            if not match:
+                if line.startswith(('Build fingerprint:', 'Abort message:', 'pid:', 'signal ')):
+                    print(line)
+                continue
+            lib_path = match.group('lib_path')
+            suffix = f" (BuildId: {match.group('build_id')})" if match.group('build_id') else ''
+            print(f"#{match.group('num')} 0x{match.group('addr')} {lib_path}{suffix}")
+            lib_name = os.path.basename(lib_path)
+            if lib_name not in tables:
+                sym_path = os.path.join(args.sym, 'arm64-v8a', lib_name)
+                tables[lib_name] = _load_table(sym_path) if os.path.exists(sym_path) else None
+            found = _describe(tables[lib_name], int(match.group('addr'), 16))
+            if found:
+                print(f"{'':40}{found[0]}")
+                print(f"{'':40}{found[1]}:0")
+    print('Crash dump is completed')
+    return 0
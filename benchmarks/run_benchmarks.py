@@ -0,0 +1,330 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from typing import List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# 当作为脚本运行时，添加仓库根目录到 Python 路径
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.fake_toolchain import create_fake_ndk
+from benchmarks.synth_logcat import LogcatOptions, generate_symbols, generate_logcat, generate_dumps
+from src.config import Config
+from src.ndk_logcat_parser import LogcatParser
+from src.ndk_stack_parser import NDKStackParser
+
+SCHEMA_VERSION = 1
+
+SCENARIOS = {
+    'logcat_scan': 'LogcatParser, no symbols: scanning only',
+    'logcat_addr2line': 'LogcatParser with llvm-addr2line, cold cache',
+    'logcat_function_only': 'LogcatParser --no-line-info: in-process ELF symbol lookup',
+    'logcat_disk_cache': 'LogcatParser with llvm-addr2line, results served from the persistent cache',
+    'ndk_stack': 'NDKStackParser.parse_dump_files over the synthetic dumps',
+    'ndk_stack_native': 'NDKStackParser native engine over the synthetic dumps, cold cache',
+}
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process"""
+    if os.path.exists('/proc/self/status'):
+        # Linux 上 ru_maxrss 会跨 exec 继承父进程的峰值，改读本进程的 VmHWM
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def prepare_workload(work_dir: str, params: dict) -> dict:
+    """Generate symbols, a fake NDK, a logcat and dumps, reusing them if params are unchanged"""
+    manifest_path = os.path.join(work_dir, 'workload.json')
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('digest') == digest and os.path.exists(manifest['logcat']):
+            logging.info(f"Reusing workload in {work_dir}")
+            return manifest
+
+    logging.info(f"Generating workload in {work_dir}")
+    symbols_dir = os.path.join(work_dir, 'symbols')
+    shutil.rmtree(symbols_dir, ignore_errors=True)
+    libraries = generate_symbols(symbols_dir, params['libraries'], params['functions'], seed=params['seed'])
+    logcat = os.path.join(work_dir, 'synthetic.log')
+    logcat_stats = generate_logcat(logcat, libraries, LogcatOptions(
+        lines=params['lines'], crash_density=params['crash_density'], frames=params['frames'],
+        processes=params['processes'], seed=params['seed']))
+    dump_dir = os.path.join(work_dir, 'dumps')
+    shutil.rmtree(dump_dir, ignore_errors=True)
+    dump_stats = generate_dumps(dump_dir, libraries, params['dumps'], params['frames'], seed=params['seed'])
+
+    manifest = {
+        'digest': digest,
+        'params': params,
+        'symbols_dir': symbols_dir,
+        'ndk_path': create_fake_ndk(os.path.join(work_dir, 'ndk')),
+        'logcat': logcat,
+        'logcat_stats': logcat_stats.to_dict(),
+        'dumps': dump_stats.paths,
+        'dump_stats': dump_stats.to_dict(),
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _parse_logcat(manifest: dict, symbols: bool, **kwargs) -> dict:
+    crashes = frames = symbolicated = 0
+    with LogcatParser(
+        symbols_dir=manifest['symbols_dir'] if symbols else None,
+        ndk_path=manifest['ndk_path'] if symbols else None,
+        **kwargs
+    ) as parser:
+        for crash_info in parser.iter_logcat_file(manifest['logcat']):
+            crashes += 1
+            frames += len(crash_info.frames)
+            symbolicated += sum(1 for frame in crash_info.frames if frame.resolved)
+    return {'crashes': crashes, 'frames': frames, 'symbolicated_frames': symbolicated}
+
+
+def run_scenario(name: str, manifest: dict, work_dir: str) -> dict:
+    """Run one scenario in this process and return its counters and duration"""
+    cache_dir = os.path.join(work_dir, f'cache-{os.getpid()}')
+    lines = manifest['logcat_stats']['lines']
+    try:
+        if name == 'logcat_disk_cache':
+            # 先完整运行一次填充磁盘缓存，计时的是换用新解析器（内存缓存为空）后的第二次运行
+            _parse_logcat(manifest, True, cache_dir=cache_dir)
+        start = time.perf_counter()
+        if name == 'logcat_scan':
+            counters = _parse_logcat(manifest, False, persistent_cache=False)
+        elif name == 'logcat_addr2line':
+            counters = _parse_logcat(manifest, True, cache_dir=cache_dir, persistent_cache=False)
+        elif name == 'logcat_function_only':
+            counters = _parse_logcat(manifest, True, cache_dir=cache_dir, persistent_cache=False, line_info=False)
+        elif name == 'logcat_disk_cache':
+            counters = _parse_logcat(manifest, True, cache_dir=cache_dir)
+        elif name in ('ndk_stack', 'ndk_stack_native'):
+            config = Config(ndk_path=manifest['ndk_path'], symbols_dir=manifest['symbols_dir'])
+            engine = 'native' if name == 'ndk_stack_native' else 'ndk-stack'
+            stack_parser = NDKStackParser(config, engine=engine, cache_dir=cache_dir, persistent_cache=False)
+            try:
+                results = stack_parser.parse_dump_files(
+                    manifest['dumps'], output_dir=os.path.join(work_dir, f'{name}_out'), max_workers=4)
+            finally:
+                stack_parser.close()
+            ok = sum(1 for result in results if result.status == 'ok')
+            counters = {
+                'crashes': ok,
+                'frames': manifest['dump_stats']['frames'] if ok == len(results) else None,
+                'symbolicated_frames': manifest['dump_stats']['symbol_frames'] if ok == len(results) else None,
+            }
+            lines = manifest['dump_stats']['lines']
+        else:
+            raise ValueError(f"Unknown scenario: {name}")
+        duration = time.perf_counter() - start
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return {
+        'duration': duration,
+        'lines': lines,
+        **counters,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def _run_child(name: str, work_dir: str) -> dict:
+    """Run a scenario in a fresh interpreter so that peak RSS is its own"""
+    cmd = [sys.executable, '-m', 'benchmarks.run_benchmarks', '--child', name, '--work-dir', work_dir]
+    proc = subprocess.run(cmd, cwd=REPO_ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Scenario {name} failed:\n{proc.stderr.strip()}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _rate(count: Optional[int], duration: float) -> Optional[float]:
+    return round(count / duration, 1) if count and duration > 0 else None
+
+
+def summarize(name: str, runs: List[dict]) -> dict:
+    """Combine repeated runs: rates are computed from the fastest run"""
+    best = min(runs, key=lambda run: run['duration'])
+    duration = best['duration']
+    return {
+        'description': SCENARIOS[name],
+        'duration_s': round(duration, 4),
+        'median_duration_s': round(statistics.median(run['duration'] for run in runs), 4),
+        'runs': len(runs),
+        'lines': best['lines'],
+        'crashes': best['crashes'],
+        'frames': best['frames'],
+        'symbolicated_frames': best['symbolicated_frames'],
+        'lines_per_sec': _rate(best['lines'], duration),
+        'crashes_per_sec': _rate(best['crashes'], duration),
+        'frames_per_sec': _rate(best['symbolicated_frames'], duration),
+        'peak_rss_mb': max((run['peak_rss_mb'] or 0) for run in runs) or None,
+    }
+
+
+def _environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': commit,
+    }
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> List[str]:
+    """Print throughput relative to a baseline, returning the scenarios that regressed"""
+    if results['workload']['params'] != baseline.get('workload', {}).get('params'):
+        print('Warning: baseline was run with a different workload, only rates are comparable')
+    regressed = []
+    print(f"\n{'scenario':24} {'lines/s':>10} {'crashes/s':>10} {'frames/s':>10} {'peak RSS':>10}")
+    for name, current in results['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if not old:
+            continue
+        cells = []
+        for metric in ('lines_per_sec', 'crashes_per_sec', 'frames_per_sec', 'peak_rss_mb'):
+            if current.get(metric) and old.get(metric):
+                cells.append(f"{(current[metric] / old[metric] - 1) * 100:+9.1f}%")
+            else:
+                cells.append(f"{'-':>10}")
+        print(f"{name:24} {' '.join(cells)}")
+        if current['lines_per_sec'] and old.get('lines_per_sec') and \
+                current['lines_per_sec'] < old['lines_per_sec'] * (1 - max_regression):
+            regressed.append(name)
+    return regressed
+
+
+def print_results(results: dict):
+    print(f"\n{'scenario':24} {'time (s)':>9} {'lines/s':>12} {'crashes/s':>10} {'frames/s':>10} {'RSS (MB)':>9}")
+    for name, r in results['results'].items():
+        def cell(value, width, fmt='{:,.0f}'):
+            return f"{fmt.format(value) if value is not None else '-':>{width}}"
+        print(f"{name:24} {r['duration_s']:9.3f} {cell(r['lines_per_sec'], 12)} {cell(r['crashes_per_sec'], 10)} "
+              f"{cell(r['frames_per_sec'], 10)} {cell(r['peak_rss_mb'], 9, '{:.1f}')}")
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Benchmark LogcatParser and NDKStackParser on synthetic logs with a fake NDK toolchain.',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+        Examples:
+          %(prog)s -o before.json                                # Run all scenarios
+          %(prog)s --lines 200000 -s logcat_scan logcat_addr2line  # A quick run of two scenarios
+          %(prog)s -o after.json --compare before.json           # Compare against an earlier run
+        '''
+    )
+    parser.add_argument('-s', '--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS),
+                        help='Scenarios to run (default: all)')
+    parser.add_argument('--lines', type=int, default=1000000, help='Lines in the synthetic logcat (default: 1000000)')
+    parser.add_argument('--crash-density', type=float, default=1.0,
+                        help='Crashes per 10000 logcat lines (default: 1.0)')
+    parser.add_argument('--frames', type=int, default=24, help='Stack frames per crash (default: 24)')
+    parser.add_argument('--processes', type=int, default=16, help='Interleaved logging processes (default: 16)')
+    parser.add_argument('--libraries', type=int, default=4, help='Synthetic symbol files (default: 4)')
+    parser.add_argument('--functions', type=int, default=2000, help='Functions per symbol file (default: 2000)')
+    parser.add_argument('--dumps', type=int, default=32, help='Synthetic .dmp files for ndk-stack (default: 32)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the generator (default: 0)')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Runs per scenario, the fastest is reported (default: 3)')
+    parser.add_argument('--work-dir', metavar='DIR',
+                        help='Where to generate the workload; kept and reused across runs (default: a temporary directory)')
+    parser.add_argument('-o', '--output', metavar='FILE', help='Write the results as JSON to FILE')
+    parser.add_argument('--compare', metavar='FILE', help='Compare against the results JSON of an earlier run')
+    parser.add_argument('--max-regression', type=float, default=0.1, metavar='FRACTION',
+                        help='With --compare, exit with status 1 if lines/s drops by more than this (default: 0.1)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    """Main entry point"""
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING if args.child else logging.INFO, format='[%(levelname)s] %(message)s')
+
+    if args.child:
+        with open(os.path.join(args.work_dir, 'workload.json')) as f:
+            manifest = json.load(f)
+        print(json.dumps(run_scenario(args.child, manifest, args.work_dir)))
+        return
+
+    params = {
+        'lines': args.lines,
+        'crash_density': args.crash_density,
+        'frames': args.frames,
+        'processes': args.processes,
+        'libraries': args.libraries,
+        'functions': args.functions,
+        'dumps': args.dumps,
+        'seed': args.seed,
+    }
+    work_dir = os.path.abspath(args.work_dir) if args.work_dir else tempfile.mkdtemp(prefix='ndk-bench-')
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        manifest = prepare_workload(work_dir, params)
+        results = {
+            'schema': SCHEMA_VERSION,
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'environment': _environment(),
+            'workload': {
+                'params': params,
+                'logcat': manifest['logcat_stats'],
+                'dumps': manifest['dump_stats'],
+            },
+            'results': {},
+        }
+        for name in args.scenarios:
+            logging.info(f"Running {name} ({args.repeat} runs)")
+            runs = [_run_child(name, work_dir) for _ in range(max(1, args.repeat))]
+            results['results'][name] = summarize(name, runs)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        logging.info(f"Results written to: {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressed = compare(results, baseline, args.max_regression)
+        if regressed:
+            print(f"Regressed by more than {args.max_regression:.0%}: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
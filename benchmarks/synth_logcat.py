@@ -0,0 +1,234 @@
+import os
+import random
+import hashlib
+from dataclasses import dataclass, asdict, field
+from typing import List, Tuple
+
+from .fake_elf import write_elf
+
+ABI = 'arm64-v8a'
+
+# 没有符号文件的系统库帧，以及应跳过的匿名映射帧
+_SYSTEM_FRAMES = [
+    ('/apex/com.android.runtime/lib64/bionic/libc.so', ['abort', 'pthread_kill', '__pthread_start', '__start_thread']),
+    ('/apex/com.android.art/lib64/libart.so', ['art_quick_invoke_stub', 'art::ArtMethod::Invoke', 'art::Thread::CreateCallback']),
+    ('/system/lib64/libhwui.so', ['android::uirenderer::renderthread::RenderThread::threadLoop']),
+]
+_ANON_FRAME = '[anon:dalvik-jit-code-cache]'
+
+_SIGNALS = [
+    ('11', 'SIGSEGV', 'code 1 (SEGV_MAPERR), fault addr 0x0'),
+    ('6', 'SIGABRT', 'code -1 (SI_QUEUE)'),
+    ('7', 'SIGBUS', 'code 1 (BUS_ADRALN), fault addr 0x7a3c1f0001'),
+]
+
+_TAGS = ['ActivityManager', 'WindowManager', 'chatty', 'OpenGLRenderer', 'NetworkMonitor',
+         'SurfaceFlinger', 'AudioFlinger', 'InputDispatcher', 'Choreographer', 'okhttp']
+_MESSAGES = [
+    'Skipped {n} frames!  The application may be doing too much work on its main thread.',
+    'uid={n} com.example.app identical {n} lines',
+    'Davey! duration={n}ms; Flags=0, IntendedVsync={n}, Vsync={n}',
+    'onResume() called for activity #{n}',
+    'GC freed {n}(2MB) AllocSpace objects, 0(0B) LOS objects, 49% free, 4MB/8MB, paused 1.2ms',
+    'Background concurrent copying GC freed {n}, total 21.3ms',
+    'Connection #{n} to https://api.example.com failed, retrying',
+    'setRequestedFrameRate frameRate={n}.0 compatibility=0',
+]
+
+
+@dataclass
+class SyntheticLibrary:
+    """A generated symbol file: its name, build ID and (name, address, size) functions"""
+    name: str
+    build_id: str
+    functions: List[Tuple[str, int, int]]
+
+
+@dataclass
+class LogcatOptions:
+    """Shape of a synthetic logcat"""
+    lines: int = 1000000
+    crash_density: float = 1.0  # 每 10000 行的崩溃数
+    frames: int = 24  # 每个崩溃的栈帧数
+    processes: int = 16  # 同时输出日志的进程数
+    seed: int = 0
+
+
+@dataclass
+class WorkloadStats:
+    """What was generated, used to turn timings into rates"""
+    files: int = 0
+    lines: int = 0
+    bytes: int = 0
+    crashes: int = 0
+    frames: int = 0
+    symbol_frames: int = 0  # 有符号文件、可以被符号化的栈帧数
+    paths: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        result = asdict(self)
+        del result['paths']
+        return result
+
+
+def _mangle(namespace: str, cls: str, func: str) -> str:
+    return f'_ZN{len(namespace)}{namespace}{len(cls)}{cls}{len(func)}{func}Ev'
+
+
+def generate_symbols(symbols_dir: str, libraries: int = 4, functions: int = 2000,
+                     seed: int = 0) -> List[SyntheticLibrary]:
+    """Write libraries of function symbols to <symbols_dir>/arm64-v8a/"""
+    rng = random.Random(seed)
+    lib_dir = os.path.join(symbols_dir, ABI)
+    os.makedirs(lib_dir, exist_ok=True)
+    result = []
+    for i in range(libraries):
+        name = f'libsynth{i}.so'
+        addr = 0x10000
+        funcs = []
+        for j in range(functions):
+            # 一半是 C++ 符号（需要 demangle），一半是 C 符号
+            if j % 2:
+                func_name = _mangle('synth', f'Module{j % 37}', f'method{j}')
+            else:
+                func_name = f'synth{i}_func{j}'
+            size = rng.randrange(16, 1024, 4)
+            funcs.append((func_name, addr, size))
+            addr += size + rng.choice((0, 0, 0, 16, 64))
+        build_id = hashlib.sha1(f'{name}:{seed}'.encode()).digest()
+        write_elf(os.path.join(lib_dir, name), funcs, build_id)
+        result.append(SyntheticLibrary(name=name, build_id=build_id.hex(), functions=funcs))
+    return result
+
+
+class _FrameFactory:
+    """Random backtraces: mostly app frames, some system and JIT frames"""
+
+    def __init__(self, rng: random.Random, libraries: List[SyntheticLibrary], package: str):
+        self.rng = rng
+        self.libraries = libraries
+        self.package = package
+
+    def backtrace(self, count: int) -> Tuple[List[str], int]:
+        """Return frame lines (without logcat prefix) and how many of them have symbols"""
+        rng = self.rng
+        frames = []
+        symbol_frames = 0
+        for n in range(count):
+            kind = rng.random()
+            if kind < 0.7:
+                lib = rng.choice(self.libraries)
+                func_name, addr, size = rng.choice(lib.functions)
+                pc = addr + rng.randrange(0, size, 4)
+                frames.append(f'#{n:02d} pc {pc:016x}  /data/app/~~{self.package}/lib/arm64/{lib.name} '
+                              f'(BuildId: {lib.build_id})')
+                symbol_frames += 1
+            elif kind < 0.95:
+                lib_path, funcs = rng.choice(_SYSTEM_FRAMES)
+                pc = rng.randrange(0x10000, 0x400000, 4)
+                frames.append(f'#{n:02d} pc {pc:016x}  {lib_path} ({rng.choice(funcs)}+{rng.randrange(4, 400, 4)}) '
+                              f'(BuildId: {hashlib.md5(lib_path.encode()).hexdigest()})')
+            else:
+                frames.append(f'#{n:02d} pc {rng.randrange(0x1000, 0xfffff, 4):016x}  {_ANON_FRAME}')
+        return frames, symbol_frames
+
+
+def generate_logcat(path: str, libraries: List[SyntheticLibrary], options: LogcatOptions) -> WorkloadStats:
+    """Write a `logcat -v threadtime` style log with crashes from several interleaved processes
+
+    Lines of other processes are interleaved everywhere except inside a
+    backtrace, where the crash_dump output of a real device is contiguous.
+    """
+    rng = random.Random(options.seed)
+    stats = WorkloadStats(files=1, paths=[path])
+    processes = [(1000 + 37 * i, f'com.example.app{i}') for i in range(max(1, options.processes))]
+    crash_every = 10000 / options.crash_density if options.crash_density > 0 else None
+    next_crash = rng.expovariate(1 / crash_every) if crash_every else None
+    clock = 0  # 毫秒
+
+    with open(path, 'w') as f:
+        def emit(pid: int, tid: int, level: str, tag: str, message: str):
+            nonlocal clock
+            clock += rng.randrange(0, 20)
+            seconds, ms = divmod(clock, 1000)
+            minutes, seconds = divmod(seconds, 60)
+            hours, minutes = divmod(minutes, 60)
+            f.write(f'01-01 {hours % 24:02d}:{minutes:02d}:{seconds:02d}.{ms:03d} {pid:5d} {tid:5d} '
+                    f'{level} {tag:8}: {message}\n')
+            stats.lines += 1
+
+        def noise(count: int):
+            for _ in range(count):
+                pid, _ = rng.choice(processes)
+                emit(pid, pid + rng.randrange(0, 30), rng.choice('VDIIIWE'), rng.choice(_TAGS),
+                     rng.choice(_MESSAGES).format(n=rng.randrange(1, 100000)))
+
+        f.write('--------- beginning of main\n')
+        stats.lines += 1
+        emit(1000, 1000, 'I', 'ActivityManager', f'PROCESS STARTED ({processes[0][0]}) for package {processes[0][1]}')
+        while stats.lines < options.lines:
+            if next_crash is None or stats.lines < next_crash:
+                gap = 256 if next_crash is None else int(next_crash - stats.lines) + 1
+                noise(min(256, gap, options.lines - stats.lines))
+                continue
+
+            pid, package = rng.choice(processes)
+            tid = pid + rng.randrange(1, 30)
+            signo, signame, detail = rng.choice(_SIGNALS)
+            emit(pid, tid, 'F', 'libc', f'Fatal signal {signo} ({signame}), {detail} in tid {tid} (RenderThread), '
+                                       f'pid {pid} ({package})')
+            noise(rng.randrange(0, 3))
+            dump_pid = pid + 100
+            emit(dump_pid, dump_pid, 'F', 'DEBUG', '*** *** *** *** *** *** *** *** *** *** *** *** *** *** *** ***')
+            emit(dump_pid, dump_pid, 'F', 'DEBUG', "Build fingerprint: 'google/synth/synth:14/UQ1A/1:user/release-keys'")
+            emit(dump_pid, dump_pid, 'F', 'DEBUG', f'pid: {pid}, tid: {tid}, name: RenderThread  >>> {package} <<<')
+            emit(dump_pid, dump_pid, 'F', 'DEBUG', f'signal {signo} ({signame}), {detail}')
+            noise(rng.randrange(0, 2))
+            emit(dump_pid, dump_pid, 'F', 'DEBUG', 'backtrace:')
+            frames, symbol_frames = _FrameFactory(rng, libraries, package).backtrace(options.frames)
+            for frame in frames:
+                emit(dump_pid, dump_pid, 'F', 'DEBUG', f'      {frame}')
+            stats.crashes += 1
+            stats.frames += len(frames)
+            stats.symbol_frames += symbol_frames
+            noise(rng.randrange(1, 4))
+            emit(1000, 1000, 'I', 'ActivityManager', f'Process {package} (pid {pid}) has died: fg  TOP')
+            next_crash = stats.lines + rng.expovariate(1 / crash_every)
+    stats.bytes = os.path.getsize(path)
+    return stats
+
+
+def generate_dumps(dump_dir: str, libraries: List[SyntheticLibrary], count: int = 32,
+                   frames: int = 24, seed: int = 0) -> WorkloadStats:
+    """Write tombstone-style .dmp files for ndk-stack"""
+    rng = random.Random(seed)
+    os.makedirs(dump_dir, exist_ok=True)
+    stats = WorkloadStats()
+    for i in range(count):
+        pid = 2000 + i
+        package = f'com.example.app{i % 8}'
+        signo, signame, detail = rng.choice(_SIGNALS)
+        frame_lines, symbol_frames = _FrameFactory(rng, libraries, package).backtrace(frames)
+        lines = [
+            '*** *** *** *** *** *** *** *** *** *** *** *** *** *** *** ***',
+            "Build fingerprint: 'google/synth/synth:14/UQ1A/1:user/release-keys'",
+            "Revision: '0'",
+            "ABI: 'arm64'",
+            f'pid: {pid}, tid: {pid + 7}, name: RenderThread  >>> {package} <<<',
+            f'signal {signo} ({signame}), {detail}',
+            *(f'    x{r:<2} {rng.getrandbits(64):016x}  x{r + 1:<2} {rng.getrandbits(64):016x}' for r in range(0, 30, 2)),
+            '',
+            'backtrace:',
+            *(f'      {frame}' for frame in frame_lines),
+        ]
+        path = os.path.join(dump_dir, f'crash_{i:04d}.dmp')
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        stats.files += 1
+        stats.lines += len(lines)
+        stats.bytes += os.path.getsize(path)
+        stats.crashes += 1
+        stats.frames += len(frame_lines)
+        stats.symbol_frames += symbol_frames
+        stats.paths.append(path)
+    return stats
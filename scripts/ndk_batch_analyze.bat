@@ -0,0 +1,43 @@
+@echo off
+setlocal enabledelayedexpansion
+
+:: Analyze whole directories of crash files in parallel
+
+if "%~1"=="" goto :show_help
+if "%~1"=="-h" goto :show_help
+if "%~1"=="--help" goto :show_help
+
+:: Add parent directory to Python path to find the src module
+set "SCRIPT_DIR=%~dp0"
+for %%I in ("%SCRIPT_DIR%..") do set "PARENT_DIR=%%~fI"
+
+if not exist "%PARENT_DIR%\src" (
+    echo Error: Python module directory not found: %PARENT_DIR%\src
+    exit /b 1
+)
+
+if defined PYTHONPATH (
+    set "PYTHONPATH=%PARENT_DIR%;%PYTHONPATH%"
+) else (
+    set "PYTHONPATH=%PARENT_DIR%"
+)
+
+python "%PARENT_DIR%\src\batch_analyze.py" %*
+exit /b %errorlevel%
+
+:show_help
+echo Usage: %~nx0 [options] ^<dir^|file^|glob^>...
+echo.
+echo Analyze directories of Android native crash files (logcat or dmp) in parallel
+echo.
+echo Options:
+echo   -h, --help            Show this help message and exit
+echo   -s, --symbols ^<dir^>   Specify symbols directory
+echo   -n, --ndk ^<path^>      Specify Android NDK path
+echo   -o, --output ^<dir^>    Specify output directory
+echo   -j, --jobs ^<n^>        Number of worker processes (default: number of CPUs)
+echo   -v, --verbose         Enable verbose logging
+echo.
+echo Example:
+echo   %~nx0 -s C:\symbols -o C:\output -j 16 C:\crashes
+exit /b 0
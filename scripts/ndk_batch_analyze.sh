@@ -0,0 +1,79 @@
+#!/bin/bash
+
+# Analyze whole directories of crash files in parallel
+#
+# Logcat files and .dmp dumps under the given directories or glob patterns
+# are analyzed by a pool of worker processes sharing one symbol cache.
+
+# 设置日志函数
+VERBOSE=0
+
+log_info() {
+    echo "[INFO] $1"
+}
+
+log_error() {
+    echo "[ERROR] $1" >&2
+}
+
+log_debug() {
+    if [ "${VERBOSE:-0}" = "1" ]; then
+        echo "[DEBUG] $1"
+    fi
+}
+
+# 显示帮助信息的函数
+show_help() {
+    cat << EOF2
+Usage: ndk_batch_analyze.sh [options] <dir|file|glob>...
+
+Analyze directories of Android native crash files (logcat or dmp) in parallel
+
+Options:
+  -h, --help            Show this help message and exit
+  -s, --symbols <dir>   Specify symbols directory
+  -n, --ndk <path>      Specify Android NDK path
+  -o, --output <dir>    Specify output directory
+  -j, --jobs <n>        Number of worker processes (default: number of CPUs)
+  -v, --verbose         Enable verbose logging
+
+Environment Variables (if options not provided):
+  ANDROID_NDK_HOME    Android NDK installation path
+  SYMBOLS_DIR         Symbols directory path
+  OUTPUT_DIR          Output directory path
+
+Example:
+  ./ndk_batch_analyze.sh -s ~/symbols -o ~/output -j 16 ~/crashes
+EOF2
+}
+
+for arg in "$@"; do
+    case "$arg" in
+        -h|--help)
+            show_help
+            exit 0
+            ;;
+        -v|--verbose)
+            VERBOSE=1
+            export VERBOSE=1
+            ;;
+    esac
+done
+
+if [ "$#" -eq 0 ]; then
+    log_error "No input specified"
+    show_help
+    exit 1
+fi
+
+SCRIPT_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+PARENT_DIR="$( dirname "$SCRIPT_DIR" )"
+
+# Check if the module directory exists
+if [ ! -d "${PARENT_DIR}/src" ]; then
+    log_error "Python module directory not found: ${PARENT_DIR}/src"
+    exit 1
+fi
+
+log_debug "Executing batch analysis with arguments: $*"
+PYTHONPATH="${PARENT_DIR}${PYTHONPATH:+:${PYTHONPATH}}" python3 "${PARENT_DIR}/src/batch_analyze.py" "$@"
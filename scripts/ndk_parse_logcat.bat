@@ -198,8 +198,8 @@ shift
 goto :parse_path
 
 :run_script
-:: 直接调用 Python 脚本
-set "PYTHONPATH=%PARENT_DIR%" && python "%PARENT_DIR%\src\ndk_logcat_parser.py" %ARGS%
+:: 通过常驻符号化守护进程解析，未运行时自动在本进程解析（NDK_SYMBOL_DAEMON=off 强制本地解析）
+set "PYTHONPATH=%PARENT_DIR%" && python "%PARENT_DIR%\src\daemon_client.py" %ARGS%
 
 endlocal 
 
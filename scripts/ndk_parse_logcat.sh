@@ -116,7 +116,8 @@ if [ -z "$OUTPUT_DIR" ]; then
     mkdir -p "$OUTPUT_DIR"  # 创建输出目录
 fi
 
-# 直接调用 Python 脚本
+# 通过常驻符号化守护进程解析（python3 -m src.symbol_daemon），未运行时自动在本进程解析
+# 设置 NDK_SYMBOL_DAEMON=off 可强制本地解析
 log_debug "Executing Python script with arguments: ${ARGS[*]}"
 PYTHONPATH="${PARENT_DIR}" 
-python3 "${PARENT_DIR}/src/ndk_logcat_parser.py" "${ARGS[@]}" 
\ No newline at end of file
+python3 "${PARENT_DIR}/src/daemon_client.py" "${ARGS[@]}" 
\ No newline at end of file
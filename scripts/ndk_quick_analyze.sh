@@ -29,9 +29,10 @@ log_detail() {
 # 显示帮助信息的函数
 show_help() {
     cat << EOF
-Usage: ndk_quick_analyze.sh [options] <crash_file>
+Usage: ndk_quick_analyze.sh [options] <crash_file|crash_dir>
 
-Quickly analyze Android native crash files (logcat or dmp)
+Quickly analyze Android native crash files (logcat or dmp).
+A directory is analyzed in parallel with ndk_batch_analyze.sh.
 
 Options:
   -h, --help            Show this help message and exit
@@ -99,7 +100,24 @@ check_required_args() {
 
 # 解析文件并调用相应的解析脚本
 analyze_file() {
-    if [[ "$CRASH_FILE" == *.dmp ]]; then
+    if [ -d "$CRASH_FILE" ]; then
+        # 目录交给批量分析脚本，在一个 Python 进程池中处理所有文件
+        ARGS=()
+        if [ -n "$SYMBOLS_DIR" ]; then
+            ARGS+=("-s" "$SYMBOLS_DIR")
+        fi
+        if [ -n "$ANDROID_NDK_HOME" ]; then
+            ARGS+=("-n" "$ANDROID_NDK_HOME")
+        fi
+        if [ -n "$OUTPUT_DIR" ]; then
+            ARGS+=("-o" "$OUTPUT_DIR")
+        fi
+        if [ "$VERBOSE" = "1" ]; then
+            ARGS+=("-v")
+        fi
+        log_info "Processing directory: $CRASH_FILE"
+        "$SCRIPT_DIR/ndk_batch_analyze.sh" "${ARGS[@]}" "$CRASH_FILE"
+    elif [[ "$CRASH_FILE" == *.dmp ]]; then
         if [ -z "$SYMBOLS_DIR" ]; then
             handle_error "Symbols directory is required for DMP files"
         fi
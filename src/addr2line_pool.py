@@ -0,0 +1,412 @@
+import asyncio
+import subprocess
+import threading
+import time
+import logging
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
+
+from .stats import Stats
+from .scheduler import ToolSlots
+from .utils import file_signature
+
+
+class Addr2LineWorker:
+    """A long-running llvm-addr2line process bound to one symbol file"""
+
+    # 每次写入的地址数上限，避免管道缓冲区写满导致双方互相阻塞
+    CHUNK_SIZE = 128
+
+    def __init__(self, addr2line_path: str, lib_path: str, stats: Optional[Stats] = None,
+                 signature: Optional[Tuple[int, int]] = None):
+        self.addr2line_path = addr2line_path
+        self.lib_path = lib_path
+        self.signature = signature  # 启动时符号文件的 (大小, mtime)
+        self.stats = stats or Stats(enabled=False)
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        self.retired = False
+        self._proc: Optional[subprocess.Popen] = None
+
+    def _start(self):
+        """Start the addr2line process, reading addresses from stdin"""
+        cmd = [
+            self.addr2line_path,
+            '-e', self.lib_path,
+            '-f', '-C', '-p',  # Show function names, demangle, pretty print
+        ]
+        logging.debug(f"Starting addr2line worker: {' '.join(cmd)}")
+        try:
+            self._proc = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                bufsize=1,
+            )
+        except OSError:
+            self.stats.spawn('llvm-addr2line', failed=True)
+            raise
+        self.stats.spawn('llvm-addr2line')
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def _query(self, addrs: List[str]) -> List[str]:
+        if not self.alive:
+            self._start()
+        proc = self._proc
+        results = []
+        for i in range(0, len(addrs), self.CHUNK_SIZE):
+            chunk = addrs[i:i + self.CHUNK_SIZE]
+            # 先写入一批地址，再按顺序逐行读取结果（不带 -i 时每个地址输出一行）
+            proc.stdin.write(''.join(f'{addr}\n' for addr in chunk))
+            proc.stdin.flush()
+            for _ in chunk:
+                line = proc.stdout.readline()
+                if not line:
+                    raise BrokenPipeError(f"addr2line worker for {self.lib_path} exited unexpectedly")
+                results.append(line.strip())
+        return results
+
+    def resolve(self, addrs: List[str]) -> List[str]:
+        """Resolve addresses, restarting the process once if it has crashed
+
+        The caller must hold ``lock``.
+        """
+        start = self.last_used = time.monotonic()
+        try:
+            return self._query(addrs)
+        except (BrokenPipeError, OSError, ValueError) as e:
+            logging.debug(f"addr2line worker failed ({e}), restarting")
+            self.stats.incr('addr2line_restarts')
+            self.close()
+            return self._query(addrs)
+        finally:
+            self.last_used = time.monotonic()
+            self.stats.tool_time('llvm-addr2line', self.last_used - start)
+
+    def close(self):
+        """Terminate the addr2line process"""
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+
+
+class Addr2LinePool:
+    """Pool of persistent addr2line workers, keyed by symbol file"""
+
+    def __init__(self, addr2line_path: str, workers_per_file: int = 1,
+                 max_workers: int = 16, idle_timeout: float = 60.0, stats: Optional[Stats] = None,
+                 slots: Optional[ToolSlots] = None):
+        self.addr2line_path = addr2line_path
+        self.stats = stats
+        self.slots = slots  # 与其他解析器共享的外部工具并发上限，拿到 worker 后再占用
+        self.workers_per_file = max(1, workers_per_file)
+        self.max_workers = max(1, max_workers)
+        self.idle_timeout = idle_timeout
+        self._workers: Dict[str, List[Addr2LineWorker]] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+
+    def _start_reaper(self):
+        if self._reaper is None and self.idle_timeout > 0:
+            self._reaper = threading.Thread(target=self._reap_loop, name='addr2line-reaper', daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while not self._closed.wait(self.idle_timeout / 2):
+            self.evict_idle()
+
+    def _get_worker(self, lib_path: str) -> Addr2LineWorker:
+        signature = file_signature(lib_path)
+        with self._lock:
+            self._start_reaper()
+            # 符号文件被覆盖后，旧进程仍在读旧内容，全部回收
+            for worker in [w for w in self._workers.get(lib_path, []) if w.signature != signature]:
+                self._remove_locked(worker)
+            workers = self._workers.setdefault(lib_path, [])
+            # 优先使用空闲的 worker，否则在未达上限时新建
+            for worker in workers:
+                if not worker.lock.locked():
+                    return worker
+            if len(workers) < self.workers_per_file:
+                self._evict_lru_locked()
+                worker = Addr2LineWorker(self.addr2line_path, lib_path, stats=self.stats, signature=signature)
+                workers.append(worker)
+                return worker
+            return min(workers, key=lambda w: w.last_used)
+
+    def _evict_lru_locked(self):
+        """Close least recently used workers until there is room for one more"""
+        all_workers = [w for ws in self._workers.values() for w in ws]
+        while len(all_workers) >= self.max_workers:
+            idle = [w for w in all_workers if not w.lock.locked()]
+            if not idle:
+                break
+            victim = min(idle, key=lambda w: w.last_used)
+            self._remove_locked(victim)
+            all_workers.remove(victim)
+
+    def _remove_locked(self, worker: Addr2LineWorker):
+        workers = self._workers.get(worker.lib_path, [])
+        if worker in workers:
+            workers.remove(worker)
+        if not workers:
+            self._workers.pop(worker.lib_path, None)
+        logging.debug(f"Evicting addr2line worker for {worker.lib_path}")
+        worker.retired = True
+        if worker.lock.acquire(blocking=False):
+            try:
+                worker.close()
+            finally:
+                worker.lock.release()
+
+    def evict_idle(self):
+        """Close workers that have not been used within idle_timeout"""
+        now = time.monotonic()
+        with self._lock:
+            for workers in list(self._workers.values()):
+                for worker in list(workers):
+                    if not worker.lock.locked() and now - worker.last_used > self.idle_timeout:
+                        self._remove_locked(worker)
+
+    def resolve(self, lib_path: str, addrs: List[str]) -> List[str]:
+        """Resolve a list of addresses against one symbol file"""
+        if not addrs:
+            return []
+        while True:
+            worker = self._get_worker(lib_path)
+            with worker.lock:
+                # worker 可能在获取锁之前已被回收
+                if worker.retired:
+                    worker.close()
+                    continue
+                try:
+                    with self.slots.slot() if self.slots else nullcontext():
+                        return worker.resolve(addrs)
+                finally:
+                    if worker.retired:
+                        worker.close()
+
+    def close(self):
+        """Terminate all workers"""
+        self._closed.set()
+        with self._lock:
+            for workers in list(self._workers.values()):
+                for worker in list(workers):
+                    self._remove_locked(worker)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(ws) for ws in self._workers.values())
+
+
+class AsyncAddr2LineWorker:
+    """asyncio counterpart of Addr2LineWorker, talking to addr2line through asyncio pipes"""
+
+    CHUNK_SIZE = Addr2LineWorker.CHUNK_SIZE
+
+    def __init__(self, addr2line_path: str, lib_path: str, stats: Optional[Stats] = None,
+                 signature: Optional[Tuple[int, int]] = None):
+        self.addr2line_path = addr2line_path
+        self.lib_path = lib_path
+        self.signature = signature
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.retired = False
+        self.stats = stats or Stats(enabled=False)
+        self._proc: Optional[asyncio.subprocess.Process] = None
+
+    async def _start(self):
+        cmd = [self.addr2line_path, '-e', self.lib_path, '-f', '-C', '-p']
+        logging.debug(f"Starting async addr2line worker: {' '.join(cmd)}")
+        try:
+            self._proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+        except OSError:
+            self.stats.spawn('llvm-addr2line', failed=True)
+            raise
+        self.stats.spawn('llvm-addr2line')
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.returncode is None
+
+    async def _query(self, addrs: List[str]) -> List[str]:
+        if not self.alive:
+            await self._start()
+        proc = self._proc
+        results = []
+        for i in range(0, len(addrs), self.CHUNK_SIZE):
+            chunk = addrs[i:i + self.CHUNK_SIZE]
+            proc.stdin.write(''.join(f'{addr}\n' for addr in chunk).encode())
+            await proc.stdin.drain()
+            for _ in chunk:
+                line = await proc.stdout.readline()
+                if not line:
+                    raise BrokenPipeError(f"addr2line worker for {self.lib_path} exited unexpectedly")
+                results.append(line.decode(errors='replace').strip())
+        return results
+
+    async def resolve(self, addrs: List[str]) -> List[str]:
+        """Resolve addresses, restarting the process once if it has crashed
+
+        The caller must hold ``lock``.
+        """
+        start = self.last_used = time.monotonic()
+        try:
+            return await self._query(addrs)
+        except (OSError, ValueError) as e:
+            logging.debug(f"addr2line worker failed ({e}), restarting")
+            self.stats.incr('addr2line_restarts')
+            await self.close()
+            return await self._query(addrs)
+        finally:
+            self.last_used = time.monotonic()
+            self.stats.tool_time('llvm-addr2line', self.last_used - start)
+
+    async def close(self):
+        """Terminate the addr2line process"""
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=1)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+
+
+class AsyncAddr2LinePool:
+    """asyncio pool of persistent addr2line workers, keyed by symbol file
+
+    Must be used from a single event loop. Idle workers are closed lazily
+    by later calls instead of by a reaper thread.
+    """
+
+    def __init__(self, addr2line_path: str, workers_per_file: int = 1,
+                 max_workers: int = 16, idle_timeout: float = 60.0, stats: Optional[Stats] = None,
+                 slots: Optional[ToolSlots] = None):
+        self.addr2line_path = addr2line_path
+        self.slots = slots
+        self.workers_per_file = max(1, workers_per_file)
+        self.max_workers = max(1, max_workers)
+        self.idle_timeout = idle_timeout
+        self.stats = stats
+        self._workers: Dict[str, List[AsyncAddr2LineWorker]] = {}
+        self._last_reap = time.monotonic()
+
+    def _remove(self, worker: AsyncAddr2LineWorker):
+        workers = self._workers.get(worker.lib_path, [])
+        if worker in workers:
+            workers.remove(worker)
+        if not workers:
+            self._workers.pop(worker.lib_path, None)
+        logging.debug(f"Evicting async addr2line worker for {worker.lib_path}")
+        worker.retired = True
+
+    async def _close_retired(self, workers: List[AsyncAddr2LineWorker]):
+        for worker in workers:
+            # 等待正在使用该 worker 的协程结束后再关闭
+            async with worker.lock:
+                await worker.close()
+
+    def _get_worker(self, lib_path: str) -> Tuple[AsyncAddr2LineWorker, List[AsyncAddr2LineWorker]]:
+        """Pick a worker for lib_path, returning it and the workers evicted to make room
+
+        Runs without awaiting, so the pool cannot change underneath it.
+        """
+        evicted = []
+        now = time.monotonic()
+        if self.idle_timeout > 0 and now - self._last_reap > self.idle_timeout / 2:
+            self._last_reap = now
+            for worker in [w for ws in self._workers.values() for w in ws]:
+                if not worker.lock.locked() and now - worker.last_used > self.idle_timeout:
+                    self._remove(worker)
+                    evicted.append(worker)
+
+        signature = file_signature(lib_path)
+        for worker in [w for w in self._workers.get(lib_path, []) if w.signature != signature]:
+            self._remove(worker)
+            evicted.append(worker)
+        workers = self._workers.setdefault(lib_path, [])
+        for worker in workers:
+            if not worker.lock.locked():
+                return worker, evicted
+        if len(workers) < self.workers_per_file:
+            all_workers = [w for ws in self._workers.values() for w in ws]
+            while len(all_workers) >= self.max_workers:
+                idle = [w for w in all_workers if not w.lock.locked()]
+                if not idle:
+                    break
+                victim = min(idle, key=lambda w: w.last_used)
+                self._remove(victim)
+                all_workers.remove(victim)
+                evicted.append(victim)
+            worker = AsyncAddr2LineWorker(self.addr2line_path, lib_path, stats=self.stats, signature=signature)
+            self._workers.setdefault(lib_path, []).append(worker)
+            return worker, evicted
+        return min(workers, key=lambda w: w.last_used), evicted
+
+    async def _acquire_slot(self):
+        # 等待槽位会阻塞，放到线程中；to_thread 复制上下文，沿用当前优先级
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self.slots.acquire))
+        try:
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # 协程被取消时线程仍会拿到槽位，拿到后立即归还
+            acquiring.add_done_callback(lambda f: f.cancelled() or f.exception() or self.slots.release())
+            raise
+
+    async def resolve(self, lib_path: str, addrs: List[str]) -> List[str]:
+        """Resolve a list of addresses against one symbol file"""
+        if not addrs:
+            return []
+        while True:
+            worker, evicted = self._get_worker(lib_path)
+            if evicted:
+                await self._close_retired(evicted)
+            async with worker.lock:
+                # worker 可能在获取锁之前已被回收
+                if worker.retired:
+                    await worker.close()
+                    continue
+                if not self.slots:
+                    return await worker.resolve(addrs)
+                await self._acquire_slot()
+                try:
+                    return await worker.resolve(addrs)
+                finally:
+                    self.slots.release()
+
+    async def aclose(self):
+        """Terminate all workers"""
+        workers = [w for ws in self._workers.values() for w in ws]
+        for worker in workers:
+            self._remove(worker)
+        await self._close_retired(workers)
+
+    def __len__(self) -> int:
+        return sum(len(ws) for ws in self._workers.values())
@@ -0,0 +1,197 @@
+import io
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from .addr2line_pool import AsyncAddr2LinePool
+from .crash_buckets import CrashBucket
+from .scheduler import ResolutionAbandoned
+from .ndk_logcat_parser import LogcatParser, CrashInfo, Frame
+
+
+class AsyncLogcatParser:
+    """asyncio API of LogcatParser for services that run an event loop
+
+    addr2line runs as asyncio subprocesses; log scanning, symbol index
+    refreshes, ELF loading and cache I/O run in worker threads, so the event
+    loop is never blocked. At most max_concurrency crashes are symbolicated
+    at once and at most max_addr2line_processes addr2line processes are
+    kept alive. Other keyword arguments are passed to LogcatParser.
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_addr2line_processes: int = 16, **kwargs):
+        self.parser = LogcatParser(**kwargs)
+        self.stats = self.parser.stats
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_addr2line_processes = max_addr2line_processes
+        self._pool: Optional[AsyncAddr2LinePool] = None
+        # asyncio 原语在首次使用时创建，确保属于调用方的事件循环
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._index_lock: Optional[asyncio.Lock] = None
+        self._index_ready = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """Shut down the addr2line processes and close the symbol cache"""
+        if self._pool:
+            await self._pool.aclose()
+            self._pool = None
+        await asyncio.to_thread(self.parser.close)
+
+    def _get_pool(self) -> AsyncAddr2LinePool:
+        if self._pool is None:
+            p = self.parser
+            self._pool = AsyncAddr2LinePool(
+                p._get_addr2line_path(),
+                workers_per_file=p.addr2line_workers,
+                max_workers=self.max_addr2line_processes,
+                idle_timeout=p.addr2line_idle_timeout,
+                stats=p.stats,
+                slots=p.scheduler.slots
+            )
+        return self._pool
+
+    async def _ensure_index(self):
+        """Build the symbol index in a thread before the first lookup"""
+        if self._index_ready or not self.parser.symbol_index:
+            return
+        if self._index_lock is None:
+            self._index_lock = asyncio.Lock()
+        async with self._index_lock:
+            if not self._index_ready:
+                await asyncio.to_thread(self.parser.symbol_index.refresh)
+                self._index_ready = True
+
+    async def _addr2line_batch(self, lib_path: str, addrs: List[str]) -> List[str]:
+        p = self.parser
+        try:
+            file_key, found, missing = await asyncio.to_thread(p._cache_lookup, lib_path, addrs)
+        except OSError as e:
+            return [f"Failed to symbolicate: {e}"] * len(addrs)
+        if missing:
+            # 与 LogcatParser 共用在途请求表，相同地址只调用一次 addr2line
+            owned, waiting = p.scheduler.claim([(file_key, addr) for addr in missing])
+            try:
+                if owned:
+                    owned_addrs = [addr for _, addr in owned]
+                    p.stats.incr('addr2line_addresses', len(owned_addrs))
+                    try:
+                        with p.stats.stage('addr2line'):
+                            outputs = await self._get_pool().resolve(lib_path, owned_addrs)
+                    except BaseException as e:
+                        p.scheduler.fail(owned, e)
+                        raise
+                    p.scheduler.complete(dict(zip(owned, outputs)))
+                    await asyncio.to_thread(p._cache_store, file_key, found, owned_addrs, outputs)
+                for (_, addr), future in waiting.items():
+                    try:
+                        found[addr] = await asyncio.wrap_future(future)
+                    except ResolutionAbandoned:
+                        found[addr] = (await self._addr2line_batch(lib_path, [addr]))[0]
+            except (OSError, ValueError) as e:
+                return [found.get(addr, f"Failed to symbolicate: {e}") for addr in addrs]
+        return [found[addr] for addr in addrs]
+
+    async def _symbolize_batch(self, lib_path: str, addrs: List[str]) -> List[str]:
+        p = self.parser
+        results = await asyncio.to_thread(p._sidecar_lookup, lib_path, addrs) if p.sidecars else [None] * len(addrs)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing and not p.line_info:
+            table = await asyncio.to_thread(p._get_elf_table, lib_path)
+            for i, result in zip(missing, p._elf_lookup(table, [addrs[i] for i in missing])):
+                results[i] = result
+            missing = [i for i in missing if results[i] is None]
+        if missing:
+            outputs = await self._addr2line_batch(lib_path, [addrs[i] for i in missing])
+            for i, output in zip(missing, outputs):
+                results[i] = output
+        return results
+
+    async def symbolicate_frames(self, frames: List[str]) -> List[str]:
+        """Symbolicate stack frame lines like LogcatParser.symbolicate_frames"""
+        parsed = [Frame.parse(line) for line in frames]
+        await self.resolve_frames([frame for frame in parsed if frame])
+        return [frame.render() if frame else line.strip() for frame, line in zip(parsed, frames)]
+
+    async def resolve_frames(self, frames: List[Frame]):
+        """Fill in ``resolved`` of each frame, resolving all symbol files concurrently"""
+        p = self.parser
+        if not p._can_symbolicate():
+            return
+        await self._ensure_index()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            with p.stats.stage('symbolicate'):
+                groups: Dict[str, List[Frame]] = p._group_frames(frames)
+                outputs = await asyncio.gather(*(
+                    self._symbolize_batch(symbol_lib, [frame.hex_addr for frame in entries])
+                    for symbol_lib, entries in groups.items()
+                ))
+                for entries, output in zip(groups.values(), outputs):
+                    p._apply_outputs(entries, output)
+
+    async def symbolicate_trace(self, stack_trace: List[str]) -> str:
+        """Symbolicate a stack trace, returning it as text"""
+        return '\n'.join(await self.symbolicate_frames(stack_trace))
+
+    async def _finish_crash(self, crash_info: CrashInfo) -> CrashInfo:
+        p = self.parser
+        if not p._can_symbolicate():
+            return p._finish_crash(crash_info)
+        p.stats.incr('crashes')
+        bucket = None
+        if p.buckets is not None:
+            bucket, new = p.buckets.assign(crash_info)
+            if not new:
+                # 代表崩溃可能仍在本事件循环或其他线程中符号化，等待时不能阻塞事件循环
+                await self._wait_ready(bucket)
+                p.stats.incr('crashes_deduplicated')
+                bucket.attach(crash_info)
+                return crash_info
+        try:
+            start = time.perf_counter()
+            await self.resolve_frames(crash_info.frames)
+            crash_info.timings['symbolicate'] = time.perf_counter() - start
+        finally:
+            if bucket:
+                bucket.set_representative(crash_info)
+        return crash_info
+
+    @staticmethod
+    async def _wait_ready(bucket: CrashBucket):
+        if bucket.ready.is_set():
+            return
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            # set_representative 可能在其他线程中调用
+            try:
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+            except RuntimeError:  # 事件循环已关闭
+                pass
+
+        bucket.when_ready(wake)
+        await future
+
+    def _scan_content(self, content: str, last_only: bool) -> List[CrashInfo]:
+        crashes = list(self.parser._scan(io.StringIO(content)))
+        return crashes[-1:] if last_only else crashes
+
+    async def parse_crashes(self, content: str) -> List[CrashInfo]:
+        """Parse logcat content and symbolicate every crash in it concurrently"""
+        crashes = await asyncio.to_thread(self._scan_content, content, False)
+        return list(await asyncio.gather(*(self._finish_crash(c) for c in crashes)))
+
+    async def parse_logcat_content(self, content: str) -> Optional[CrashInfo]:
+        """Parse logcat content, returning its last crash like LogcatParser.parse_logcat_content"""
+        logging.debug(f"Parsing logcat content asynchronously, {len(content)} bytes")
+        crashes = await asyncio.to_thread(self._scan_content, content, True)
+        return await self._finish_crash(crashes[0]) if crashes else None
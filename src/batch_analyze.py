@@ -0,0 +1,439 @@
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict, field, replace
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 避免循环导入
+if __name__ == '__main__':
+    # 当作为主程序运行时，添加父目录到 Python 路径
+    parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+
+from src.config import Config
+from src.ndk_logcat_parser import LogcatParser
+from src.ndk_stack_parser import NDKStackParser, ENGINES
+from src.jsonl_sink import JsonlSink, crash_record, dump_record
+from src.crash_buckets import CrashBuckets
+from src.symbol_index import SymbolIndex
+from src.utils import find_ndk_path
+
+# 未指定 --summary 时汇总文件的名字，写在输出目录中
+SUMMARY_NAME = 'batch_summary.json'
+# 解析结果文件的后缀（LogcatParser 与 NDKStackParser 的输出），不会作为输入分析
+_OUTPUT_SUFFIXES = ('.parsed.txt', '.symbolicated.txt')
+
+
+@dataclass
+class BatchOptions:
+    """Options shared by every worker of a batch run"""
+    symbols_dir: Optional[str] = None
+    ndk_path: Optional[str] = None
+    output_dir: Optional[str] = None
+    verify_build_id: bool = False
+    line_info: bool = True
+    sidecar_dir: Optional[str] = None  # symbol_sidecar 编译出的边车文件目录
+    cache_dir: Optional[str] = None
+    persistent_cache: bool = True
+    dump_timeout: Optional[float] = 300
+    dump_engine: str = 'ndk-stack'  # 'native' 时 .dmp 与 logcat 共用同一个 LogcatParser 的缓存和 addr2line 进程
+    verbose: bool = False
+    records: bool = False  # 为 True 时工作进程返回 JSON Lines 记录，不再逐文件写文本结果
+    bucket_crashes: bool = False  # 为 True 时相同签名的崩溃只符号化一次，并返回每个文件的分桶统计
+
+
+@dataclass
+class FileResult:
+    """Outcome of analysing one crash file"""
+    file: str
+    type: str  # 'dmp' 或 'logcat'
+    status: str  # 'ok', 'no_crash' 或 'failed'
+    crashes: int = 0
+    duration: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchSummary:
+    """Result of a batch run"""
+    total: int = 0
+    ok: int = 0
+    no_crash: int = 0
+    failed: int = 0
+    crashes: int = 0
+    workers: int = 0
+    duration: float = 0.0
+    files: List[FileResult] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _is_within(path: str, directory: str) -> bool:
+    return path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
+
+
+def collect_files(inputs: List[str], exclude: Iterable[str] = ()) -> List[str]:
+    """Expand directories (recursively) and glob patterns into a sorted list of files
+
+    Paths in exclude (the output directory and output files of the run)
+    are left out unless an input lies inside them, and so are
+    batch_summary.json and .parsed.txt / .symbolicated.txt results, so a
+    rerun with its output inside the input tree does not analyse them.
+    """
+    excluded = [os.path.realpath(path) for path in exclude if path]
+    files = set()
+    for item in inputs:
+        base = item
+        while glob.has_magic(base):
+            base = os.path.dirname(base)
+        # 输入本身就在输出目录中（例如 -o 与输入目录相同）时，只按文件名跳过结果
+        skip = [path for path in excluded if not _is_within(os.path.realpath(base or '.'), path)]
+        if os.path.isdir(item):
+            found = []
+            for root, dirs, names in os.walk(item):
+                dirs[:] = [name for name in dirs if os.path.realpath(os.path.join(root, name)) not in skip]
+                found.extend(os.path.join(root, name) for name in names)
+        elif glob.has_magic(item):
+            found = [p for p in glob.glob(item, recursive=True) if os.path.isfile(p)]
+        elif os.path.isfile(item):
+            found = [item]
+        else:
+            logging.warning(f"Input not found: {item}")
+            continue
+        files.update(f for f in found if not f.endswith(_OUTPUT_SUFFIXES) and os.path.basename(f) != SUMMARY_NAME
+                     and not any(_is_within(os.path.realpath(f), path) for path in skip))
+    return sorted(os.path.abspath(f) for f in files)
+
+
+def output_names(files: List[str]) -> Dict[str, str]:
+    """Output name of each file: its path below the deepest directory that contains all of them
+
+    Files with the same name in different directories (dev1/logcat.txt,
+    dev2/logcat.txt) get outputs in matching subdirectories of the output
+    directory instead of overwriting each other.
+    """
+    if not files:
+        return {}
+    try:
+        root = os.path.commonpath([os.path.dirname(f) for f in files])
+    except ValueError:
+        # Windows 上位于不同盘符：盘符作为第一级目录
+        names = {}
+        for f in files:
+            drive, rest = os.path.splitdrive(f)
+            names[f] = os.path.join(drive.rstrip(':'), rest.lstrip('\\/'))
+        return names
+    return {f: os.path.relpath(f, root) for f in files}
+
+
+# 每个工作进程持有自己的解析器；符号缓存和索引通过磁盘在进程之间共享
+_options: Optional[BatchOptions] = None
+_logcat_parser: Optional[LogcatParser] = None
+_stack_parser: Optional[NDKStackParser] = None
+
+
+def _init_worker(options: BatchOptions):
+    global _options
+    _options = options
+    logging.basicConfig(format='[%(levelname)s] %(message)s')
+    # fork 出的子进程会继承父进程的日志配置，这里显式降低级别
+    logging.getLogger().setLevel(logging.DEBUG if options.verbose else logging.WARNING)
+
+
+def _get_logcat_parser() -> LogcatParser:
+    global _logcat_parser
+    if _logcat_parser is None:
+        _logcat_parser = LogcatParser(
+            symbols_dir=_options.symbols_dir,
+            ndk_path=_options.ndk_path,
+            output_dir=None if _options.records else _options.output_dir,
+            verbose=_options.verbose,
+            verify_build_id=_options.verify_build_id,
+            line_info=_options.line_info,
+            sidecar_dir=_options.sidecar_dir,
+            cache_dir=_options.cache_dir,
+            persistent_cache=_options.persistent_cache,
+            bucket_crashes=_options.bucket_crashes
+        )
+    return _logcat_parser
+
+
+def _get_stack_parser() -> NDKStackParser:
+    global _stack_parser
+    if _stack_parser is None:
+        if not (_options.ndk_path and _options.symbols_dir):
+            raise ValueError("NDK path and symbols directory are required for DMP files")
+        output_dir = None if _options.records else _options.output_dir
+        config = Config(ndk_path=_options.ndk_path, symbols_dir=_options.symbols_dir, output_dir=output_dir)
+        symbolicator = _get_logcat_parser() if _options.dump_engine == 'native' else None
+        _stack_parser = NDKStackParser(config, output_dir=output_dir, engine=_options.dump_engine,
+                                       symbolicator=symbolicator)
+    return _stack_parser
+
+
+def analyze_file(path: str, output_name: Optional[str] = None) -> FileResult:
+    """Analyse one file in the current worker: .dmp via ndk-stack, anything else as logcat
+
+    Output is written to <output_dir>/<output_name>.parsed.txt (or
+    .symbolicated.txt), output_name defaulting to the file name.
+    """
+    return _analyze(path, output_name, None, None)
+
+
+def _analyze_task(path: str, output_name: str) -> Tuple[FileResult, Optional[List[dict]], Optional[List[dict]]]:
+    """analyze_file, also returning the file's JSON Lines records and crash buckets if enabled"""
+    records = [] if _options.records else None
+    buckets = CrashBuckets() if _options.bucket_crashes else None
+    result = _analyze(path, output_name, records, buckets)
+    return result, records, buckets.to_dict()['buckets'] if buckets is not None else None
+
+
+def _analyze(path: str, output_name: Optional[str], records: Optional[List[dict]],
+             buckets: Optional[CrashBuckets]) -> FileResult:
+    file_type = 'dmp' if path.endswith('.dmp') else 'logcat'
+    result = FileResult(file=path, type=file_type, status='ok')
+    start = time.monotonic()
+    try:
+        if file_type == 'dmp':
+            output = _get_stack_parser().parse_dump_file(path, timeout=_options.dump_timeout, output_name=output_name)
+            result.crashes = 1
+            if records is not None:
+                records.append(dump_record(path, output, duration=time.monotonic() - start))
+        else:
+            for crash_info in _get_logcat_parser().stream_logcat_file(path, output_name):
+                if records is not None:
+                    records.append(crash_record(crash_info, path, result.crashes))
+                if buckets is not None:
+                    buckets.add(crash_info, path)
+                result.crashes += 1
+            if not result.crashes:
+                result.status = 'no_crash'
+    except Exception as e:
+        result.status = 'failed'
+        result.error = f"{type(e).__name__}: {e}"
+    result.duration = time.monotonic() - start
+    return result
+
+
+def run_batch(inputs: List[str], options: BatchOptions, workers: Optional[int] = None,
+              sink: Optional[JsonlSink] = None, buckets: Optional[CrashBuckets] = None,
+              exclude: Iterable[str] = ()) -> BatchSummary:
+    """Analyse every file found in inputs, spread over a pool of worker processes
+
+    Text outputs mirror the input tree (see output_names). The output
+    directory and the paths in exclude are never analysed. With a sink,
+    crashes are written there as JSON Lines records by this process
+    instead of one text file per input. With buckets, each worker
+    symbolicates every unique crash signature once and the bucket counts
+    of all files are merged into buckets.
+    """
+    start = time.monotonic()
+    files = collect_files(inputs, [options.output_dir, *exclude])
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files) or 1))
+    summary = BatchSummary(total=len(files), workers=workers)
+    if not files:
+        return summary
+
+    # 在父进程中预先建立符号索引，避免每个工作进程各自扫描符号目录
+    if options.symbols_dir:
+        SymbolIndex(options.symbols_dir, cache_dir=options.cache_dir, persistent=options.persistent_cache).refresh()
+    if options.output_dir:
+        os.makedirs(options.output_dir, exist_ok=True)
+    if sink or buckets is not None:
+        options = replace(options, records=options.records or sink is not None,
+                          bucket_crashes=options.bucket_crashes or buckets is not None)
+
+    logging.info(f"Analyzing {len(files)} files with {workers} workers")
+    # 小任务打包分发，减少进程间通信开销
+    chunksize = max(1, min(64, len(files) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(options,)) as executor:
+        names = output_names(files)
+        results = executor.map(_analyze_task, files, [names[f] for f in files], chunksize=chunksize)
+        for result, records, file_buckets in results:
+            if sink:
+                for record in records:
+                    sink.write(record)
+            if buckets is not None:
+                buckets.merge(file_buckets)
+            summary.files.append(result)
+            if result.status == 'ok':
+                summary.ok += 1
+            elif result.status == 'no_crash':
+                summary.no_crash += 1
+            else:
+                summary.failed += 1
+                logging.error(f"Failed to analyze {result.file}: {result.error}")
+            summary.crashes += result.crashes
+    summary.duration = time.monotonic() - start
+    return summary
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Analyze whole directories of logcat files (plain, .gz, .zst or bugreport .zip) '
+                    'and .dmp crash dumps in parallel.',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+        Examples:
+          %(prog)s -s /path/to/symbols -o out crashes/              # Analyze a directory
+          %(prog)s -s /path/to/symbols -j 16 'crashes/**/*.log'     # Analyze a glob with 16 workers
+        '''
+    )
+    parser.add_argument(
+        'inputs',
+        nargs='+',
+        help='Crash files, directories or glob patterns to analyze'
+    )
+    parser.add_argument(
+        '-s', '--symbols',
+        help='Path to the directory containing symbol files.',
+        metavar='DIR'
+    )
+    parser.add_argument(
+        '-n', '--ndk',
+        help='Path to Android NDK installation. Defaults to ANDROID_NDK_HOME.',
+        metavar='PATH'
+    )
+    parser.add_argument(
+        '-o', '--output',
+        help='Specify output directory for parsed results.',
+        metavar='DIR'
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        help='Number of worker processes (default: number of CPUs)',
+        metavar='N'
+    )
+    parser.add_argument(
+        '--summary',
+        help='Write the JSON summary to this file (default: <output>/batch_summary.json)',
+        metavar='FILE'
+    )
+    parser.add_argument(
+        '--jsonl',
+        help='Write all crashes as JSON Lines records to FILE (.gz to compress) instead of a text file per input',
+        metavar='FILE'
+    )
+    parser.add_argument(
+        '--jsonl-max-mb',
+        type=float,
+        help='Rotate the JSON Lines output after about this many MB',
+        metavar='MB'
+    )
+    parser.add_argument(
+        '--buckets',
+        help='Group duplicate crashes by stack signature, symbolicating one per bucket, '
+             'and write bucket counts with first/last seen to FILE',
+        metavar='FILE'
+    )
+    parser.add_argument(
+        '--dump-timeout',
+        type=float,
+        default=300,
+        help='Timeout in seconds for each ndk-stack run (default: 300)',
+        metavar='SEC'
+    )
+    parser.add_argument(
+        '--dump-engine',
+        choices=ENGINES,
+        default='ndk-stack',
+        help='Symbolicate .dmp files with ndk-stack (default) or natively, '
+             'sharing the cached lookups of the logcat parser'
+    )
+    parser.add_argument(
+        '--verify-build-id',
+        action='store_true',
+        help='Enable Build ID verification'
+    )
+    parser.add_argument(
+        '--no-line-info',
+        action='store_true',
+        help='Only resolve function name and offset'
+    )
+    parser.add_argument(
+        '--sidecar-dir',
+        help='Resolve logcat frames from sidecar files compiled by src.symbol_sidecar in DIR',
+        metavar='DIR'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        help='Directory of the persistent symbolication cache',
+        metavar='DIR'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the persistent symbolication cache'
+    )
+    parser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        help='Enable verbose logging'
+    )
+    args = parser.parse_args()
+    args.verbose = args.verbose or os.environ.get('VERBOSE') == '1'
+    return args
+
+
+def main():
+    """Main entry point"""
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='[%(levelname)s] %(message)s'
+    )
+
+    options = BatchOptions(
+        symbols_dir=args.symbols or os.environ.get('SYMBOLS_DIR'),
+        # NDK 路径只在父进程中解析一次
+        ndk_path=args.ndk or os.environ.get('ANDROID_NDK_HOME') or find_ndk_path(),
+        output_dir=args.output or os.environ.get('OUTPUT_DIR'),
+        verify_build_id=args.verify_build_id,
+        line_info=not args.no_line_info,
+        sidecar_dir=args.sidecar_dir,
+        cache_dir=args.cache_dir,
+        persistent_cache=not args.no_cache,
+        dump_timeout=args.dump_timeout,
+        dump_engine=args.dump_engine,
+        verbose=args.verbose
+    )
+    summary_file = args.summary
+    if not summary_file and options.output_dir:
+        summary_file = os.path.join(options.output_dir, SUMMARY_NAME)
+    # 输出文件位于输入目录中时，不把它们当作输入
+    exclude = [summary_file, args.buckets, args.jsonl]
+    buckets = CrashBuckets() if args.buckets else None
+    if args.jsonl:
+        max_bytes = int(args.jsonl_max_mb * 1024 * 1024) if args.jsonl_max_mb else None
+        with JsonlSink(args.jsonl, max_bytes=max_bytes) as sink:
+            summary = run_batch(args.inputs, options, workers=args.jobs, sink=sink, buckets=buckets, exclude=exclude)
+        logging.info(f"Wrote {sink.records} records to {len(sink.files)} JSON Lines files")
+    else:
+        summary = run_batch(args.inputs, options, workers=args.jobs, buckets=buckets, exclude=exclude)
+    if not summary.total:
+        print('No input files found')
+        sys.exit(2)
+
+    if summary_file:
+        with open(summary_file, 'w') as f:
+            json.dump(summary.to_dict(), f, indent=2)
+        logging.info(f"Summary written to: {summary_file}")
+
+    print(f'Analyzed {summary.total} files in {summary.duration:.1f}s with {summary.workers} workers: '
+          f'{summary.ok} ok, {summary.no_crash} without crash, {summary.failed} failed, '
+          f'{summary.crashes} crashes found' + (f' in {len(buckets)} buckets' if buckets is not None else ''))
+    if buckets is not None:
+        buckets.write(args.buckets)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+import re
+import json
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .ndk_logcat_parser import CrashInfo, Frame
+
+# 每台设备都不同的映射（匿名内存、JIT 代码缓存），不参与签名
+_VOLATILE_LIBS = ('[', '/memfd:')
+# logcat 时间戳 "01-01 12:00:02.000"，`logcat -v year` 时带年份 "2024-01-01 12:00:02.000"
+_TIMESTAMP = re.compile(r'^(?:(?P<year>\d{4})-)?(?P<month>\d\d)-(?P<day>\d\d)\s+'
+                        r'(?P<hour>\d\d):(?P<minute>\d\d):(?P<second>\d\d(?:\.\d+)?)')
+
+
+def _lib_name(lib: str) -> str:
+    # 安装路径因设备而异（/data/app/~~xxxx==/...），只使用文件名
+    return lib.rpartition('/')[2]
+
+
+def _frame_key(frame: 'Frame') -> Tuple[str, int]:
+    return _lib_name(frame.lib), frame.addr
+
+
+def _timestamp_key(timestamp: Optional[str]) -> Optional[Tuple[Optional[int], Tuple]]:
+    """(year or None, (month, day, hour, minute, seconds)) of a logcat timestamp"""
+    match = _TIMESTAMP.match(timestamp) if timestamp else None
+    if not match:
+        return None
+    year = match.group('year')
+    return (int(year) if year else None,
+            (int(match.group('month')), int(match.group('day')), int(match.group('hour')),
+             int(match.group('minute')), float(match.group('second'))))
+
+
+def _earlier(a: str, b: str) -> bool:
+    """Whether timestamp a was logged before b; years are compared only when both have one"""
+    key_a, key_b = _timestamp_key(a), _timestamp_key(b)
+    if key_a is None or key_b is None:
+        return False
+    if key_a[0] is not None and key_b[0] is not None and key_a[0] != key_b[0]:
+        return key_a[0] < key_b[0]
+    return key_a[1] < key_b[1]
+
+
+def _order_key(timestamp: Optional[str]) -> Tuple:
+    key = _timestamp_key(timestamp)
+    return ((key[0] or 0,) + key[1]) if key else ()
+
+
+def crash_signature(crash_info: 'CrashInfo') -> str:
+    """Stable signature of a crash: library name, Build ID and relative pc of each frame"""
+    digest = hashlib.sha1()
+    frames = [frame for frame in crash_info.frames if not frame.lib.startswith(_VOLATILE_LIBS)]
+    for frame in frames:
+        digest.update(f'{_lib_name(frame.lib)}|{frame.build_id or ""}|{frame.addr:x}\n'.encode())
+    if not frames:
+        # 没有可用栈帧时按进程和信号归类
+        digest.update(f'{crash_info.process}|{crash_info.signal}'.encode())
+    return digest.hexdigest()[:16]
+
+
+@dataclass
+class CrashBucket:
+    """Crashes sharing one signature, with the symbolicated representative"""
+    signature: str
+    count: int = 0
+    first_seen: Optional[str] = None  # logcat 时间戳，没有时为 None
+    last_seen: Optional[str] = None
+    first_source: Optional[str] = None
+    process: str = ''
+    signal: str = ''
+    frames: List[str] = field(default_factory=list)  # 代表崩溃的栈帧文本
+    representative: Optional['CrashInfo'] = field(default=None, repr=False, compare=False)
+    _resolved: Dict[Tuple[str, int], Optional[str]] = field(default_factory=dict, repr=False, compare=False)
+    # 代表崩溃符号化完成后置位；其他线程中的同桶崩溃等待它
+    ready: threading.Event = field(default_factory=threading.Event, repr=False, compare=False)
+    _callbacks: List[Callable[[], None]] = field(default_factory=list, repr=False, compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def _seen(self, first: Optional[str], last: Optional[str]):
+        # 按解析后的时间比较，文本比较在带年份与不带年份的格式之间是错的
+        if first and (self.first_seen is None or _earlier(first, self.first_seen)):
+            self.first_seen = first
+        if last and (self.last_seen is None or _earlier(self.last_seen, last)):
+            self.last_seen = last
+
+    def record(self, crash_info: 'CrashInfo', source: Optional[str] = None):
+        """Count one crash of this bucket"""
+        self.count += 1
+        self._seen(crash_info.timestamp, crash_info.timestamp)
+        if self.first_source is None:
+            self.first_source = source
+
+    def set_representative(self, crash_info: 'CrashInfo'):
+        """Keep a symbolicated crash whose results are copied to later members"""
+        self.representative = crash_info
+        self.process = crash_info.process
+        self.signal = crash_info.signal
+        self.frames = [frame.render() for frame in crash_info.frames]
+        self._resolved = {_frame_key(frame): frame.resolved for frame in crash_info.frames}
+        with self._lock:
+            self.ready.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def when_ready(self, callback: Callable[[], None]):
+        """Call callback once the representative is set, right away if it already is
+
+        The callback runs in the thread that sets the representative; an
+        event loop waits with it instead of blocking in attach.
+        """
+        with self._lock:
+            if not self.ready.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def attach(self, crash_info: 'CrashInfo', timeout: Optional[float] = None):
+        """Give a member the symbolication results of the representative
+
+        Waits up to timeout seconds if the representative is still being
+        symbolicated by another thread.
+        """
+        self.ready.wait(timeout)
+        resolved = self._resolved
+        for frame in crash_info.frames:
+            frame.resolved = resolved.get(_frame_key(frame))
+
+    def merge(self, other: dict):
+        """Add the counts of a bucket exported with to_dict (e.g. from another process)"""
+        self.count += other['count']
+        self._seen(other.get('first_seen'), other.get('last_seen'))
+        if self.first_source is None:
+            self.first_source = other.get('first_source')
+        if not self.frames:
+            self.process = other.get('process', '')
+            self.signal = other.get('signal', '')
+            self.frames = list(other.get('frames', []))
+
+    def to_dict(self) -> dict:
+        return {
+            'signature': self.signature,
+            'count': self.count,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'first_source': self.first_source,
+            'process': self.process,
+            'signal': self.signal,
+            'frames': self.frames,
+        }
+
+
+class CrashBuckets:
+    """Groups duplicate crashes by signature so each unique stack is symbolicated once
+
+    LogcatParser(bucket_crashes=True) assigns every crash before
+    symbolicating it: the first crash of a bucket is symbolicated and kept
+    as its representative, later ones get its results copied onto their
+    frames. Only the representatives are kept in memory. Safe to share
+    between threads.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[str, CrashBucket] = {}
+        self._lock = threading.Lock()
+        self.crashes = 0
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def assign(self, crash_info: 'CrashInfo', source: Optional[str] = None) -> Tuple[CrashBucket, bool]:
+        """Record a crash in its bucket, returning the bucket and whether it is new
+
+        A new bucket has no representative yet; the caller symbolicates the
+        crash and passes it to set_representative.
+        """
+        signature = crash_signature(crash_info)
+        crash_info.bucket = signature
+        with self._lock:
+            self.crashes += 1
+            bucket = self._buckets.get(signature)
+            new = bucket is None
+            if new:
+                bucket = self._buckets[signature] = CrashBucket(signature)
+            bucket.record(crash_info, source)
+        return bucket, new
+
+    def add(self, crash_info: 'CrashInfo', source: Optional[str] = None) -> CrashBucket:
+        """Count an already symbolicated crash, keeping it if it starts a new bucket"""
+        bucket, new = self.assign(crash_info, source)
+        if new:
+            bucket.set_representative(crash_info)
+        return bucket
+
+    def merge(self, buckets: List[dict]):
+        """Merge buckets exported with to_dict, e.g. by batch worker processes"""
+        with self._lock:
+            for other in buckets:
+                bucket = self._buckets.get(other['signature'])
+                if bucket is None:
+                    bucket = self._buckets[other['signature']] = CrashBucket(other['signature'])
+                bucket.merge(other)
+                self.crashes += other['count']
+
+    def buckets(self) -> List[CrashBucket]:
+        """Buckets, largest first"""
+        with self._lock:
+            return sorted(self._buckets.values(), key=lambda bucket: (-bucket.count, _order_key(bucket.first_seen)))
+
+    def to_dict(self) -> dict:
+        return {
+            'crashes': self.crashes,
+            'buckets': [bucket.to_dict() for bucket in self.buckets()],
+        }
+
+    def write(self, path: str):
+        """Write the bucket summary as JSON"""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        logging.info(f"Wrote {len(self)} crash buckets ({self.crashes} crashes) to {path}")
@@ -0,0 +1,208 @@
+import os
+import re
+import sys
+import json
+import socket
+import argparse
+from typing import List, Optional, Tuple
+
+# 避免循环导入
+if __name__ == '__main__':
+    # 当作为主程序运行时，添加父目录到 Python 路径
+    parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+
+# 客户端只依赖标准库，避免每次调用都加载解析器和 NDK 工具查找
+from src.utils import default_cache_dir
+
+DEFAULT_PORT = 47820
+# 单个请求/响应的上限，与 symbol_daemon 一致
+MAX_MESSAGE_BYTES = 256 * 1024 * 1024
+_TCP_ADDRESS = re.compile(r'^(?P<host>[\w.\-]+|\[[0-9a-fA-F:]+\]):(?P<port>\d+)$')
+
+
+class DaemonError(RuntimeError):
+    """The daemon was reached but could not handle the request"""
+
+
+def default_address() -> str:
+    """Daemon address: NDK_SYMBOL_DAEMON, else a Unix socket in the cache directory (TCP on Windows)"""
+    address = os.environ.get('NDK_SYMBOL_DAEMON')
+    if address:
+        return address
+    if hasattr(socket, 'AF_UNIX') and os.name != 'nt':
+        return os.path.join(default_cache_dir(), 'symbold.sock')
+    return f'127.0.0.1:{DEFAULT_PORT}'
+
+
+def token_path(address: str) -> str:
+    """Session token file of a daemon listening on a TCP address, readable only by its user"""
+    port = parse_address(address)[1][1]
+    return os.path.join(default_cache_dir(), f'symbold-{port}.token')
+
+
+def parse_address(address: str) -> Tuple[int, object]:
+    """Split an address into a socket family and a socket address; host:port means TCP"""
+    match = _TCP_ADDRESS.match(address)
+    if match:
+        return socket.AF_INET, (match.group('host').strip('[]'), int(match.group('port')))
+    if not hasattr(socket, 'AF_UNIX'):
+        raise ValueError(f"Unix sockets are not supported here, use host:port: {address}")
+    return socket.AF_UNIX, address
+
+
+class DaemonClient:
+    """Client of the resident symbolication daemon (see symbol_daemon)
+
+    Requests are JSON objects sent one per line over a single connection;
+    OSError is raised when the daemon is not running, or when a TCP daemon's
+    session token file cannot be read (see token_path). Bulk clients should
+    pass priority='batch' so that interactive requests run ahead of them.
+    """
+
+    def __init__(self, address: Optional[str] = None, timeout: Optional[float] = 300.0,
+                 priority: str = 'interactive'):
+        self.address = address or default_address()
+        self.timeout = timeout
+        self.priority = priority
+        self._sock: Optional[socket.socket] = None
+        self._file = None
+        self._token: Optional[str] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def connect(self):
+        if self._sock is None:
+            family, address = parse_address(self.address)
+            if family == socket.AF_INET:
+                with open(token_path(self.address)) as f:
+                    self._token = f.read().strip()
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(address)
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+            self._file = sock.makefile('rwb')
+        return self
+
+    def close(self):
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+            self._sock = self._file = None
+
+    def request(self, op: str, **fields) -> dict:
+        """Send one request and return the response, raising DaemonError if it failed"""
+        self.connect()
+        request = {'op': op, 'priority': self.priority, **fields}
+        if self._token is not None:
+            request['token'] = self._token
+        self._file.write(json.dumps(request).encode() + b'\n')
+        self._file.flush()
+        line = self._file.readline(MAX_MESSAGE_BYTES + 1)
+        if not line:
+            self.close()
+            raise ConnectionError("Daemon closed the connection")
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise DaemonError(response.get('error', 'unknown error'))
+        return response
+
+    def ping(self) -> dict:
+        return self.request('ping')
+
+    def parse_file(self, logcat_file: str, all_crashes: bool = False, output_dir: Optional[str] = None,
+                   **config) -> List[dict]:
+        """Parse a logcat file on this host; returns crashes as dicts with the CrashInfo fields"""
+        return self.request('parse_file', path=os.path.abspath(logcat_file), all=all_crashes,
+                            output_dir=os.path.abspath(output_dir) if output_dir else None,
+                            config=config)['crashes']
+
+    def parse_content(self, content: str, all_crashes: bool = False, **config) -> List[dict]:
+        return self.request('parse_content', content=content, all=all_crashes, config=config)['crashes']
+
+    def symbolicate(self, frames: List[str], **config) -> List[str]:
+        return self.request('symbolicate', frames=frames, config=config)['frames']
+
+    def stats(self) -> dict:
+        return self.request('stats')['parsers']
+
+    def shutdown(self):
+        self.request('shutdown')
+        self.close()
+
+
+def _print_crash(crash: dict):
+    """Print one crash exactly like ndk_logcat_parser.print_crash_info"""
+    print(f'\nCrash Information:')
+    print(f"Process: {crash['process']}")
+    print(f"Signal: {crash['signal']}")
+    print(f"Signal Detail: {crash['signal_detail']}")
+    print('\nStack Trace:')
+    for line in crash['stack_trace']:
+        print(line.strip())
+
+
+def _run_locally(argv: List[str]):
+    """Fall back to parsing in this process, exactly as ndk_logcat_parser would"""
+    from src.ndk_logcat_parser import main as parser_main
+    sys.argv = [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ndk_logcat_parser.py')] + argv
+    parser_main()
+
+
+def main():
+    """Parse a logcat file through the daemon, taking the same arguments as ndk_logcat_parser
+
+    Arguments the daemon does not handle, or a daemon that is not running,
+    make it run ndk_logcat_parser in this process instead.
+    """
+    argv = sys.argv[1:]
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('logcat_file')
+    parser.add_argument('-s', '--symbols')
+    parser.add_argument('-n', '--ndk')
+    parser.add_argument('-o', '--output')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    parser.add_argument('--verify-build-id', action='store_true')
+    parser.add_argument('--no-line-info', action='store_true')
+    parser.add_argument('--sidecar-dir')
+    parser.add_argument('-a', '--all', action='store_true')
+    args, unknown = parser.parse_known_args(argv)
+    # 文件不存在时同样交给本地解析器输出一致的错误信息
+    if unknown or os.environ.get('NDK_SYMBOL_DAEMON') == 'off' or not os.path.isfile(args.logcat_file):
+        return _run_locally(argv)
+
+    try:
+        with DaemonClient() as client:
+            crashes = client.parse_file(
+                args.logcat_file, all_crashes=args.all, output_dir=args.output,
+                symbols_dir=os.path.abspath(args.symbols) if args.symbols else None,
+                ndk_path=args.ndk or os.environ.get('ANDROID_NDK_HOME'),
+                verify_build_id=args.verify_build_id,
+                line_info=not args.no_line_info,
+                sidecar_dir=os.path.abspath(args.sidecar_dir) if args.sidecar_dir else None
+            )
+    except (OSError, ValueError) as e:
+        if args.verbose:
+            print(f"[DEBUG] Symbolication daemon not available ({e}), parsing locally", file=sys.stderr)
+        return _run_locally(argv)
+    except DaemonError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for crash in crashes:
+        _print_crash(crash)
+    if not crashes:
+        print('No native crash found in logcat file')
+
+
+if __name__ == '__main__':
+    main()
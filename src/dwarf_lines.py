@@ -0,0 +1,354 @@
+import struct
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from .elf_symbols import read_sections
+
+# 标准操作码
+_LNS_COPY = 1
+_LNS_ADVANCE_PC = 2
+_LNS_ADVANCE_LINE = 3
+_LNS_SET_FILE = 4
+_LNS_CONST_ADD_PC = 8
+_LNS_FIXED_ADVANCE_PC = 9
+# 扩展操作码
+_LNE_END_SEQUENCE = 1
+_LNE_SET_ADDRESS = 2
+_LNE_DEFINE_FILE = 3
+# DWARF 5 目录/文件表的内容类型和数据形式
+_LNCT_PATH = 1
+_LNCT_DIRECTORY_INDEX = 2
+_FORM_FIXED = {0x0b: 1, 0x05: 2, 0x06: 4, 0x07: 8, 0x1e: 16}  # data1/2/4/8/16
+_FORM_STRING = 0x08
+_FORM_STRP = 0x0e
+_FORM_LINE_STRP = 0x1f
+_FORM_UDATA = 0x0f
+_FORM_BLOCK = 0x09
+# .debug_info 中编译单元 DIE 的属性
+_AT_STMT_LIST = 0x10
+_AT_COMP_DIR = 0x1b
+_FORM_IMPLICIT_CONST = 0x21
+_FORM_INDIRECT = 0x16
+# 其余形式的长度：整数为固定字节数，'uleb' / 'offset' / 'addr' 等按单元头部决定
+_FORM_SIZES = {
+    0x01: 'addr', 0x03: 'block2', 0x04: 'block4', 0x05: 2, 0x06: 4, 0x07: 8, 0x08: 'cstr', 0x09: 'block',
+    0x0a: 'block1', 0x0b: 1, 0x0c: 1, 0x0d: 'uleb', 0x0e: 'offset', 0x0f: 'uleb', 0x10: 'ref_addr', 0x11: 1,
+    0x12: 2, 0x13: 4, 0x14: 8, 0x15: 'uleb', 0x17: 'offset', 0x18: 'block', 0x19: 0, 0x1a: 'uleb',
+    0x1b: 'uleb', 0x1c: 4, 0x1d: 'offset', 0x1e: 16, 0x1f: 'offset', 0x20: 8, 0x21: 0, 0x22: 'uleb',
+    0x23: 'uleb', 0x24: 8, 0x25: 1, 0x26: 2, 0x27: 3, 0x28: 4, 0x29: 1, 0x2a: 2, 0x2b: 3, 0x2c: 4,
+    0x1f01: 'uleb', 0x1f02: 'uleb', 0x1f20: 'offset', 0x1f21: 'offset',
+}
+
+# (地址, 文件路径, 行号)；文件为 None 的行表示一段指令序列结束
+LineRow = Tuple[int, Optional[str], int]
+
+
+class DwarfError(Exception):
+    """Raised when a line table cannot be decoded"""
+
+
+class _Reader:
+    """Cursor over a DWARF section"""
+
+    def __init__(self, data: bytes, endian: str = '<', pos: int = 0):
+        self.data = data
+        self.endian = endian
+        self.pos = pos
+
+    def unpack(self, fmt: str):
+        values = struct.unpack_from(self.endian + fmt, self.data, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return values[0] if len(values) == 1 else values
+
+    def uint(self, size: int) -> int:
+        value = int.from_bytes(self.data[self.pos:self.pos + size], 'little' if self.endian == '<' else 'big')
+        self.pos += size
+        return value
+
+    def uleb(self) -> int:
+        result = shift = 0
+        data = self.data
+        while True:
+            byte = data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                return result
+
+    def sleb(self) -> int:
+        result = shift = 0
+        data = self.data
+        while True:
+            byte = data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                return result - (1 << shift) if byte & 0x40 else result
+
+    def cstr(self) -> str:
+        end = self.data.index(b'\0', self.pos)
+        value = self.data[self.pos:end].decode(errors='replace')
+        self.pos = end + 1
+        return value
+
+
+def _cstr_at(section: bytes, offset: int) -> str:
+    end = section.find(b'\0', offset)
+    return section[offset:end if end >= 0 else None].decode(errors='replace')
+
+
+def _join(directory: Optional[str], name: str) -> str:
+    if not directory or name.startswith('/'):
+        return name
+    return f"{directory.rstrip('/')}/{name}"
+
+
+def _skip_form(r: _Reader, form: int, offset_size: int, address_size: int, version: int):
+    size = _FORM_SIZES.get(form)
+    if size is None:
+        raise DwarfError(f"Unsupported form 0x{form:x} in compile unit")
+    if isinstance(size, int):
+        r.pos += size
+    elif size == 'uleb':
+        r.uleb()
+    elif size == 'cstr':
+        r.cstr()
+    elif size in ('offset', 'ref_addr'):
+        r.pos += address_size if size == 'ref_addr' and version == 2 else offset_size
+    elif size == 'addr':
+        r.pos += address_size
+    else:
+        length = {'block1': 1, 'block2': 2, 'block4': 4}.get(size)
+        r.pos += r.uint(length) if length else r.uleb()
+
+
+def _comp_dirs(info: bytes, abbrev: bytes, debug_str: bytes, endian: str) -> Dict[int, str]:
+    """Map the line table offset of each compile unit to its DW_AT_comp_dir
+
+    Only needed before DWARF 5, whose line tables name the compilation
+    directory themselves. Only the first DIE of each unit is decoded.
+    """
+    result = {}
+    r = _Reader(info, endian)
+    while r.pos < len(info):
+        unit_length = r.unpack('I')
+        offset_size = 4
+        if unit_length == 0xffffffff:
+            unit_length = r.unpack('Q')
+            offset_size = 8
+        unit_end = r.pos + unit_length
+        version = r.unpack('H')
+        if version >= 5:
+            unit_type, address_size = r.unpack('BB')
+            abbrev_offset = r.uint(offset_size)
+            if unit_type not in (1, 3):  # 只处理 DW_UT_compile 和 DW_UT_partial
+                r.pos = unit_end
+                continue
+        else:
+            abbrev_offset = r.uint(offset_size)
+            address_size = r.unpack('B')
+        code = r.uleb()
+        # 在缩写表中找到首个 DIE 的属性列表
+        a = _Reader(abbrev, endian, abbrev_offset)
+        attributes = None
+        while attributes is None:
+            entry_code = a.uleb()
+            if entry_code == 0:
+                break
+            a.uleb()  # tag
+            a.pos += 1  # children
+            specs = []
+            while True:
+                name, form = a.uleb(), a.uleb()
+                if name == 0 and form == 0:
+                    break
+                specs.append((name, form, a.sleb() if form == _FORM_IMPLICIT_CONST else None))
+            if entry_code == code:
+                attributes = specs
+        stmt_list = comp_dir = None
+        for name, form, _ in attributes or ():
+            while form == _FORM_INDIRECT:
+                form = r.uleb()
+            if name == _AT_STMT_LIST and form in (0x06, 0x07, 0x17):
+                stmt_list = r.uint({0x06: 4, 0x07: 8}.get(form, offset_size))
+            elif name == _AT_COMP_DIR and form == _FORM_STRING:
+                comp_dir = r.cstr()
+            elif name == _AT_COMP_DIR and form == _FORM_STRP:
+                comp_dir = _cstr_at(debug_str, r.uint(offset_size))
+            else:
+                _skip_form(r, form, offset_size, address_size, version)
+        if stmt_list is not None and comp_dir:
+            result[stmt_list] = comp_dir
+        r.pos = unit_end
+    return result
+
+
+def _read_entries(r: _Reader, offset_size: int, line_str: bytes, debug_str: bytes) -> List[dict]:
+    """Read a DWARF 5 directory or file name table"""
+    formats = [(r.uleb(), r.uleb()) for _ in range(r.unpack('B'))]
+    entries = []
+    for _ in range(r.uleb()):
+        entry = {}
+        for content_type, form in formats:
+            if form == _FORM_STRING:
+                value = r.cstr()
+            elif form in (_FORM_LINE_STRP, _FORM_STRP):
+                offset = r.uint(offset_size)
+                value = _cstr_at(line_str if form == _FORM_LINE_STRP else debug_str, offset)
+            elif form == _FORM_UDATA:
+                value = r.uleb()
+            elif form in _FORM_FIXED:
+                value = r.uint(_FORM_FIXED[form])
+            elif form == _FORM_BLOCK:
+                length = r.uleb()
+                r.pos += length
+                value = None
+            else:
+                raise DwarfError(f"Unsupported form 0x{form:x} in line table header")
+            entry[content_type] = value
+        entries.append(entry)
+    return entries
+
+
+def _parse_unit(r: _Reader, line_str: bytes, debug_str: bytes,
+                comp_dir: Optional[str] = None) -> Tuple[List[List[LineRow]], int]:
+    """Run the line number program of one unit, returning its sequences and the end of the unit"""
+    unit_length = r.unpack('I')
+    offset_size = 4
+    if unit_length == 0xffffffff:
+        unit_length = r.unpack('Q')
+        offset_size = 8
+    unit_end = r.pos + unit_length
+    version = r.unpack('H')
+    if not 2 <= version <= 5:
+        raise DwarfError(f"Unsupported line table version {version}")
+    if version >= 5:
+        r.pos += 2  # address_size, segment_selector_size
+    header_length = r.uint(offset_size)
+    program_start = r.pos + header_length
+    min_inst_length = r.unpack('B')
+    if version >= 4:
+        r.pos += 1  # maximum_operations_per_instruction（只用于 VLIW）
+    default_is_stmt, line_base, line_range, opcode_base = r.unpack('BbBB')
+    standard_lengths = r.data[r.pos:r.pos + opcode_base - 1]
+    r.pos += opcode_base - 1
+
+    if version >= 5:
+        dirs = [e.get(_LNCT_PATH) for e in _read_entries(r, offset_size, line_str, debug_str)]
+        # 目录 0 是编译目录，其余相对目录都相对于它
+        dirs = [_join(dirs[0], d) if i and d else d for i, d in enumerate(dirs)]
+        files = []
+        for e in _read_entries(r, offset_size, line_str, debug_str):
+            dir_index = e.get(_LNCT_DIRECTORY_INDEX, 0)
+            files.append(_join(dirs[dir_index] if dir_index < len(dirs) else None, e.get(_LNCT_PATH) or '??'))
+    else:
+        # 目录 0 是编译目录，不在表中，取自编译单元的 DW_AT_comp_dir
+        dirs = [comp_dir]
+        while r.data[r.pos]:
+            dirs.append(_join(comp_dir, r.cstr()))
+        r.pos += 1
+        files = [None]  # 文件从 1 开始编号
+        while r.data[r.pos]:
+            name = r.cstr()
+            dir_index = r.uleb()
+            r.uleb()
+            r.uleb()
+            files.append(_join(dirs[dir_index] if dir_index < len(dirs) else None, name))
+        r.pos += 1
+
+    sequences: List[List[LineRow]] = []
+    rows: List[LineRow] = []
+    r.pos = program_start
+    address, file, line = 0, 1, 1
+    data = r.data
+    while r.pos < unit_end:
+        opcode = data[r.pos]
+        r.pos += 1
+        if opcode >= opcode_base:
+            adjusted = opcode - opcode_base
+            address += (adjusted // line_range) * min_inst_length
+            line += line_base + adjusted % line_range
+            rows.append((address, files[file] if file < len(files) else '??', line))
+        elif opcode == 0:
+            length = r.uleb()
+            end = r.pos + length
+            sub_opcode = data[r.pos] if length else 0
+            r.pos += 1
+            if sub_opcode == _LNE_END_SEQUENCE:
+                rows.append((address, None, 0))
+                sequences.append(rows)
+                rows = []
+                address, file, line = 0, 1, 1
+            elif sub_opcode == _LNE_SET_ADDRESS:
+                address = r.uint(length - 1)
+            elif sub_opcode == _LNE_DEFINE_FILE:
+                name = r.cstr()
+                dir_index = r.uleb()
+                files.append(_join(dirs[dir_index] if dir_index < len(dirs) else None, name))
+            r.pos = end
+        elif opcode == _LNS_COPY:
+            rows.append((address, files[file] if file < len(files) else '??', line))
+        elif opcode == _LNS_ADVANCE_PC:
+            address += r.uleb() * min_inst_length
+        elif opcode == _LNS_ADVANCE_LINE:
+            line += r.sleb()
+        elif opcode == _LNS_SET_FILE:
+            file = r.uleb()
+        elif opcode == _LNS_CONST_ADD_PC:
+            address += ((255 - opcode_base) // line_range) * min_inst_length
+        elif opcode == _LNS_FIXED_ADVANCE_PC:
+            address += r.unpack('H')
+        else:
+            # 其余标准操作码（set_column、negate_stmt 等）不影响地址和行号，跳过其参数
+            for _ in range(standard_lengths[opcode - 1]):
+                r.uleb()
+    return sequences, unit_end
+
+
+def read_line_table(path: str) -> Optional[List[LineRow]]:
+    """Rows of the DWARF line table of an ELF file sorted by address, or None without .debug_line
+
+    Each row applies from its address up to the next row; rows with file
+    None end an instruction sequence. Sequences at address 0 (code the
+    linker discarded) are dropped.
+    """
+    sections = read_sections(path, ('.debug_line', '.debug_line_str', '.debug_str', '.debug_info', '.debug_abbrev'))
+    data = sections.get('.debug_line')
+    if data is None:
+        return None
+    with open(path, 'rb') as f:
+        ident = f.read(6)
+    r = _Reader(data, '>' if ident[5:6] == b'\x02' else '<')
+    line_str = sections.get('.debug_line_str', b'')
+    debug_str = sections.get('.debug_str', b'')
+    sequences: List[List[LineRow]] = []
+    try:
+        comp_dirs = {}
+        if '.debug_info' in sections and '.debug_abbrev' in sections:
+            try:
+                comp_dirs = _comp_dirs(sections['.debug_info'], sections['.debug_abbrev'], debug_str, r.endian)
+            except DwarfError as e:
+                # 没有编译目录时文件路径保持相对
+                logging.debug(f"Cannot read compile units of {path}: {e}")
+        while r.pos < len(data):
+            unit_sequences, unit_end = _parse_unit(r, line_str, debug_str, comp_dirs.get(r.pos))
+            sequences.extend(seq for seq in unit_sequences if seq and seq[0][0] != 0)
+            r.pos = unit_end
+    except (struct.error, IndexError, ValueError) as e:
+        raise DwarfError(f"Corrupt line table in {path}: {e}")
+    # 同一地址有多行时以最后一行为准（与 llvm-symbolizer 相同）；序列结束标记让位于紧接着的下一个序列
+    sequences.sort(key=lambda seq: seq[0][0])
+    rows: List[LineRow] = []
+    for seq in sequences:
+        for row in seq:
+            if rows and rows[-1][0] == row[0]:
+                rows[-1] = row
+            elif rows and rows[-1][0] > row[0]:
+                continue  # 与前一个序列重叠
+            else:
+                rows.append(row)
+    logging.debug(f"Read {len(rows)} line table rows from {path}")
+    return rows
+
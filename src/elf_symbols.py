@@ -0,0 +1,247 @@
+import ctypes
+import ctypes.util
+import mmap
+import zlib
+import struct
+import logging
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# ELF 常量
+_ELFCLASS32 = 1
+_ELFCLASS64 = 2
+_ELFDATA2MSB = 2
+_SHT_SYMTAB = 2
+_SHT_NOTE = 7
+_SHT_DYNSYM = 11
+_NT_GNU_BUILD_ID = 3
+_STT_FUNC = 2
+_STT_GNU_IFUNC = 10
+_SHN_UNDEF = 0
+_EM_ARM = 40
+_SHF_COMPRESSED = 0x800
+_ELFCOMPRESS_ZLIB = 1
+
+
+class ElfError(Exception):
+    """Raised when a file cannot be parsed as ELF"""
+
+
+def _load_cxa_demangle():
+    """Load __cxa_demangle from the C++ runtime, if one is available"""
+    for name in ('stdc++', 'c++'):
+        lib_path = ctypes.util.find_library(name)
+        if not lib_path:
+            continue
+        try:
+            lib = ctypes.CDLL(lib_path)
+            libc = ctypes.CDLL(ctypes.util.find_library('c'))
+            func = lib.__cxa_demangle
+        except (OSError, AttributeError, TypeError):
+            continue
+        func.restype = ctypes.c_void_p
+        func.argtypes = [ctypes.c_char_p, ctypes.c_char_p,
+                         ctypes.POINTER(ctypes.c_size_t), ctypes.POINTER(ctypes.c_int)]
+        libc.free.argtypes = [ctypes.c_void_p]
+        return func, libc.free
+    logging.debug("__cxa_demangle not available, C++ names will not be demangled")
+    return None, None
+
+
+_cxa_demangle, _free = _load_cxa_demangle()
+
+
+@lru_cache(maxsize=65536)
+def demangle(name: str) -> str:
+    """Demangle an Itanium C++ symbol name, returning it unchanged on failure"""
+    if not _cxa_demangle or not name.startswith('_Z'):
+        return name
+    status = ctypes.c_int()
+    ptr = _cxa_demangle(name.encode(), None, None, ctypes.byref(status))
+    if not ptr:
+        return name
+    try:
+        if status.value != 0:
+            return name
+        return ctypes.string_at(ptr).decode(errors='replace')
+    finally:
+        _free(ptr)
+
+
+def _read_sections(data: memoryview, path: str):
+    """Parse the ELF header, returning (endian, is64, machine, section headers)
+
+    Each section header is a tuple of
+    (name, type, flags, addr, offset, size, link, info, addralign, entsize).
+    """
+    if len(data) < 52 or bytes(data[:4]) != b'\x7fELF':
+        raise ElfError(f"Not an ELF file: {path}")
+    elf_class, elf_data = data[4], data[5]
+    if elf_class not in (_ELFCLASS32, _ELFCLASS64):
+        raise ElfError(f"Unsupported ELF class {elf_class}: {path}")
+    endian = '>' if elf_data == _ELFDATA2MSB else '<'
+    is64 = elf_class == _ELFCLASS64
+
+    machine, = struct.unpack_from(endian + 'H', data, 0x12)
+    if is64:
+        shoff, = struct.unpack_from(endian + 'Q', data, 0x28)
+        shentsize, shnum = struct.unpack_from(endian + 'HH', data, 0x3A)
+        sh_fmt = endian + 'IIQQQQIIQQ'
+    else:
+        shoff, = struct.unpack_from(endian + 'I', data, 0x20)
+        shentsize, shnum = struct.unpack_from(endian + 'HH', data, 0x2E)
+        sh_fmt = endian + 'IIIIIIIIII'
+    if not shoff or shoff + shnum * shentsize > len(data):
+        raise ElfError(f"Invalid section header table: {path}")
+    sections = [struct.unpack_from(sh_fmt, data, shoff + i * shentsize) for i in range(shnum)]
+    return endian, is64, machine, sections
+
+
+def _map_file(path: str) -> mmap.mmap:
+    with open(path, 'rb') as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:  # 空文件
+            raise ElfError(f"Cannot map {path}: {e}")
+
+
+def read_build_id(path: str) -> Optional[str]:
+    """Read the GNU build ID note of an ELF file as a hex string"""
+    data = _map_file(path)
+    try:
+        with memoryview(data) as view:
+            endian, _, _, sections = _read_sections(view, path)
+            for sec in sections:
+                if sec[1] != _SHT_NOTE:
+                    continue
+                pos, end = sec[4], min(sec[4] + sec[5], len(view))
+                # 遍历 note 条目：namesz, descsz, type, name（4 字节对齐）, desc（4 字节对齐）
+                while pos + 12 <= end:
+                    namesz, descsz, note_type = struct.unpack_from(endian + 'III', view, pos)
+                    name_start = pos + 12
+                    desc_start = name_start + ((namesz + 3) & ~3)
+                    if note_type == _NT_GNU_BUILD_ID and bytes(view[name_start:name_start + namesz]) == b'GNU\0':
+                        return bytes(view[desc_start:desc_start + descsz]).hex()
+                    pos = desc_start + ((descsz + 3) & ~3)
+    finally:
+        data.close()
+    return None
+
+
+def read_sections(path: str, names: Iterable[str]) -> Dict[str, bytes]:
+    """Contents of the named sections that exist in an ELF file, decompressing SHF_COMPRESSED ones"""
+    wanted = set(names)
+    result = {}
+    data = _map_file(path)
+    try:
+        with memoryview(data) as view:
+            endian, is64, _, sections = _read_sections(view, path)
+            shstrndx, = struct.unpack_from(endian + 'H', view, 0x3E if is64 else 0x32)
+            if shstrndx >= len(sections):
+                raise ElfError(f"Invalid section name table: {path}")
+            names_base = sections[shstrndx][4]
+            for sec in sections:
+                end = view.obj.find(b'\0', names_base + sec[0])
+                name = bytes(view[names_base + sec[0]:end]).decode(errors='replace')
+                if name not in wanted or sec[4] + sec[5] > len(view):
+                    continue
+                content = bytes(view[sec[4]:sec[4] + sec[5]])
+                if sec[2] & _SHF_COMPRESSED:
+                    # Elf_Chdr: ch_type 之后是解压后的大小和对齐
+                    ch_type, = struct.unpack_from(endian + 'I', content)
+                    if ch_type != _ELFCOMPRESS_ZLIB:
+                        raise ElfError(f"Unsupported compression {ch_type} of {name}: {path}")
+                    try:
+                        content = zlib.decompress(content[24 if is64 else 12:])
+                    except zlib.error as e:
+                        raise ElfError(f"Cannot decompress {name}: {path}: {e}")
+                result[name] = content
+    finally:
+        data.close()
+    return result
+
+
+class ElfSymbolTable:
+    """Function symbols of one ELF file, sorted by address for binary search"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.addrs = array('Q')  # 函数起始地址（升序）
+        self.sizes = array('Q')
+        self._names: List[str] = []
+        data = _map_file(path)
+        try:
+            with memoryview(data) as view:
+                self._load(view)
+        finally:
+            data.close()
+        logging.debug(f"Loaded {len(self.addrs)} function symbols from {path}")
+
+    def _load(self, data: memoryview):
+        endian, is64, machine, sections = _read_sections(data, self.path)
+        sym_fmt = endian + ('IBBHQQ' if is64 else 'IIIBBH')
+        shnum = len(sections)
+        # .symtab 优先于 .dynsym，同一地址只保留先出现的符号
+        sym_sections = sorted((s for s in sections if s[1] in (_SHT_SYMTAB, _SHT_DYNSYM)),
+                              key=lambda s: s[1] != _SHT_SYMTAB)
+        thumb_mask = ~1 if machine == _EM_ARM else ~0
+
+        symbols = {}
+        for sec in sym_sections:
+            offset, size, link = sec[4], sec[5], sec[6]
+            if link >= shnum or offset + size > len(data):
+                continue
+            strtab = sections[link]
+            str_base = strtab[4]
+            strings = data[str_base:str_base + strtab[5]].tobytes()
+            entsize = struct.calcsize(sym_fmt)
+            table = data[offset:offset + size - size % entsize]
+            for entry in struct.iter_unpack(sym_fmt, table):
+                if is64:
+                    st_name, st_info, _, st_shndx, st_value, st_size = entry
+                else:
+                    st_name, st_value, st_size, st_info, _, st_shndx = entry
+                if st_info & 0xf not in (_STT_FUNC, _STT_GNU_IFUNC) or st_shndx == _SHN_UNDEF:
+                    continue
+                addr = st_value & thumb_mask
+                if addr in symbols:
+                    continue
+                end = strings.find(b'\0', st_name)
+                name = strings[st_name:end if end >= 0 else None].decode(errors='replace')
+                if name:
+                    symbols[addr] = (st_size, name)
+
+        for addr in sorted(symbols):
+            size, name = symbols[addr]
+            self.addrs.append(addr)
+            self.sizes.append(size)
+            self._names.append(name)
+
+    def __len__(self) -> int:
+        return len(self.addrs)
+
+    def name(self, index: int) -> str:
+        """Demangled name of the symbol at index"""
+        return demangle(self._names[index])
+
+    def find(self, addr: int) -> int:
+        """Index of the function containing addr, or -1"""
+        i = bisect_right(self.addrs, addr) - 1
+        if i < 0:
+            return -1
+        size = self.sizes[i]
+        if size and addr >= self.addrs[i] + size:
+            return -1
+        # 没有大小信息的最后一个符号无法确定范围
+        if not size and i == len(self.addrs) - 1:
+            return -1
+        return i
+
+    def lookup(self, addr: int) -> Optional[Tuple[str, int]]:
+        """Return (function name, offset into function) for addr"""
+        i = self.find(addr)
+        if i < 0:
+            return None
+        return self.name(i), addr - self.addrs[i]
@@ -0,0 +1,239 @@
+import os
+import re
+import gzip
+import json
+import time
+import logging
+import threading
+from typing import BinaryIO, List, Optional
+
+from .ndk_logcat_parser import CrashInfo
+from .stats import Stats
+
+# ndk-stack 输出中的栈帧行，例如 "#00 0x0000000000001120 /data/app/.../libfoo.so (BuildId: ...)"
+_NDK_STACK_FRAME = re.compile(
+    r'^\s*#(?P<num>\d+)\s+0x(?P<addr>[0-9a-f]+)\s+(?P<lib>\S+)(?:.*?\(BuildId:\s*(?P<build_id>[0-9a-f]+)\))?'
+)
+_NDK_STACK_PROCESS = re.compile(r'>>>\s*(?P<process>.+?)\s*<<<')
+_NDK_STACK_SIGNAL = re.compile(r'^signal\s+(?P<signal>\d+)\s+\((?P<name>[^)]+)\)(?P<detail>.*)$')
+
+SCHEMA_VERSION = 1
+
+
+def crash_record(crash_info: CrashInfo, source: Optional[str] = None, index: int = 0) -> dict:
+    """JSON Lines record of a crash found in a logcat file"""
+    return {
+        'schema': SCHEMA_VERSION,
+        'kind': 'logcat',
+        'source': source,
+        'index': index,
+        'process': crash_info.process,
+        'signal': crash_info.signal,
+        'signal_detail': crash_info.signal_detail,
+        'frames': [frame.to_dict() for frame in crash_info.frames],
+        'timings': {name: round(seconds, 6) for name, seconds in crash_info.timings.items()},
+        'timestamp': crash_info.timestamp,
+        'bucket': crash_info.bucket,
+    }
+
+
+def dump_record(dump_file: str, output: str, status: str = 'ok', duration: float = 0.0,
+                error: Optional[str] = None, queue_wait: float = 0.0) -> dict:
+    """JSON Lines record of a dump symbolicated by ndk-stack, with the frames parsed from its output"""
+    record = {
+        'schema': SCHEMA_VERSION,
+        'kind': 'dump',
+        'source': dump_file,
+        'index': 0,
+        'status': status,
+        'process': None,
+        'signal': None,
+        'signal_detail': None,
+        'frames': [],
+        'timings': {'ndk_stack': round(duration, 6)},
+    }
+    if queue_wait:
+        record['timings']['queue_wait'] = round(queue_wait, 6)
+    if error:
+        record['error'] = error
+    frame = None
+    for line in output.splitlines():
+        match = _NDK_STACK_FRAME.match(line)
+        if match:
+            frame = {
+                'index': int(match.group('num')),
+                'addr': match.group('addr'),
+                'lib': match.group('lib'),
+                'build_id': match.group('build_id'),
+                'symbol': None,
+                'resolved': None,
+            }
+            record['frames'].append(frame)
+            continue
+        if frame is not None and line.startswith(' ') and line.strip():
+            # ndk-stack 把函数名和源码位置缩进写在栈帧下方
+            resolved = line.strip()
+            frame['resolved'] = f"{frame['resolved']} at {resolved}" if frame['resolved'] else resolved
+            continue
+        frame = None
+        if record['process'] is None and '>>>' in line:
+            match = _NDK_STACK_PROCESS.search(line)
+            if match:
+                record['process'] = match.group('process')
+        elif record['signal'] is None and line.startswith('signal '):
+            match = _NDK_STACK_SIGNAL.match(line)
+            if match:
+                record['signal'] = f"signal {match.group('signal')} ({match.group('name')})"
+                record['signal_detail'] = line
+    return record
+
+
+class JsonlSink:
+    """Buffered JSON Lines output for crash records, optionally gzip compressed and rotated by size
+
+    Records are serialized as they arrive and written in batches of
+    batch_size records or BATCH_BYTES (a quarter of max_bytes at most); a
+    background thread writes whatever is queued once it is flush_interval
+    seconds old, also when no further records arrive (0 disables it), and
+    flush() writes it immediately. A path ending in .gz is compressed;
+    idle and explicit flushes also flush the compressor so the records
+    can be read while the file is still open. With max_bytes set the output is split into
+    numbered parts (crashes.00000.jsonl.gz, crashes.00001.jsonl.gz, ...)
+    of about that size on disk, numbered after any existing parts; without
+    it records are appended to path. Safe to share between threads.
+    """
+
+    BATCH_BYTES = 1024 * 1024
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None, batch_size: int = 256,
+                 flush_interval: float = 5.0, compress: Optional[bool] = None, stats: Optional[Stats] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.compress = path.endswith('.gz') if compress is None else compress
+        self.stats = stats or Stats(enabled=False)
+        self.records = 0
+        self.files: List[str] = []  # 已写入的文件，按顺序
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        # 每批不超过文件大小上限的 1/4，轮转时的超出量有限
+        self._batch_bytes = min(self.BATCH_BYTES, max_bytes // 4) if max_bytes else self.BATCH_BYTES
+        self._last_flush = time.monotonic()
+        self._raw: Optional[BinaryIO] = None
+        self._out: Optional[BinaryIO] = None
+        self._part = None
+        self._lock = threading.Lock()
+        self._unsynced = False  # 压缩缓冲中有尚未写到文件的数据
+        self._closed = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _part_name(self, part: int) -> str:
+        base = self.path[:-3] if self.path.endswith('.gz') else self.path
+        stem, ext = os.path.splitext(base)
+        return f"{stem}.{part:05d}{ext or '.jsonl'}" + ('.gz' if self.path.endswith('.gz') else '')
+
+    def _next_part(self) -> int:
+        """First part number after the parts left by earlier runs"""
+        part = 0
+        while os.path.exists(self._part_name(part)):
+            part += 1
+        return part
+
+    def _open(self):
+        if self.max_bytes:
+            self._part = self._next_part() if self._part is None else self._part + 1
+            file_name = self._part_name(self._part)
+        else:
+            file_name = self.path
+        self._raw = open(file_name, 'ab')
+        # gzip 以追加方式打开时会新增一个 member，gzip/zcat 可以直接读取
+        self._out = gzip.GzipFile(fileobj=self._raw, mode='ab', compresslevel=6) if self.compress else self._raw
+        self.files.append(file_name)
+        logging.info(f"Writing JSON Lines records to: {file_name}")
+
+    def _close_file(self):
+        if self._out is not None:
+            if self._out is not self._raw:
+                self._out.close()
+            self._raw.close()
+            self._out = self._raw = None
+            self._unsynced = False
+
+    def write(self, record: dict):
+        """Queue one record, writing the batch when it is full or old enough"""
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self._pending.append(line)
+            self._pending_bytes += len(line)
+            self.records += 1
+            if self._flusher is None and self.flush_interval > 0 and not self._closed.is_set():
+                # 第一条记录到达时才启动，未使用的输出不占线程
+                self._flusher = threading.Thread(target=self._flush_periodically, name='jsonl-flush', daemon=True)
+                self._flusher.start()
+            if len(self._pending) >= self.batch_size or self._pending_bytes >= self._batch_bytes \
+                    or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def write_crash(self, crash_info: CrashInfo, source: Optional[str] = None, index: int = 0):
+        self.write(crash_record(crash_info, source, index))
+
+    def _flush_periodically(self):
+        """Write queued records every flush_interval seconds until close"""
+        wait = self.flush_interval
+        while not self._closed.wait(wait):
+            try:
+                with self._lock:
+                    wait = self._last_flush + self.flush_interval - time.monotonic()
+                    if wait <= 0:
+                        self._flush_locked(sync=True)
+                        wait = self.flush_interval
+            except Exception:  # 写入失败不能让线程退出，下次仍然重试
+                logging.exception(f"Failed to flush JSON Lines records to {self.path}")
+                wait = self.flush_interval
+
+    def _flush_locked(self, sync: bool = False):
+        self._last_flush = time.monotonic()
+        if self._pending:
+            data = ('\n'.join(self._pending) + '\n').encode()
+            count = len(self._pending)
+            self._pending = []
+            self._pending_bytes = 0
+            with self.stats.stage('write'):
+                if self._out is None:
+                    self._open()
+                self._out.write(data)
+                if not self.compress:
+                    self._out.flush()
+                else:
+                    self._unsynced = True
+            self.stats.incr('records_written', count)
+            self.stats.incr('bytes_written', len(data))
+        if sync and self._unsynced and self._out is not None:
+            # GzipFile.flush() 以 Z_SYNC_FLUSH 写出压缩缓冲，只在空闲或显式 flush 时使用
+            self._out.flush()
+            self._unsynced = False
+        # 压缩数据在 GzipFile 内部有少量缓冲，文件大小按已落盘的部分计算
+        if self.max_bytes and self._out is not None and self._raw.tell() >= self.max_bytes:
+            self._close_file()
+
+    def flush(self):
+        """Write queued records now"""
+        with self._lock:
+            self._flush_locked(sync=True)
+
+    def close(self):
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        with self._lock:
+            self._flush_locked()
+            self._close_file()
@@ -0,0 +1,107 @@
+import os
+import gzip
+import zipfile
+import logging
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，只有读取 .zst 文件时才需要
+    zstandard = None
+
+# 可以直接读取的压缩格式
+COMPRESSED_SUFFIXES = ('.gz', '.zst', '.zip')
+
+
+@dataclass
+class LogStream:
+    """One readable log inside a file: the file itself, or a member of a zip archive"""
+    name: str
+    kind: str  # 'logcat' 或 'tombstone'
+    file: BinaryIO
+
+
+def is_compressed(path: str) -> bool:
+    return path.lower().endswith(COMPRESSED_SUFFIXES)
+
+
+def _open_zstd(fileobj: BinaryIO) -> BinaryIO:
+    if zstandard is None:
+        raise RuntimeError("Reading .zst files requires the zstandard package (pip install zstandard)")
+    # 日志可能由多个 zstd frame 拼接而成
+    return zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True, closefd=True)
+
+
+def _decompress(name: str, fileobj: BinaryIO) -> BinaryIO:
+    """Wrap a binary stream in a decompressor chosen by the name's suffix"""
+    lower = name.lower()
+    if lower.endswith('.gz'):
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    if lower.endswith('.zst'):
+        return _open_zstd(fileobj)
+    return fileobj
+
+
+def open_log(path: str) -> BinaryIO:
+    """Open a plain, .gz or .zst log file as a binary stream of its decompressed content"""
+    lower = path.lower()
+    if lower.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if lower.endswith('.zst'):
+        return _open_zstd(open(path, 'rb'))
+    return open(path, 'rb')
+
+
+def _member_kind(name: str) -> Optional[str]:
+    """Kind of a zip member worth scanning, or None to skip it"""
+    lower = name.lower()
+    base = os.path.basename(lower)
+    if base.endswith(('.gz', '.zst')):
+        base = base.rsplit('.', 1)[0]
+    if 'tombstones/' in lower and base.startswith('tombstone'):
+        # Android 12 起同时有 tombstone_NN.pb，只读取文本版本
+        return None if base.endswith('.pb') else 'tombstone'
+    if base.startswith('bugreport') and base.endswith('.txt'):
+        return 'logcat'  # dumpstate 主文件，包含 SYSTEM LOG 等 logcat 段
+    if 'logcat' in base or base.endswith('.log'):
+        return 'logcat'
+    return None
+
+
+def _zip_members(archive: zipfile.ZipFile) -> List[Tuple[str, str]]:
+    """(name, kind) of the members to scan, logcats before tombstones
+
+    Archives that are not bugreports (no known log member) fall back to
+    every .txt member.
+    """
+    names = [info.filename for info in archive.infolist() if not info.is_dir()]
+    members = [(name, _member_kind(name)) for name in names]
+    members = [(name, kind) for name, kind in members if kind]
+    if not members:
+        members = [(name, 'logcat') for name in names if name.lower().endswith('.txt')]
+    # logcat 中的崩溃带有信号信息，优先于同一崩溃的 tombstone
+    members.sort(key=lambda member: member[1] == 'tombstone')
+    return members
+
+
+def iter_log_streams(path: str) -> Iterator[LogStream]:
+    """Yield the logs to scan in a file, decompressing as they are read
+
+    A plain, .gz or .zst file is a single logcat stream. For a .zip (such
+    as an `adb bugreport` archive) each logcat and tombstone member is
+    streamed straight out of the archive, without extracting it to disk.
+    Each stream is closed when the next one is requested.
+    """
+    if not path.lower().endswith('.zip'):
+        with open_log(path) as f:
+            yield LogStream(path, 'logcat', f)
+        return
+
+    with zipfile.ZipFile(path) as archive:
+        members = _zip_members(archive)
+        logging.info(f"Found {len(members)} log members in {path}")
+        for name, kind in members:
+            logging.debug(f"Reading {kind} member: {name}")
+            with _decompress(name, archive.open(name)) as f:
+                yield LogStream(f"{path}!{name}", kind, f)
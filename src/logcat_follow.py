@@ -0,0 +1,384 @@
+import os
+import sys
+import json
+import time
+import queue
+import signal
+import logging
+import argparse
+import threading
+from dataclasses import dataclass, asdict
+from typing import BinaryIO, Iterator, Optional, Tuple, Union
+
+# 避免循环导入
+if __name__ == '__main__':
+    # 当作为主程序运行时，添加父目录到 Python 路径
+    parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+
+from src.ndk_logcat_parser import LogcatParser, CrashInfo, _LogcatScanner, _BYTE_KEYWORDS, print_crash_info
+from src.stats import Stats, print_stats
+
+# 文件被轮转或截断，后续数据从新文件开头读取
+_ROTATED = object()
+
+
+@dataclass
+class Checkpoint:
+    """Where to resume following a file
+
+    offset is the start of the crash being collected when the checkpoint
+    was written, or the end of the last complete line, so a crash that was
+    cut off by a restart is parsed again in full.
+    """
+    path: str
+    device: int
+    inode: int
+    offset: int
+    package: Optional[str] = None  # 最近一次 PROCESS STARTED 的包名
+    version: int = 1
+
+    @classmethod
+    def load(cls, checkpoint_file: str) -> Optional['Checkpoint']:
+        try:
+            with open(checkpoint_file) as f:
+                data = json.load(f)
+            if data.get('version') != cls.version:
+                return None
+            return cls(**data)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as e:
+            logging.warning(f"Ignoring unreadable checkpoint {checkpoint_file}: {e}")
+            return None
+
+    def save(self, checkpoint_file: str):
+        # 先写临时文件再替换，进程被杀时也不会留下半个检查点
+        tmp_file = f'{checkpoint_file}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(asdict(self), f)
+        os.replace(tmp_file, checkpoint_file)
+
+
+class LogcatFollower:
+    """Incremental crash detection on a growing logcat file or a live stream
+
+    Each crash is yielded as soon as its stack trace ends: at the next
+    unrelated line, or after idle_flush seconds without new data. A crash
+    whose frames never arrive is ended after idle_flush seconds or
+    _LogcatScanner.MAX_LINES_BEFORE_FRAMES lines, so the checkpoint keeps
+    moving. When
+    following a file, the byte offset is checkpointed so a restarted job
+    only reads new data; rotation (a new inode) and truncation are
+    detected and reading restarts at the top of the new file. While idle
+    the file is polled with a backoff of up to poll_interval seconds.
+    Delivery is at least once: a crash emitted just before a crash may be
+    emitted again after a restart.
+    """
+
+    BLOCK_SIZE = 64 * 1024
+    MIN_POLL_INTERVAL = 0.05
+
+    def __init__(self, parser: LogcatParser, checkpoint_file: Optional[str] = None,
+                 poll_interval: float = 1.0, idle_flush: float = 2.0):
+        self.parser = parser
+        self.checkpoint_file = checkpoint_file
+        self.poll_interval = max(self.MIN_POLL_INTERVAL, poll_interval)
+        self.idle_flush = idle_flush
+        self._stop = threading.Event()
+        self._identity: Optional[Tuple[int, int]] = None  # 当前文件的 (st_dev, st_ino)
+        self._path: Optional[str] = None
+        self._saved: Optional[Checkpoint] = None
+
+    def stop(self):
+        """Make follow() return at the next poll; the checkpoint is saved first"""
+        self._stop.set()
+
+    def follow(self, source: Union[str, BinaryIO], from_end: bool = False) -> Iterator[CrashInfo]:
+        """Follow a file path, or '-' / a binary stream such as stdin, yielding each crash"""
+        if source == '-':
+            source = sys.stdin.buffer
+        if isinstance(source, str):
+            return self.follow_file(source, from_end=from_end)
+        return self.follow_stream(source)
+
+    def follow_file(self, path: str, from_end: bool = False) -> Iterator[CrashInfo]:
+        """Follow a growing file, resuming from the checkpoint when it is for the same file"""
+        self._path = os.path.abspath(path)
+        offset, package = 0, None
+        checkpoint = Checkpoint.load(self.checkpoint_file) if self.checkpoint_file else None
+        st = self._wait_for_file(self._path)
+        if st is None:
+            return
+        if checkpoint and checkpoint.path == self._path and (checkpoint.device, checkpoint.inode) == (st.st_dev, st.st_ino) \
+                and checkpoint.offset <= st.st_size:
+            offset, package = checkpoint.offset, checkpoint.package
+            logging.info(f"Resuming {path} at byte {offset}")
+        elif checkpoint:
+            logging.info(f"Checkpoint does not match the current {path}, starting over")
+        elif from_end:
+            offset = st.st_size
+        yield from self._run(self._file_chunks(self._path, offset), offset, package, flush_at_end=False)
+
+    def follow_stream(self, stream: BinaryIO) -> Iterator[CrashInfo]:
+        """Follow a pipe until end of input; no checkpoint is kept for streams"""
+        self._path = None
+        return self._run(self._stream_chunks(stream), 0, None, flush_at_end=True)
+
+    def _wait_for_file(self, path: str) -> Optional[os.stat_result]:
+        while not self._stop.is_set():
+            try:
+                return os.stat(path)
+            except FileNotFoundError:
+                self._stop.wait(self.poll_interval)
+        return None
+
+    def _file_chunks(self, path: str, offset: int) -> Iterator[object]:
+        """Yield new data of a file, None when idle and _ROTATED when it is replaced or truncated"""
+        f = open(path, 'rb')
+        try:
+            st = os.fstat(f.fileno())
+            self._identity = (st.st_dev, st.st_ino)
+            f.seek(offset)
+            delay = self.MIN_POLL_INTERVAL
+            while not self._stop.is_set():
+                chunk = f.read(self.BLOCK_SIZE)
+                if chunk:
+                    delay = self.MIN_POLL_INTERVAL
+                    yield chunk
+                    continue
+
+                # 读到文件末尾：检查文件是否被轮转（新 inode）或截断
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    st = None
+                if st is not None and (st.st_dev, st.st_ino) != self._identity:
+                    logging.info(f"{path} was rotated, reading the new file")
+                    f.close()
+                    f = open(path, 'rb')
+                    st = os.fstat(f.fileno())
+                    self._identity = (st.st_dev, st.st_ino)
+                    yield _ROTATED
+                    continue
+                if st is not None and st.st_size < f.tell():
+                    logging.info(f"{path} was truncated, reading from the start")
+                    f.seek(0)
+                    yield _ROTATED
+                    continue
+
+                yield None
+                # 空闲时逐步拉长轮询间隔，降低 CPU 占用
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.poll_interval)
+        finally:
+            f.close()
+
+    def _stream_chunks(self, stream: BinaryIO) -> Iterator[object]:
+        """Yield data of a stream as it arrives and None while idle, until end of input"""
+        chunks: 'queue.Queue[bytes]' = queue.Queue(maxsize=64)
+        read = getattr(stream, 'read1', stream.read)
+
+        def reader():
+            # 阻塞读放在后台线程中，主循环可以按时处理空闲刷新
+            try:
+                while True:
+                    chunk = read(self.BLOCK_SIZE)
+                    chunks.put(chunk)
+                    if not chunk:
+                        break
+            except (OSError, ValueError) as e:
+                logging.error(f"Failed to read input stream: {e}")
+                chunks.put(b'')
+
+        threading.Thread(target=reader, name='logcat-follow-reader', daemon=True).start()
+        while not self._stop.is_set():
+            try:
+                chunk = chunks.get(timeout=self.poll_interval)
+            except queue.Empty:
+                yield None
+                continue
+            if not chunk:
+                return
+            yield chunk
+
+    def _save_checkpoint(self, offset: int, package: Optional[str]):
+        if not self.checkpoint_file or not self._path or not self._identity:
+            return
+        checkpoint = Checkpoint(path=self._path, device=self._identity[0], inode=self._identity[1],
+                                offset=offset, package=package)
+        if checkpoint == self._saved:
+            return
+        try:
+            checkpoint.save(self.checkpoint_file)
+            self._saved = checkpoint
+        except OSError as e:
+            logging.warning(f"Failed to save checkpoint {self.checkpoint_file}: {e}")
+
+    def _run(self, chunks: Iterator[object], offset: int, package: Optional[str],
+             flush_at_end: bool) -> Iterator[CrashInfo]:
+        """Split chunks into lines and feed them to the scanner, tracking byte offsets"""
+        parser = self.parser
+        stats = parser.stats
+        scanner = _LogcatScanner(parser)
+        scanner.current_package = package
+        buf = b''
+        pending_start: Optional[int] = None  # 正在收集的崩溃在文件中的起始偏移
+        pending_lines = 0  # 该崩溃开始后读到的行数，收到栈帧前超过上限就结束它
+        last_data = time.monotonic()
+
+        def resume_offset() -> int:
+            return pending_start if pending_start is not None else offset
+
+        try:
+            for chunk in chunks:
+                if chunk is _ROTATED:
+                    # 旧文件最后一行没有换行符，可能正好结束一个崩溃
+                    if buf:
+                        crash_info = scanner.feed(buf.decode('utf-8', 'replace'))
+                        if crash_info:
+                            yield parser._finish_crash(crash_info)
+                    buf, offset = b'', 0
+                    # 跨越轮转的崩溃无法从旧文件恢复，检查点只能指向新文件开头
+                    pending_start = 0 if scanner.crash_info is not None or scanner.collecting_stack else None
+                    continue
+
+                if chunk is None:
+                    # 一段时间没有新数据：正在收集的崩溃视为结束，没有栈帧的也一样
+                    if pending_start is not None and time.monotonic() - last_data >= self.idle_flush:
+                        crash_info = scanner.finish()
+                        pending_start = None
+                        if crash_info:
+                            yield parser._finish_crash(crash_info)
+                    self._save_checkpoint(resume_offset(), scanner.current_package)
+                    continue
+
+                last_data = time.monotonic()
+                stats.incr('bytes_read', len(chunk))
+                data = buf + chunk if buf else chunk
+                pos = 0
+                while True:
+                    end = data.find(b'\n', pos) + 1
+                    if not end:
+                        break
+                    line_start = offset + pos
+                    line = data[pos:end]
+                    pos = end
+                    if pending_start is not None and not scanner.seen_frame:
+                        pending_lines += 1
+                        # 只有 Cmdline / >>> 行而迟迟没有堆栈的崩溃不收集行，扫描器的上限管不到它
+                        if pending_lines > scanner.MAX_LINES_BEFORE_FRAMES and not scanner.collecting_stack:
+                            crash_info = scanner.finish()
+                            pending_start = None
+                            if crash_info:
+                                yield parser._finish_crash(crash_info)
+                    # 与 _candidate_lines 相同的预过滤：不需要的行不解码
+                    if not scanner.collecting_stack and not any(k in line for k in _BYTE_KEYWORDS):
+                        continue
+                    crash_info = scanner.feed(line.decode('utf-8', 'replace'))
+                    if scanner.crash_info is not None or scanner.collecting_stack:
+                        if pending_start is None or crash_info:
+                            pending_start = line_start
+                            pending_lines = 0
+                    else:
+                        pending_start = None
+                    if crash_info:
+                        yield parser._finish_crash(crash_info)
+                        self._save_checkpoint(resume_offset() if pending_start is not None else offset + pos,
+                                              scanner.current_package)
+                buf = data[pos:]
+                offset += pos
+
+            if flush_at_end:
+                if buf:
+                    crash_info = scanner.feed(buf.decode('utf-8', 'replace'))
+                    if crash_info:
+                        yield parser._finish_crash(crash_info)
+                crash_info = scanner.finish()
+                if crash_info:
+                    yield parser._finish_crash(crash_info)
+        finally:
+            self._save_checkpoint(resume_offset(), scanner.current_package)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Follow a growing logcat file or a live stream and report each native crash as soon as it is complete.',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+        Examples:
+          %(prog)s -s /path/to/symbols --checkpoint run.ckpt device.log   # Follow a file, resumable
+          adb logcat | %(prog)s -s /path/to/symbols -                     # Follow a live stream
+        '''
+    )
+    parser.add_argument('source', help="Logcat file to follow, or '-' for stdin")
+    parser.add_argument('-s', '--symbols', help='Path to the directory containing symbol files', metavar='DIR')
+    parser.add_argument('-n', '--ndk', help='Path to Android NDK installation. Defaults to ANDROID_NDK_HOME.', metavar='PATH')
+    parser.add_argument('-o', '--output', help='Append parsed crashes to <output>/<name>.parsed.txt', metavar='DIR')
+    parser.add_argument('--checkpoint', help='File to keep the read offset in, to resume after a restart', metavar='FILE')
+    parser.add_argument('--from-end', action='store_true', help='Without a checkpoint, skip data already in the file')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='Maximum seconds between polls of an idle file (default: 1.0)', metavar='SEC')
+    parser.add_argument('--idle-flush', type=float, default=2.0,
+                        help='Report a crash whose stack got no new lines for this many seconds (default: 2.0)', metavar='SEC')
+    parser.add_argument('--verify-build-id', action='store_true', help='Enable Build ID verification')
+    parser.add_argument('--no-line-info', action='store_true', help='Only resolve function name and offset')
+    parser.add_argument('--cache-dir', help='Directory of the persistent symbolication cache', metavar='DIR')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the persistent symbolication cache')
+    parser.add_argument('--stats', choices=['text', 'json'], help='Print timings and counters to stderr when done')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose logging')
+    args = parser.parse_args()
+    args.verbose = args.verbose or os.environ.get('VERBOSE') == '1'
+    return args
+
+
+def main():
+    """Main entry point"""
+    args = parse_args()
+    logcat_parser = LogcatParser(
+        symbols_dir=args.symbols,
+        ndk_path=args.ndk or os.environ.get('ANDROID_NDK_HOME'),
+        output_dir=args.output,
+        verbose=args.verbose,
+        verify_build_id=args.verify_build_id,
+        line_info=not args.no_line_info,
+        cache_dir=args.cache_dir,
+        persistent_cache=not args.no_cache,
+        stats=Stats() if args.stats else None
+    )
+    follower = LogcatFollower(logcat_parser, checkpoint_file=args.checkpoint,
+                              poll_interval=args.poll_interval, idle_flush=args.idle_flush)
+    # 设备农场的任务通常以 SIGTERM 结束，此时同样保存检查点后退出
+    signal.signal(signal.SIGTERM, lambda signum, frame: follower.stop())
+    name = 'stdin' if args.source == '-' else args.source
+    out = None
+    crash_count = 0
+    with logcat_parser:
+        try:
+            for crash_info in follower.follow(args.source, from_end=args.from_end):
+                crash_count += 1
+                print_crash_info(crash_info)
+                sys.stdout.flush()
+                if args.output:
+                    if out is None:
+                        output_file = logcat_parser._output_file(name)
+                        logging.info(f"Appending parsed output to file: {output_file}")
+                        out = open(output_file, 'a')
+                    else:
+                        out.write('\n')
+                    logcat_parser._write_crash(out, crash_info)
+                    out.flush()
+        except KeyboardInterrupt:
+            follower.stop()
+        finally:
+            if out:
+                out.close()
+    logging.info(f"Stopped following {name}, {crash_count} crashes found")
+    if args.stats:
+        print_stats(logcat_parser.stats, args.stats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+import os
+import json
+import hashlib
+import logging
+from bisect import bisect_left
+from dataclasses import dataclass, astuple
+from typing import List, Optional, Tuple
+
+from .utils import default_cache_dir
+
+
+@dataclass
+class IndexedCrash:
+    """Byte range of one crash in a logcat file, with the fields queries filter on"""
+    offset: int  # 崩溃首行（Fatal signal / >>> / Cmdline）的偏移
+    end_offset: int  # 结束崩溃的那一行的偏移，崩溃的行都在它之前
+    process: str
+    pid: Optional[int]
+    signal: str
+    timestamp: Optional[str]
+
+
+@dataclass
+class ProcessEvent:
+    """A PROCESS STARTED or PROCESS ENDED line"""
+    offset: int
+    kind: str  # 'started' 或 'ended'
+    package: str
+    pid: Optional[int]
+    timestamp: Optional[str]
+
+
+def crash_matches(crash, package: Optional[str] = None, pid: Optional[int] = None,
+                  since: Optional[str] = None, until: Optional[str] = None) -> bool:
+    """Whether a crash (IndexedCrash or CrashInfo) passes the query filters
+
+    package also matches its other processes (``com.example:remote``).
+    since / until compare logcat timestamps as text in the log's own format
+    (e.g. ``01-01 12:00``); until is inclusive, so a prefix covers the whole
+    minute or second. A crash without a timestamp never passes a time filter.
+    """
+    if package and crash.process != package and not crash.process.startswith(package + ':'):
+        return False
+    if pid is not None and crash.pid != pid:
+        return False
+    if since or until:
+        timestamp = crash.timestamp
+        if not timestamp:
+            return False
+        if since and timestamp < since:
+            return False
+        if until and timestamp[:len(until)] > until:
+            return False
+    return True
+
+
+# 指纹覆盖的文件首尾字节数
+_FINGERPRINT_BYTES = 4096
+
+
+def _fingerprint(path: str, size: int) -> str:
+    """Hash of the first and last bytes of a file, catching rewrites that keep its size and mtime"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        digest.update(f.read(_FINGERPRINT_BYTES))
+        f.seek(max(0, size - _FINGERPRINT_BYTES))
+        digest.update(f.read(_FINGERPRINT_BYTES))
+    return digest.hexdigest()
+
+
+def index_path(logcat_file: str, cache_dir: Optional[str] = None) -> str:
+    """Where the index of a logcat file is kept: <cache dir>/logcat-index/<hash of its path>.json"""
+    digest = hashlib.sha1(os.path.abspath(logcat_file).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir or default_cache_dir(), 'logcat-index', f'{digest}.json')
+
+
+class LogcatIndex:
+    """Offsets of the crashes and process events of one plain logcat file
+
+    Recorded by LogcatParser while it scans the whole file, and stored as a
+    small JSON sidecar keyed by the log's path. It stays valid only while
+    the file's size, mtime and first and last bytes are unchanged; until
+    then queries seek to the crashes they select instead of scanning the
+    file again.
+    """
+
+    VERSION = 1
+
+    def __init__(self, logcat_file: str, size: int, mtime_ns: int, fingerprint: str):
+        self.logcat_file = os.path.abspath(logcat_file)
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.fingerprint = fingerprint
+        self.crashes: List[IndexedCrash] = []
+        self.events: List[ProcessEvent] = []
+        self._started: Optional[Tuple[List[int], List[str]]] = None  # PROCESS STARTED 的偏移和包名
+
+    @classmethod
+    def for_file(cls, logcat_file: str) -> 'LogcatIndex':
+        """An empty index for the current state of a file"""
+        st = os.stat(logcat_file)
+        return cls(logcat_file, st.st_size, st.st_mtime_ns, _fingerprint(logcat_file, st.st_size))
+
+    def is_current(self) -> bool:
+        """Whether the file still has the size, mtime and head and tail bytes it had when indexed"""
+        try:
+            st = os.stat(self.logcat_file)
+            if st.st_size != self.size or st.st_mtime_ns != self.mtime_ns:
+                return False
+            return _fingerprint(self.logcat_file, st.st_size) == self.fingerprint
+        except OSError:
+            return False
+
+    def package_at(self, offset: int) -> Optional[str]:
+        """Package of the last PROCESS STARTED line before offset"""
+        if self._started is None:
+            started = [event for event in self.events if event.kind == 'started']
+            self._started = ([event.offset for event in started], [event.package for event in started])
+        offsets, packages = self._started
+        i = bisect_left(offsets, offset)
+        return packages[i - 1] if i else None
+
+    def select(self, package: Optional[str] = None, pid: Optional[int] = None,
+               since: Optional[str] = None, until: Optional[str] = None) -> List[IndexedCrash]:
+        """Crashes passing the filters of crash_matches, in file order"""
+        return [crash for crash in self.crashes if crash_matches(crash, package, pid, since, until)]
+
+    def save(self, path: str):
+        data = {
+            'version': self.VERSION,
+            'logcat_file': self.logcat_file,
+            'size': self.size,
+            'mtime_ns': self.mtime_ns,
+            'fingerprint': self.fingerprint,
+            # 每条记录存为数组，保持索引文件紧凑
+            'crashes': [astuple(crash) for crash in self.crashes],
+            'events': [astuple(event) for event in self.events],
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再替换，避免并发进程读到写了一半的索引
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, logcat_file: str) -> Optional['LogcatIndex']:
+        """The stored index of logcat_file, or None if missing, unreadable or out of date"""
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') != cls.VERSION or data.get('logcat_file') != os.path.abspath(logcat_file):
+                return None
+            index = cls(logcat_file, data['size'], data['mtime_ns'], data['fingerprint'])
+            index.crashes = [IndexedCrash(*values) for values in data['crashes']]
+            index.events = [ProcessEvent(*values) for values in data['events']]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.debug(f"Ignoring unreadable logcat index {path}: {e}")
+            return None
+        if not index.is_current():
+            logging.debug(f"Logcat index of {logcat_file} is out of date")
+            return None
+        return index
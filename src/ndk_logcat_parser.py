@@ -1,11 +1,14 @@
+import io
 import re
+import itertools
 import os
-import subprocess
-from typing import List, Optional, Dict, Tuple
-from dataclasses import dataclass
+from typing import List, Optional, Dict, Tuple, Iterable, Iterator, TextIO, BinaryIO
+from dataclasses import dataclass, field, InitVar
+import time
 import logging
 import argparse
 import sys
+import threading
 
 # 避免循环导入
 if __name__ == '__main__':
@@ -15,13 +18,413 @@ if __name__ == '__main__':
     if parent_dir not in sys.path:
         sys.path.insert(0, parent_dir)
 
+from src.addr2line_pool import Addr2LinePool
+from src.elf_symbols import ElfSymbolTable, ElfError, read_build_id
+from src.symbol_cache import SymbolCache
+from src.symbol_index import SymbolIndex
+from src.symbol_sidecar import SidecarStore
+from src.scheduler import SymbolScheduler, get_scheduler
+from src.log_sources import iter_log_streams, is_compressed
+from src.logcat_index import LogcatIndex, IndexedCrash, ProcessEvent, crash_matches, index_path
+from src.crash_buckets import CrashBuckets
+from src.stats import Stats, print_stats
+from src.utils import file_signature
+
+# 不匹配 _FRAME_PATTERN 的栈帧行（例如库名为 <unknown>），库名部分原样保留
+_FRAME_FALLBACK = re.compile(r'#(?P<frame_num>\d+)\s+pc\s+(?P<addr>[0-9a-f]+)\s+(?P<lib_path>.*?)\s*$')
+# logcat 行首的时间戳（threadtime 格式，可带年份）
+_TIMESTAMP = re.compile(r'^(?:\d{4}-)?\d\d-\d\d\s+\d\d:\d\d:\d\d\.\d+')
+# logcat 行前缀：threadtime / brief 格式，以及 crash_dump 直接输出的 "crash_dump64 A        "
+_LOGCAT_PREFIX = re.compile(
+    r'^(?:\d\d-\d\d\s+\d\d:\d\d:\d\d\.\d+\s+(?P<pid>\d+)\s+\d+\s+[VDIWEFA]\s+(?P<tag>[^:]*?)\s*:\s'
+    r'|[VDIWEFA]/(?P<brief_tag>[^(]*?)\s*\(\s*(?P<brief_pid>\d+)\):\s'
+    r'|(?:crash_dump\d*|pid-\d+)\s+[VDIWEFA]\s+)'
+)
+# 输出 tombstone 的标签；崩溃头部只保留这些标签或崩溃进程自己的日志行
+_CRASH_DUMP_TAGS = ('DEBUG', 'crash_dump', 'crash_dump32', 'crash_dump64')
+# 崩溃头部（第一个栈帧之前的摘要行）最多保留的行数
+MAX_HEADER_LINES = 64
+# PROCESS STARTED / ENDED 行中可选的 pid，例如 "PROCESS STARTED (1234) for package ..."
+_PROCESS_EVENT_PID = re.compile(r'PROCESS (?:STARTED|ENDED)\s*\((?P<pid>\d+)\)')
+
+def _message(line: str) -> str:
+    """Text of a logcat line without its timestamp/pid/tag prefix, interned"""
+    match = _LOGCAT_PREFIX.match(line)
+    return sys.intern((line[match.end():] if match else line).strip())
+
+def _is_header_line(line: str, pid: Optional[int]) -> bool:
+    """Whether a line before the first frame belongs to the crash: tombstone output or a line of its process"""
+    match = _LOGCAT_PREFIX.match(line)
+    if not match:
+        return True  # 没有 logcat 前缀：tombstone 原文
+    tag = match.group('tag')
+    if tag is None:
+        tag = match.group('brief_tag')
+    if tag is None:
+        return True  # crash_dump 直接输出的行
+    line_pid = match.group('pid') or match.group('brief_pid')
+    return tag in _CRASH_DUMP_TAGS or (pid is not None and int(line_pid) == pid)
+
+def _timestamp(line: str) -> Optional[str]:
+    match = _TIMESTAMP.match(line)
+    return match.group() if match else None
+
+class Frame:
+    """One native stack frame, parsed once from its tombstone line
+    
+    The address is kept as an int and library paths, Build IDs and
+    symbols are interned, so the frames of many crashes share their
+    strings. ``resolved`` holds the symbolication result; text is only
+    rendered for output.
+    """
+    __slots__ = ('index', 'addr', 'width', 'lib', 'build_id', 'symbol', 'resolved')
+    
+    def __init__(self, index: int, addr: int, lib: str, build_id: Optional[str] = None,
+                 symbol: Optional[str] = None, width: int = 16, resolved: Optional[str] = None):
+        self.index = index
+        self.addr = addr
+        self.width = width  # 地址的十六进制位数（32 位进程为 8）
+        self.lib = lib
+        self.build_id = build_id
+        self.symbol = symbol
+        self.resolved = resolved
+    
+    @classmethod
+    def parse(cls, line: str) -> Optional['Frame']:
+        """Parse a '#NN pc ADDR LIB (symbol+off) (BuildId: ...)' line, or return None"""
+        # 从第一个 '#' 前开始匹配，跳过 logcat 前缀
+        pos = max(line.find('#') - 1, 0)
+        match = LogcatParser._FRAME_PATTERN.search(line, pos)
+        if match:
+            num, addr, lib, symbol, build_id = match.group('frame_num', 'addr', 'lib_path', 'symbol', 'build_id')
+            return cls(int(num), int(addr, 16), sys.intern(lib), build_id and sys.intern(build_id),
+                       symbol and sys.intern(symbol), len(addr))
+        match = _FRAME_FALLBACK.search(line, pos)
+        if match:
+            addr = match.group('addr')
+            return cls(int(match.group('frame_num')), int(addr, 16), sys.intern(match.group('lib_path')), width=len(addr))
+        return None
+    
+    @property
+    def hex_addr(self) -> str:
+        """Address as printed in the tombstone, e.g. '0000000000001120'"""
+        return f'{self.addr:0{self.width}x}'
+    
+    def render(self) -> str:
+        """Tombstone text of the frame, with the symbolication result on its own line"""
+        text = f'#{self.index:02d} pc {self.hex_addr}  {self.lib}'
+        if self.symbol:
+            text += f' ({self.symbol})'
+        if self.build_id:
+            text += f' (BuildId: {self.build_id})'
+        if self.resolved:
+            text += f'\n    {self.resolved}'
+        return text
+    
+    def to_dict(self) -> dict:
+        return {
+            'index': self.index,
+            'addr': self.hex_addr,
+            'lib': self.lib,
+            'build_id': self.build_id,
+            'symbol': self.symbol,
+            'resolved': self.resolved,
+        }
+    
+    def __repr__(self):
+        return f'Frame({self.index}, 0x{self.hex_addr}, {self.lib!r}, resolved={self.resolved!r})'
+
 @dataclass
 class CrashInfo:
-    """Crash information extracted from logcat"""
+    """Crash information extracted from logcat
+    
+    stack_trace is rendered from header and frames. Text lines given as
+    stack_trace= (or as the fourth positional argument, as in earlier
+    versions) or assigned to it are parsed into header and frames.
+    """
     process: str
     signal: str
     signal_detail: str  # 新增字段，用于记录信号的详细信息
-    stack_trace: List[str]
+    frames: List[Frame] = field(default_factory=list)
+    header: List[str] = field(default_factory=list)  # 堆栈之前的摘要行（pid、backtrace: 等），已去掉 logcat 前缀
+    timings: Dict[str, float] = field(default_factory=dict)  # 阶段名 -> 秒，例如 symbolicate
+    timestamp: Optional[str] = None  # 崩溃首行的 logcat 时间戳，例如 "01-01 12:00:02.000"
+    bucket: Optional[str] = None  # 启用崩溃分桶时的签名
+    offset: Optional[int] = None  # 崩溃首行在文件中的字节偏移（从文件读取时）
+    end_offset: Optional[int] = None  # 结束崩溃的那一行（或文件末尾）的偏移，崩溃的行都在它之前
+    pid: Optional[int] = None  # 崩溃进程的 pid（Fatal signal 或 >>> 行中给出时）
+    stack_trace: InitVar[Optional[List[str]]] = None
+    
+    def __post_init__(self, stack_trace: Optional[List[str]]):
+        # 早期版本的第四个参数是文本栈行
+        if self.frames and isinstance(self.frames[0], str):
+            stack_trace, self.frames = self.frames, []
+        if isinstance(stack_trace, list):
+            self._set_stack_trace(stack_trace)
+    
+    def _get_stack_trace(self) -> List[str]:
+        """Output lines: the header lines, then one rendered line per frame"""
+        return self.header + [frame.render() for frame in self.frames]
+    
+    def _set_stack_trace(self, lines: List[str]):
+        """Parse text lines into header and frames, reading a frame's symbolication result from its second line
+        
+        As in the scanner, lines that are not frames are kept as header
+        only before the first frame.
+        """
+        header: List[str] = []
+        frames: List[Frame] = []
+        for line in lines:
+            text, _, resolved = line.partition('\n')
+            # 栈帧模式要求 '#' 前有空白
+            frame = Frame.parse(' ' + text) if '#' in text else None
+            if frame:
+                frame.resolved = sys.intern(resolved.strip()) if resolved.strip() else None
+                frames.append(frame)
+            elif not frames:
+                header.append(line.strip())
+        self.header, self.frames = header, frames
+    
+    def to_dict(self) -> dict:
+        return {
+            'process': self.process,
+            'signal': self.signal,
+            'signal_detail': self.signal_detail,
+            'stack_trace': self.stack_trace,
+            'frames': [frame.to_dict() for frame in self.frames],
+            'timings': dict(self.timings),
+            'timestamp': self.timestamp,
+            'bucket': self.bucket,
+            'offset': self.offset,
+            'end_offset': self.end_offset,
+            'pid': self.pid,
+        }
+    
+# stack_trace 同时是 __init__ 的参数（InitVar）和属性，属性只能在 dataclass 生成 __init__ 之后设置
+CrashInfo.stack_trace = property(CrashInfo._get_stack_trace, CrashInfo._set_stack_trace,
+                                 doc=CrashInfo._get_stack_trace.__doc__)
+
+# 扫描器关心的全部字面量；不含这些关键字的行在不收集堆栈时可以直接跳过
+_KEYWORDS = ('PROCESS ', 'Fatal signal', 'Cmdline:', '>>>', '#00')
+_BYTE_KEYWORDS = tuple(k.encode() for k in _KEYWORDS)
+
+def _candidate_lines(f: BinaryIO, scanner: '_LogcatScanner', block_size: int, stats: Stats,
+                     offset: int = 0) -> Iterator[str]:
+    """Yield the lines of a binary file that the scanner has to see
+    
+    Blocks are searched for the keywords with bytes.find; while the scanner
+    is not collecting a stack, lines without any keyword are never decoded.
+    The scanner must be fed each line before the next one is requested;
+    ``scanner.offset`` is set to the byte offset of each line, counted
+    from offset (the position of f when reading starts), and to the end
+    of the data once every line has been read.
+    """
+    tail = b''
+    tail_start = offset  # tail 在文件中的偏移
+    while True:
+        with stats.stage('read'):
+            chunk = f.read(block_size)
+            if not chunk:
+                break
+            stats.incr('bytes_read', len(chunk))
+            block = tail + chunk
+            block_start = tail_start
+            cut = block.rfind(b'\n') + 1
+            tail, block = block[cut:], block[:cut]
+            tail_start = block_start + cut
+            if not block:
+                continue
+            if stats.enabled:
+                stats.incr('lines_read', block.count(b'\n'))
+            
+            # 找出本块中所有含关键字的行的起始位置
+            starts = set()
+            for keyword in _BYTE_KEYWORDS:
+                i = block.find(keyword)
+                while i >= 0:
+                    starts.add(block.rfind(b'\n', 0, i) + 1)
+                    i = block.find(keyword, i + 1)
+            starts = sorted(starts)
+        
+        pos, next_start = 0, 0
+        size = len(block)
+        while pos < size:
+            if not scanner.collecting_stack:
+                while next_start < len(starts) and starts[next_start] < pos:
+                    next_start += 1
+                if next_start == len(starts):
+                    break
+                pos = starts[next_start]
+            end = block.find(b'\n', pos) + 1
+            scanner.offset = block_start + pos
+            yield block[pos:end].decode('utf-8', 'replace')
+            pos = end
+    if tail:
+        stats.incr('lines_read')
+        scanner.offset = tail_start
+        yield tail.decode('utf-8', 'replace')
+    scanner.offset = tail_start + len(tail)
+
+class _LogcatScanner:
+    """Incremental state machine that turns logcat lines into raw crashes
+    
+    Lines are fed one at a time; a crash is returned as soon as its stack
+    trace ends, with its stack lines parsed into ``frames`` but not yet
+    symbolicated.
+    """
+    
+    # Fatal signal 之后最多等待这么多行出现第一个栈帧；crash_dump 没有输出堆栈时，
+    # 崩溃按无栈帧结束，不再把之后的所有行都收集进来
+    MAX_LINES_BEFORE_FRAMES = 2000
+    
+    def __init__(self, parser: 'LogcatParser'):
+        self.p = parser
+        self.crash_info: Optional[CrashInfo] = None
+        self.lines: List[str] = []  # 当前崩溃收集到的原始行，崩溃结束时才解析
+        self.collecting_stack = False
+        self.seen_frame = False
+        self.current_package: Optional[str] = None
+        self.offset: Optional[int] = None  # 当前行在文件中的字节偏移，由 _candidate_lines 设置
+        self.events: Optional[List[ProcessEvent]] = None  # 建立日志索引时记录 PROCESS STARTED / ENDED 行
+        # 只在启用 DEBUG 时才格式化逐行日志（栈帧相关的日志使用惰性格式化参数）
+        self._debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    
+    def _end_crash(self) -> Optional[CrashInfo]:
+        crash_info, lines = self.crash_info, self.lines
+        self.crash_info = None
+        self.lines = []
+        self.collecting_stack = False
+        self.seen_frame = False
+        if crash_info:
+            crash_info.end_offset = self.offset
+            # 每行只解析一次：栈帧行变为 Frame，之前属于该崩溃的行作为摘要保留
+            header = crash_info.header
+            for line in lines:
+                frame = Frame.parse(line) if '#' in line else None
+                if frame:
+                    crash_info.frames.append(frame)
+                elif not crash_info.frames and len(header) < MAX_HEADER_LINES and _is_header_line(line, crash_info.pid):
+                    header.append(_message(line))
+        return crash_info
+    
+    def _record_event(self, kind: str, package: str, line: str):
+        match = _PROCESS_EVENT_PID.search(line)
+        self.events.append(ProcessEvent(self.offset, kind, package,
+                                        int(match.group('pid')) if match else None, _timestamp(line)))
+    
+    def feed(self, line: str) -> Optional[CrashInfo]:
+        """Process one line, returning a crash if this line completed one
+        
+        Every pattern is guarded by a cheap substring check, so the common
+        case of a line unrelated to any crash costs a few ``in`` tests and
+        no regex at all.
+        """
+        p = self.p
+        debug = self._debug
+        done = None
+        
+        if self.collecting_stack:
+            # 已收集到栈帧后，第一条非栈帧行表示堆栈结束
+            is_frame = 'pc' in line and p._FRAME_LINE_PATTERN.search(line) is not None
+            if self.seen_frame and not is_frame:
+                done = self._end_crash()
+            elif not is_frame and len(self.lines) >= self.MAX_LINES_BEFORE_FRAMES:
+                logging.info(f"No stack frames within {len(self.lines)} lines, ending crash of "
+                             f"{self.crash_info.process if self.crash_info else 'unknown process'}")
+                done = self._end_crash()
+        else:
+            # 快速路径：不在收集堆栈且不含任何关键字的行直接跳过（与 _KEYWORDS 保持一致）
+            if not ('PROCESS ' in line or 'Fatal signal' in line or 'Cmdline:' in line
+                    or '>>>' in line or '#00' in line):
+                return None
+            is_frame = False
+        
+        line = line.rstrip('\r\n')
+        
+        # Look for process start/end
+        if 'PROCESS ' in line:
+            start_match = p._PROCESS_START_PATTERN.search(line)
+            if start_match:
+                self.current_package = start_match.group('package')
+                if self.events is not None:
+                    self._record_event('started', self.current_package, line)
+                if debug:
+                    logging.debug(f"Process started: {self.current_package}")
+                return done
+                
+            end_match = p._PROCESS_END_PATTERN.search(line)
+            if end_match and self.events is not None:
+                self._record_event('ended', end_match.group('package'), line)
+            if end_match and end_match.group('package') == self.current_package:
+                if debug:
+                    logging.debug(f"Process ended: {self.current_package}")
+                return done or self._end_crash()
+            
+        # Look for crash header
+        match = p._SIGNAL_PATTERN.search(line) if 'Fatal signal' in line else None
+        if match:
+            logging.info(f"Found crash info: signal={match.group('signal')} ({match.group('signal_name')})")
+            # 新的崩溃头意味着上一个崩溃已结束
+            done = done or self._end_crash()
+            fatal_signal_msg = line.split(match.group('fatal_signal'))[1].strip() if match.group('fatal_signal') in line else line
+            self.crash_info = CrashInfo(
+                process=match.group('process').strip(),
+                signal=f"{match.group('fatal_signal')} {match.group('signal')} ({match.group('signal_name')})",
+                signal_detail=f"{match.group('fatal_signal')} - {fatal_signal_msg}",
+                timestamp=_timestamp(line),
+                offset=self.offset,
+                pid=int(match.group('pid')),
+            )
+            self.collecting_stack = True  # 开始收集堆栈信息
+            return done
+            
+        if not self.crash_info:
+            # Look for crash cmdline
+            match = p._CRASH_PATTERN.search(line) if 'Cmdline:' in line else None
+            if match:
+                logging.info(f"Found crash cmdline: {match.group('process')}")
+                self.crash_info = CrashInfo(
+                    process=match.group('process').strip(),
+                    signal="",
+                    signal_detail="",  # 初始化为空
+                    timestamp=_timestamp(line),
+                    offset=self.offset,
+                )
+                return done
+                
+            # Also look for process info
+            match = p._PROCESS_INFO_PATTERN.search(line) if '>>>' in line else None
+            if match:
+                logging.info(f"Found process info: process={match.group('process').strip()}")
+                self.crash_info = CrashInfo(
+                    process=match.group('process').strip(),
+                    signal="",
+                    signal_detail="",  # 初始化为空
+                    timestamp=_timestamp(line),
+                    offset=self.offset,
+                    pid=int(match.group('pid')),
+                )
+                return done
+            
+        # Start collecting stack trace after seeing stack trace marker
+        if not self.collecting_stack and '#00' in line and p._STACK_TRACE_START.search(line):
+            if debug:
+                logging.debug("Found start of stack trace")
+            self.collecting_stack = True
+            is_frame = True
+            
+        # Collect stack trace lines
+        if self.collecting_stack:
+            if debug:
+                logging.debug(f"Collecting stack frame: {line}")
+            self.lines.append(line)
+            if is_frame:
+                self.seen_frame = True
+        return done
+    
+    def finish(self) -> Optional[CrashInfo]:
+        """Flush the crash in progress at end of input"""
+        return self._end_crash()
     
 class LogcatParser:
     """Parser for native crashes in logcat output"""
@@ -36,6 +439,9 @@ class LogcatParser:
     _STACK_TRACE_START = re.compile(
         r'\s+#00\s+pc'  # 堆栈开始标记
     )
+    _FRAME_LINE_PATTERN = re.compile(
+        r'\s+#\d+\s+pc\s'  # 任意栈帧行，用于判断堆栈是否结束
+    )
     _FRAME_PATTERN = re.compile(
         r'\s+#(?P<frame_num>\d+)\s+pc\s+(?P<addr>[0-9a-f]+)\s+'
         r'(?P<lib_path>(?:\[.*?\]|/[^ ]+))'  # 支持匿名映射和常规库路径
@@ -55,13 +461,44 @@ class LogcatParser:
         r'PROCESS ENDED.*?for package\s+(?P<package>[^\s]+)'
     )
     
-    def __init__(self, symbols_dir: Optional[str] = None, ndk_path: Optional[str] = None, output_dir: Optional[str] = None, verbose: bool = False, verify_build_id: bool = False):
+    # 按块读取日志文件；64KB 的块能留在 CPU 缓存中，关键字查找最快
+    READ_BUFFER_SIZE = 64 * 1024
+    
+    def __init__(self, symbols_dir: Optional[str] = None, ndk_path: Optional[str] = None, output_dir: Optional[str] = None, verbose: bool = False, verify_build_id: bool = False,
+                 addr2line_workers: int = 1, addr2line_idle_timeout: float = 60.0, line_info: bool = True,
+                 cache_dir: Optional[str] = None, persistent_cache: bool = True, stats: Optional[Stats] = None,
+                 bucket_crashes: bool = False, sidecar_dir: Optional[str] = None,
+                 scheduler: Optional[SymbolScheduler] = None, log_index: bool = False):
         self.symbols_dir = symbols_dir
         self.ndk_path = ndk_path
         self.output_dir = output_dir
         self.verify_build_id = verify_build_id  # 新增参数
-        self._addr2line_cache: Dict[Tuple[str, str], str] = {}
+        self.cache_dir = cache_dir
+        # 为 True 时普通日志文件扫描一遍后保存崩溃的偏移索引，之后只读取崩溃所在的字节范围
+        self.log_index = log_index
+        # 内存 LRU + 磁盘 SQLite 两级缓存，按 (Build ID, 地址) 保存 addr2line 结果
+        self.symbol_cache = SymbolCache(cache_dir=cache_dir, persistent=persistent_cache)
+        # 符号目录索引：(库名, ABI, Build ID) -> 路径，首次查找时建立
+        self.symbol_index = SymbolIndex(symbols_dir, cache_dir=cache_dir, persistent=persistent_cache) if symbols_dir else None
+        self.addr2line_workers = addr2line_workers  # 每个符号文件的常驻 addr2line 进程数
+        self.addr2line_idle_timeout = addr2line_idle_timeout
+        self._addr2line_pool: Optional[Addr2LinePool] = None
+        self._pool_lock = threading.Lock()
+        # 为 False 时只需要函数名和偏移，直接在进程内查 ELF 符号表，不再调用 addr2line
+        self.line_info = line_info
+        # 路径 -> (加载时文件的 (大小, mtime), 符号表)；文件被覆盖后重新加载
+        self._elf_tables: Dict[str, Tuple[Optional[Tuple[int, int]], Optional[ElfSymbolTable]]] = {}
+        # 预编译的符号边车文件（见 symbol_sidecar），按 Build ID 查找，命中时不再启动 addr2line
+        self.sidecars = SidecarStore(sidecar_dir) if sidecar_dir else None
         self.current_build_id = None
+        # 各阶段耗时与计数；未启用时所有记录调用直接返回
+        self.stats = stats or Stats(enabled=False)
+        self.stats.register('symbol_cache', self.symbol_cache.stats.to_dict)
+        # 进程内共享：合并并发的相同地址请求，限制同时运行的外部工具数
+        self.scheduler = scheduler or get_scheduler()
+        self.stats.register('scheduler', self.scheduler.to_dict)
+        # 崩溃分桶：相同签名的崩溃只符号化第一个，其余复制其结果
+        self.buckets = CrashBuckets() if bucket_crashes else None
         self.verbose = verbose or os.environ.get('VERBOSE') == '1'
         self._setup_logging()
         logging.info(f"Symbols directory: {self.symbols_dir}")
@@ -69,7 +506,21 @@ class LogcatParser:
         logging.info(f"Output directory: {self.output_dir}")
         logging.info(f"Verbose mode: {self.verbose}")
 
+    def __enter__(self):
+        return self
 
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Shut down persistent addr2line workers"""
+        if self._addr2line_pool:
+            self._addr2line_pool.close()
+            self._addr2line_pool = None
+        self._elf_tables.clear()
+        if self.sidecars:
+            self.sidecars.close()
+        self.symbol_cache.close()
     
     def _setup_logging(self):
         """设置日志级别和格式"""
@@ -89,16 +540,20 @@ class LogcatParser:
     
     def _get_lib_name(self, lib_path: str) -> Optional[str]:
         """Extract library name from path"""
-        logging.debug(f"Extracting library name from path: {lib_path}")
+        logging.debug("Extracting library name from path: %s", lib_path)
         if '[anon:' in lib_path:  # Skip anonymous mappings
             logging.debug("Skipping anonymous mapping")
             return None
             
         match = self._LIB_NAME_PATTERN.search(lib_path)
         lib_name = match.group('lib_name') if match else None
-        logging.debug(f"Extracted library name: {lib_name}")
+        logging.debug("Extracted library name: %s", lib_name)
         return match.group('lib_name') if match else None
     
+    def _can_symbolicate(self) -> bool:
+        """Symbolication needs symbols, plus the NDK unless only function names are wanted or sidecars are compiled"""
+        return bool(self.symbols_dir and (self.ndk_path or self.sidecars or not self.line_info))
+    
     def _get_addr2line_path(self) -> str:
         """Get path to addr2line executable"""
         if not self.ndk_path:
@@ -120,189 +575,483 @@ class LogcatParser:
     def _extract_build_id(self, lib_path: str) -> Optional[str]:
         """Extract build ID from library file"""
         try:
-            cmd = ['readelf', '-n', lib_path]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            for line in result.stdout.splitlines():
-                if 'Build ID:' in line:
-                    return line.split(':')[1].strip()
-        except:
-            pass
-        return None
+            return read_build_id(lib_path)
+        except (OSError, ElfError):
+            return None
     
-    def _get_lib_path(self, lib_name: str) -> Optional[str]:
+    def _get_lib_path(self, lib_name: str, build_id: Optional[str] = None) -> Optional[str]:
         """Get path to library in symbols directory"""
-        logging.debug(f"Looking for library {lib_name} in symbols directory: {self.symbols_dir}")
-        if not self.symbols_dir:
+        logging.debug("Looking for library %s in symbols directory: %s", lib_name, self.symbols_dir)
+        if not self.symbol_index:
             return None
-            
-        # Try different architectures
-        for arch in ['arm64-v8a', 'armeabi-v7a']:
-            lib_path = os.path.join(self.symbols_dir, arch, lib_name)
-            logging.debug(f"Trying path: {lib_path}")
-            if os.path.exists(lib_path):
-                # Verify build ID if available and if verification is enabled
-                if self.verify_build_id and self.current_build_id:
-                    logging.debug(f"Verifying build ID: {self.current_build_id}")
-                    build_id = self._extract_build_id(lib_path)
-                    logging.debug(f"Found build ID: {build_id}")
-                    if build_id and build_id != self.current_build_id:
-                        logging.debug("Build ID mismatch, skipping")
-                        continue
-                logging.debug(f"Found matching library at: {lib_path}")
-                return lib_path
-        logging.debug("Library not found in any architecture directory")
-        return None
+        if build_id is None:
+            build_id = self.current_build_id
+        
+        with self.stats.stage('lib_lookup'):
+            lib_path = self.symbol_index.lookup(lib_name, build_id, verify_build_id=self.verify_build_id)
+        if lib_path:
+            logging.debug("Found matching library at: %s", lib_path)
+        else:
+            logging.debug("Library not found in symbol index")
+        return lib_path
+    
+    def _get_addr2line_pool(self) -> Addr2LinePool:
+        """Get the persistent addr2line worker pool, creating it on first use"""
+        with self._pool_lock:  # 多线程共享同一个解析器时只创建一个进程池
+            if self._addr2line_pool is None:
+                self._addr2line_pool = Addr2LinePool(
+                    self._get_addr2line_path(),
+                    workers_per_file=self.addr2line_workers,
+                    idle_timeout=self.addr2line_idle_timeout,
+                    stats=self.stats,
+                    slots=self.scheduler.slots
+                )
+            return self._addr2line_pool
+    
+    def _cache_lookup(self, lib_path: str, addrs: List[str]) -> Tuple[str, Dict[str, str], List[str]]:
+        """Split addresses into cached results and the deduplicated misses
+
+        Returns (file key, found results, missing addresses); raises OSError
+        if the library cannot be read.
+        """
+        file_key = self.symbol_cache.file_key(lib_path)
+        with self.stats.stage('cache'):
+            found = self.symbol_cache.get_many(file_key, addrs)
+        # 只对缓存未命中且去重后的地址调用 addr2line
+        missing = list(dict.fromkeys(addr for addr in addrs if addr not in found))
+        return file_key, found, missing
+    
+    def _cache_store(self, file_key: str, found: Dict[str, str], missing: List[str], outputs: List[str]):
+        """Store addr2line outputs for the missing addresses and merge them into found"""
+        resolved = dict(zip(missing, outputs))
+        with self.stats.stage('cache'):
+            self.symbol_cache.put_many(file_key, resolved)
+        found.update(resolved)
+    
+    def _run_addr2line(self, lib_path: str, file_key: str, addrs: List[str]) -> List[str]:
+        """Run addr2line on addresses no other caller is resolving, caching the outputs"""
+        self.stats.incr('addr2line_addresses', len(addrs))
+        with self.stats.stage('addr2line'):
+            outputs = self._get_addr2line_pool().resolve(lib_path, addrs)
+        self._cache_store(file_key, {}, addrs, outputs)
+        return outputs
+    
+    def _addr2line_batch(self, lib_path: str, addrs: List[str]) -> List[str]:
+        """Run addr2line on several addresses of one library in a single call"""
+        logging.debug(f"Running addr2line on {lib_path} with {len(addrs)} addresses")
+        try:
+            file_key, found, missing = self._cache_lookup(lib_path, addrs)
+        except OSError as e:
+            return [f"Failed to symbolicate: {e}"] * len(addrs)
+        if missing:
+            # 其他线程正在解析的地址直接等待其结果，不再重复调用 addr2line
+            keys = [(file_key, addr) for addr in missing]
+            try:
+                resolved = self.scheduler.resolve(
+                    keys, lambda owned: self._run_addr2line(lib_path, file_key, [addr for _, addr in owned]))
+            except (OSError, ValueError) as e:
+                return [found.get(addr, f"Failed to symbolicate: {e}") for addr in addrs]
+            found.update((addr, resolved[key]) for addr, key in zip(missing, keys))
+        return [found[addr] for addr in addrs]
+    
+    def _get_elf_table(self, lib_path: str) -> Optional[ElfSymbolTable]:
+        """Load the symbol table of a library once per version of the file and keep it for later lookups"""
+        signature = file_signature(lib_path)
+        cached = self._elf_tables.get(lib_path)
+        if cached is None or cached[0] != signature:
+            table = None
+            try:
+                with self.stats.stage('elf_load'):
+                    table = ElfSymbolTable(lib_path)
+            except (OSError, ElfError) as e:
+                logging.debug(f"Failed to load ELF symbols from {lib_path}: {e}")
+            cached = self._elf_tables[lib_path] = (signature, table)
+        return cached[1]
+    
+    def _elf_lookup(self, table: Optional[ElfSymbolTable], addrs: List[str]) -> List[Optional[str]]:
+        """Resolve addresses to 'function+offset' with a symbol table, None where not found"""
+        results: List[Optional[str]] = [None] * len(addrs)
+        if table:
+            with self.stats.stage('elf_lookup'):
+                for i, addr in enumerate(addrs):
+                    found = table.lookup(int(addr, 16))
+                    if found:
+                        results[i] = f"{found[0]}+{found[1]}"
+        return results
+    
+    def _sidecar_lookup(self, lib_path: str, addrs: List[str]) -> List[Optional[str]]:
+        """Resolve addresses with the compiled sidecar of a library, None where it cannot answer"""
+        results: List[Optional[str]] = [None] * len(addrs)
+        if not self.sidecars:
+            return results
+        try:
+            file_key = self.symbol_cache.file_key(lib_path)
+        except OSError:
+            return results
+        # 边车文件按 Build ID 命名，没有 Build ID 的库只能走 addr2line
+        sidecar = None if file_key.startswith('sha1:') else self.sidecars.get(file_key)
+        if sidecar is None or (self.line_info and not sidecar.has_lines):
+            return results
+        with self.stats.stage('sidecar'):
+            for i, addr in enumerate(addrs):
+                results[i] = sidecar.symbolize(int(addr, 16), self.line_info)
+        self.stats.incr('sidecar_addresses', sum(result is not None for result in results))
+        return results
+    
+    def _symbolize_batch(self, lib_path: str, addrs: List[str]) -> List[str]:
+        """Resolve addresses in-process from sidecars and ELF symbols, using addr2line only as fallback"""
+        results = self._sidecar_lookup(lib_path, addrs)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing and not self.line_info:
+            found = self._elf_lookup(self._get_elf_table(lib_path), [addrs[i] for i in missing])
+            for i, result in zip(missing, found):
+                results[i] = result
+            missing = [i for i in missing if results[i] is None]
+        # 其余地址交给 addr2line（可能有 DWARF 信息）
+        if missing:
+            outputs = self._addr2line_batch(lib_path, [addrs[i] for i in missing])
+            for i, output in zip(missing, outputs):
+                results[i] = output
+        return results
     
     def _addr2line(self, lib_path: str, addr: str) -> str:
         """Run addr2line on an address"""
-        logging.debug(f"Running addr2line on {lib_path} with address {addr}")
-        cache_key = (lib_path, addr)
-        if cache_key in self._addr2line_cache:
-            return self._addr2line_cache[cache_key]
-            
-        try:
-            cmd = [
-                self._get_addr2line_path(),
-                '-e', lib_path,
-                '-f', '-C', '-p',  # Show function names, demangle, pretty print
-                addr
-            ]
+        return self._addr2line_batch(lib_path, [addr])[0]
+    
+    def symbolicate_frames(self, frames: List[str]) -> List[str]:
+        """Symbolicate stack frame lines, resolving each symbol file with one addr2line call
+        
+        Frames may come from one crash or from many; results keep the input
+        order, with frame lines rendered in tombstone form.
+        """
+        parsed = [Frame.parse(line) for line in frames]
+        self.resolve_frames([frame for frame in parsed if frame])
+        return [frame.render() if frame else line.strip() for frame, line in zip(parsed, frames)]
+    
+    def resolve_frames(self, frames: List[Frame]):
+        """Fill in ``resolved`` of each frame, resolving each symbol file with one addr2line call"""
+        with self.stats.stage('symbolicate'):
+            self._resolve_frames(frames)
+    
+    def _resolve_frames(self, frames: List[Frame]):
+        if not self._can_symbolicate():
+            logging.debug("Symbols or NDK path not set")
+            return
+        
+        for symbol_lib, entries in self._group_frames(frames).items():
+            outputs = self._symbolize_batch(symbol_lib, [frame.hex_addr for frame in entries])
+            self._apply_outputs(entries, outputs)
+    
+    def _group_frames(self, frames: List[Frame]) -> Dict[str, List[Frame]]:
+        """Map each symbol file to the frames to resolve in it"""
+        lib_paths: Dict[Tuple[str, Optional[str]], Optional[str]] = {}
+        groups: Dict[str, List[Frame]] = {}
+        for frame in frames:
+            lib_path = frame.lib
+            build_id = frame.build_id
+            self.current_build_id = build_id
+            logging.debug("Extracted: addr=%x, lib_path=%s, build_id=%s", frame.addr, lib_path, build_id)
             
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
+            # Skip Java frames and anonymous mappings
+            if '[anon:' in lib_path or 'dalvik' in lib_path.lower():
+                logging.debug("Skipping Java/anonymous frame")
+                continue
             
-            output = result.stdout.strip()
-            self._addr2line_cache[cache_key] = output
-            return output
+            lib_name = self._get_lib_name(lib_path)
+            if not lib_name:
+                logging.debug("Failed to extract library name")
+                continue
             
-        except (subprocess.CalledProcessError, FileNotFoundError) as e:
-            return f"Failed to symbolicate: {e}"
+            # 同一批次内每个 (库名, BuildId) 只查找一次符号文件
+            key = (lib_name, build_id)
+            if key not in lib_paths:
+                lib_paths[key] = self._get_lib_path(lib_name, build_id)
+                if not lib_paths[key]:
+                    logging.error(f"Failed to find symbol file for {lib_name}")
+            symbol_lib = lib_paths[key]
+            if symbol_lib:
+                groups.setdefault(symbol_lib, []).append(frame)
+        
+        self.stats.incr('frames', len(frames))
+        self.stats.incr('frames_symbolicated', sum(len(entries) for entries in groups.values()))
+        return groups
+    
+    @staticmethod
+    def _apply_outputs(entries: List[Frame], outputs: List[str]):
+        """Store symbolication outputs on their frames"""
+        for frame, output in zip(entries, outputs):
+            logging.debug("Symbolicated output: %s", output)
+            frame.resolved = sys.intern(output.strip())
     
     def symbolicate_frame(self, frame: str) -> str:
         """Symbolicate a single stack frame"""
-        logging.debug(f"\nSymbolicating frame: {frame}")
-        if not (self.symbols_dir and self.ndk_path):
-            logging.debug("Symbols or NDK path not set")
-            return frame.strip()  # 去掉前后空格
+        logging.debug("\nSymbolicating frame: %s", frame)
+        return self.symbolicate_frames([frame])[0]
+    
+    def _finish_crash(self, crash_info: CrashInfo, source: Optional[str] = None) -> CrashInfo:
+        """Symbolicate the frames of a completed crash"""
+        self.stats.incr('crashes')
+        bucket = None
+        if self.buckets is not None:
+            bucket, new = self.buckets.assign(crash_info, source)
+            if not new:
+                self.stats.incr('crashes_deduplicated')
+                bucket.attach(crash_info)
+                return crash_info
+        try:
+            # 收集完成后按库分组批量符号化
+            if self._can_symbolicate():
+                start = time.perf_counter()
+                self.resolve_frames(crash_info.frames)
+                crash_info.timings['symbolicate'] = time.perf_counter() - start
+        finally:
+            if bucket:
+                # 出错时也要设置代表崩溃，避免其他线程一直等待
+                bucket.set_representative(crash_info)
+        return crash_info
+    
+    def _scan(self, lines: Iterable[str], scanner: Optional['_LogcatScanner'] = None) -> Iterator[CrashInfo]:
+        """Run the scanner over lines, yielding raw (unsymbolicated) crashes"""
+        scanner = scanner or _LogcatScanner(self)
+        if self.stats.enabled:
+            yield from self._scan_timed(lines, scanner)
+            return
+        for line in lines:
+            crash_info = scanner.feed(line)
+            if crash_info:
+                yield crash_info
+        crash_info = scanner.finish()
+        if crash_info:
+            yield crash_info
+    
+    def _scan_timed(self, lines: Iterable[str], scanner: '_LogcatScanner') -> Iterator[CrashInfo]:
+        """_scan with the time spent in the scanner recorded as the 'scan' stage"""
+        elapsed = 0.0
+        count = 0
+        clock = time.perf_counter
+        try:
+            for line in lines:
+                start = clock()
+                crash_info = scanner.feed(line)
+                elapsed += clock() - start
+                count += 1
+                if crash_info:
+                    yield crash_info
+        finally:
+            self.stats.add_time('scan', elapsed, count)
+            self.stats.incr('lines_scanned', count)
+        crash_info = scanner.finish()
+        if crash_info:
+            yield crash_info
+    
+    def iter_crashes(self, lines: Iterable[str]) -> Iterator[CrashInfo]:
+        """Yield each crash found in lines as soon as its stack trace ends"""
+        for crash_info in self._scan(lines):
+            yield self._finish_crash(crash_info)
+    
+    def iter_logcat_file(self, logcat_file: str) -> Iterator[CrashInfo]:
+        """Stream a logcat file and yield each crash as soon as its stack trace ends
         
-        match = self._FRAME_PATTERN.search(frame)
-        if not match:
-            logging.debug("Frame pattern not matched")
-            return frame.strip()
+        The file is read line by line, so memory use does not depend on its size.
+        """
+        logging.info(f"Streaming logcat file: {logcat_file}")
+        for crash_info in self._scan_file(logcat_file):
+            yield self._finish_crash(crash_info, logcat_file)
+    
+    def _scan_file(self, logcat_file: str) -> Iterator[CrashInfo]:
+        """Scan a file in large binary blocks, decoding only lines the scanner needs
         
-        addr = match.group('addr')
-        lib_path = match.group('lib_path')
-        self.current_build_id = match.group('build_id')
-        logging.debug(f"Extracted: addr={addr}, lib_path={lib_path}, build_id={self.current_build_id}")
+        .gz, .zst and .zip files are decompressed while they are read. In a
+        zip archive every logcat and tombstone member is scanned; only the
+        first crash of a tombstone (the crashing thread) is used, and a
+        crash found in several members (logcat and tombstone of the same
+        crash) is reported once. With log_index set, a plain file is read
+        through its offset index, recording the index on the first scan.
+        """
+        if self.log_index and not is_compressed(logcat_file):
+            index = self.load_log_index(logcat_file)
+            if index:
+                yield from self._scan_indexed(logcat_file, index, index.crashes)
+            else:
+                yield from self._scan_recording(logcat_file, LogcatIndex.for_file(logcat_file))
+            return
+        seen = set()
+        for stream in iter_log_streams(logcat_file):
+            scanner = _LogcatScanner(self)
+            crashes = self._scan(_candidate_lines(stream.file, scanner, self.READ_BUFFER_SIZE, self.stats), scanner)
+            if stream.kind == 'tombstone':
+                crashes = itertools.islice(crashes, 1)  # 其余线程的栈不是崩溃
+            found = set()
+            for crash_info in crashes:
+                if stream.name != logcat_file:
+                    key = tuple((frame.lib, frame.addr) for frame in crash_info.frames)
+                    if key in seen:
+                        logging.debug(f"Skipping crash already found in another member: {stream.name}")
+                        continue
+                    found.add(key)
+                yield crash_info
+            seen |= found
+    
+    def load_log_index(self, logcat_file: str) -> Optional[LogcatIndex]:
+        """The stored offset index of a plain logcat file, or None if there is none or the file changed"""
+        if is_compressed(logcat_file):
+            return None
+        return LogcatIndex.load(index_path(logcat_file, self.cache_dir), logcat_file)
+    
+    def build_log_index(self, logcat_file: str) -> LogcatIndex:
+        """Scan a plain logcat file once, storing the offsets of its crashes and process events"""
+        index = LogcatIndex.for_file(logcat_file)
+        for _ in self._scan_recording(logcat_file, index):
+            pass
+        return index
+    
+    def _scan_recording(self, logcat_file: str, index: LogcatIndex) -> Iterator[CrashInfo]:
+        """Scan a whole plain file like _scan_file, recording its offset index and saving it at the end"""
+        scanner = _LogcatScanner(self)
+        scanner.events = index.events
+        with open(logcat_file, 'rb') as f:
+            for crash_info in self._scan(_candidate_lines(f, scanner, self.READ_BUFFER_SIZE, self.stats), scanner):
+                index.crashes.append(IndexedCrash(crash_info.offset, crash_info.end_offset, crash_info.process,
+                                                  crash_info.pid, crash_info.signal, crash_info.timestamp))
+                yield crash_info
+        # 扫描期间文件有变化（例如仍在写入）时不保存，下次重新建立
+        if not index.is_current():
+            logging.debug(f"{logcat_file} changed while it was indexed, not saving the index")
+            return
+        path = index_path(logcat_file, self.cache_dir)
+        try:
+            index.save(path)
+            self.stats.incr('log_index_saved')
+            logging.debug(f"Saved index of {len(index.crashes)} crashes to {path}")
+        except OSError as e:
+            logging.warning(f"Failed to save logcat index {path}: {e}")
+    
+    def _scan_indexed(self, logcat_file: str, index: LogcatIndex, crashes: List[IndexedCrash]) -> Iterator[CrashInfo]:
+        """Rescan only the byte ranges of the given indexed crashes, yielding raw crashes
         
-        # Skip Java frames and anonymous mappings
-        if '[anon:' in lib_path or 'dalvik' in lib_path.lower():
-            logging.debug("Skipping Java/anonymous frame")
-            return frame.strip()
+        A crash is made of the lines in [offset, end_offset): the line at
+        end_offset only ends it, as does the end of the input, so reading
+        exactly that range gives the crash of a sequential scan.
+        """
+        self.stats.incr('log_index_crashes', len(crashes))
+        with open(logcat_file, 'rb') as f:
+            for entry in crashes:
+                f.seek(entry.offset)
+                data = f.read(entry.end_offset - entry.offset)
+                scanner = _LogcatScanner(self)
+                scanner.current_package = index.package_at(entry.offset)
+                lines = _candidate_lines(io.BytesIO(data), scanner, self.READ_BUFFER_SIZE, self.stats, entry.offset)
+                for crash_info in self._scan(lines, scanner):
+                    if crash_info.offset == entry.offset:
+                        yield crash_info
+    
+    def query_logcat_file(self, logcat_file: str, package: Optional[str] = None, pid: Optional[int] = None,
+                          since: Optional[str] = None, until: Optional[str] = None) -> Iterator[CrashInfo]:
+        """Yield the symbolicated crashes of a logcat file that pass the filters of crash_matches
         
-        lib_name = self._get_lib_name(lib_path)
-        if not lib_name:
-            logging.debug("Failed to extract library name")
-            return frame.strip()
+        A plain file is indexed on first use; later queries read only the
+        byte ranges of the matching crashes, until the file changes.
+        Compressed files are scanned in full.
+        """
+        if not os.path.exists(logcat_file):
+            self._print_error(f"Logcat file not found: {logcat_file}")
+            return
+        if is_compressed(logcat_file):
+            crashes = (c for c in self._scan_file(logcat_file) if crash_matches(c, package, pid, since, until))
+        else:
+            index = self.load_log_index(logcat_file) or self.build_log_index(logcat_file)
+            crashes = self._scan_indexed(logcat_file, index, index.select(package, pid, since, until))
+        for crash_info in crashes:
+            yield self._finish_crash(crash_info, logcat_file)
+    
+    def scan_range(self, logcat_file: str, start: int, end: int,
+                   package: Optional[str] = None) -> List[CrashInfo]:
+        """Scan the lines of a plain logcat file that start in [start, end), returning raw crashes
+        
+        start must be a line start. package is the one of the last PROCESS
+        STARTED line before start (see last_started_package), so that PROCESS
+        ENDED lines end crashes as in a sequential scan. Reading runs past
+        end until the crash in progress there is complete, so a crash that
+        straddles end is returned whole; its end_offset tells the next range
+        where its scan agrees with a sequential one again.
+        """
+        scanner = _LogcatScanner(self)
+        scanner.current_package = package
         
-        symbol_lib = self._get_lib_path(lib_name)
-        if not symbol_lib:
-            logging.error("Failed to find symbol file")
-            return frame.strip()
+        def bounded(lines: Iterable[str]) -> Iterator[str]:
+            for line in lines:
+                if scanner.offset >= end:
+                    current = scanner.crash_info
+                    if current is None or current.offset >= end:
+                        return
+                yield line
         
-        logging.debug(f"Running addr2line for {lib_name} at address {addr}")
-        addr2line_output = self._addr2line(symbol_lib, addr)
-        logging.debug(f"addr2line output: {addr2line_output}")
-        return f"{frame.strip()}\n    {addr2line_output.strip()}"
+        with open(logcat_file, 'rb') as f:
+            f.seek(start)
+            lines = _candidate_lines(f, scanner, self.READ_BUFFER_SIZE, self.stats, start)
+            # 越过 end 时新开始的崩溃属于下一个范围
+            return [crash_info for crash_info in self._scan(bounded(lines), scanner) if crash_info.offset < end]
     
-    def parse_logcat_content(self, content: str) -> Optional[CrashInfo]:
-        """Parse logcat content and extract native crash information"""
-        logging.info("Parsing logcat content...")
-        logging.debug(f"Content length: {len(content)} bytes")
-        lines = content.splitlines()
-        logging.debug(f"Found {len(lines)} lines in logcat")
+    def last_started_package(self, logcat_file: str, start: int, end: int) -> Optional[str]:
+        """Package of the last PROCESS STARTED line in [start, end) of a plain logcat file, or None
         
+        The range is searched backwards in blocks, so this is cheap when
+        the range ends soon after such a line.
+        """
+        keyword = b'PROCESS STARTED'
+        with open(logcat_file, 'rb') as f:
+            pos = end
+            while pos > start:
+                block_start = max(start, pos - self.READ_BUFFER_SIZE)
+                f.seek(block_start)
+                # 多读 len(keyword) - 1 字节，找到跨过 pos 的关键字
+                block = f.read(pos - block_start + len(keyword) - 1)
+                i = len(block)
+                while True:
+                    i = block.rfind(keyword, 0, i)
+                    if i < 0:
+                        break
+                    f.seek(block_start + i)
+                    match = self._PROCESS_START_PATTERN.match(f.readline().decode('utf-8', 'replace'))
+                    if match:
+                        return match.group('package')
+                    i += len(keyword) - 1
+                pos = block_start
+        return None
+    
+    def _last_crash(self, crashes: Iterable[CrashInfo]) -> Optional[CrashInfo]:
+        """Consume raw crashes and symbolicate only the last one"""
         crash_info = None
-        stack_trace = []
-        collecting_stack = False
-        current_package = None
-        
-        for line in lines:
-            # Look for process start/end
-            logging.info(f"Processing line: {line}")
-            start_match = self._PROCESS_START_PATTERN.search(line)
-            if start_match:
-                current_package = start_match.group('package')
-                logging.debug(f"Process started: {current_package}")
-                continue
-                
-            end_match = self._PROCESS_END_PATTERN.search(line)
-            if end_match and end_match.group('package') == current_package:
-                logging.debug(f"Process ended: {current_package}")
-                collecting_stack = False
-                continue
-                
-            # Look for crash header
-            match = self._SIGNAL_PATTERN.search(line)
-            if match:
-                logging.info(f"Found crash info: signal={match.group('signal')} ({match.group('signal_name')})")
-                fatal_signal_msg = line.split(match.group('fatal_signal'))[1].strip() if match.group('fatal_signal') in line else line
-                crash_info = CrashInfo(
-                    process=match.group('process').strip(),
-                    signal=f"{match.group('fatal_signal')} {match.group('signal')} ({match.group('signal_name')})",
-                    signal_detail=f"{match.group('fatal_signal')} - {fatal_signal_msg}",
-                    stack_trace=[]
-                )
-                collecting_stack = True  # 开始收集堆栈信息
-                continue
-                
-            # Look for crash cmdline
-            match = self._CRASH_PATTERN.search(line)
-            if match and not crash_info:
-                logging.info(f"Found crash cmdline: {match.group('process')}")
-                crash_info = CrashInfo(
-                    process=match.group('process').strip(),
-                    signal="",
-                    signal_detail="",  # 初始化为空
-                    stack_trace=[]
-                )
-                continue
-                
-            # Also look for process info
-            match = self._PROCESS_INFO_PATTERN.search(line)
-            if match and not crash_info:
-                logging.info(f"Found process info: process={match.group('process').strip()}")
-                crash_info = CrashInfo(
-                    process=match.group('process').strip(),
-                    signal="",
-                    signal_detail="",  # 初始化为空
-                    stack_trace=[]
-                )
-                continue
-                
-            # Start collecting stack trace after seeing stack trace marker
-            if self._STACK_TRACE_START.search(line):
-                logging.debug("Found start of stack trace")
-                collecting_stack = True
-                
-            # Collect stack trace lines
-            if collecting_stack:
-                logging.debug(f"\nProcessing stack frame: {line}")
-                if self.symbols_dir and self.ndk_path:
-                    frame_line = self.symbolicate_frame(line)
-                else:
-                    frame_line = line.split('A        ')[1].strip()
-                logging.debug(f"Processed frame: {frame_line}")
-                stack_trace.append(frame_line)
+        for crash_info in crashes:
+            pass
+        return self._finish_crash(crash_info) if crash_info else None
+    
+    def parse_logcat_content(self, content: str) -> Optional[CrashInfo]:
+        """Parse logcat content and extract native crash information
         
-        if crash_info:
-            crash_info.stack_trace = stack_trace
-            
-        return crash_info
+        Returns the last crash found; use iter_crashes to get all of them.
+        """
+        logging.info("Parsing logcat content...")
+        logging.debug(f"Content length: {len(content)} bytes")
+        return self._last_crash(self._scan(io.StringIO(content)))
+    
+    def _write_crash(self, f: TextIO, crash_info: CrashInfo):
+        """Write one crash in the .parsed.txt text format"""
+        with self.stats.stage('write'):
+            text = (f'Process: {crash_info.process}\n'
+                    f'Signal: {crash_info.signal}\n'
+                    f'Singal Detail: {crash_info.signal_detail}\n'
+                    'Stack Trace:\n'
+                    + ''.join(f'{line.strip()}\n' for line in crash_info.stack_trace))
+            f.write(text)
+            self.stats.incr('bytes_written', len(text))
+    
+    def _output_file(self, logcat_file: str, output_name: Optional[str] = None) -> str:
+        """<output_dir>/<output_name>.parsed.txt; output_name defaults to the file name and may contain directories"""
+        output_file = os.path.join(self.output_dir, (output_name or os.path.basename(logcat_file)) + ".parsed.txt")
+        # 确保输出目录存在
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        return output_file
     
     def parse_logcat_file(self, logcat_file: str) -> Optional[CrashInfo]:
         """Parse logcat file and extract native crash information"""
@@ -311,40 +1060,58 @@ class LogcatParser:
             self._print_error(f"Logcat file not found: {logcat_file}")
             return None
         
-        logging.debug("Reading logcat file content...")
-        with open(logcat_file, 'r') as f:
-            content = f.read()
-        logging.debug(f"Read {len(content)} bytes from logcat file")
-        
-        crash_info = self.parse_logcat_content(content)
+        logging.debug("Streaming logcat file content...")
+        index = self.load_log_index(logcat_file) if self.log_index else None
+        if index:
+            # 直接读取最后一个崩溃所在的范围
+            crash_info = self._last_crash(self._scan_indexed(logcat_file, index, index.crashes[-1:]))
+        else:
+            crash_info = self._last_crash(self._scan_file(logcat_file))
         
         # 如果提供了输出目录，则写入结果
         if self.output_dir and crash_info:
-            # 确保输出目录存在
-            os.makedirs(self.output_dir, exist_ok=True)
-            output_file = os.path.join(self.output_dir, os.path.basename(logcat_file) + ".parsed.txt")
+            output_file = self._output_file(logcat_file)
             logging.info(f"Writing parsed output to file: {output_file}")
             with open(output_file, 'w') as f:
-                f.write(f'Process: {crash_info.process}\n')
-                f.write(f'Signal: {crash_info.signal}\n')
-                f.write(f'Singal Detail: {crash_info.signal_detail}\n')
-                f.write('Stack Trace:\n')
-                for line in crash_info.stack_trace:
-                    f.write(f'{line.strip()}\n')
+                self._write_crash(f, crash_info)
         
         return crash_info
     
+    def stream_logcat_file(self, logcat_file: str, output_name: Optional[str] = None) -> Iterator[CrashInfo]:
+        """Stream every crash in a logcat file, writing each to the output file as it is found"""
+        logging.info(f"Starting to stream logcat file: {logcat_file}")
+        if not os.path.exists(logcat_file):
+            self._print_error(f"Logcat file not found: {logcat_file}")
+            return
+        
+        yield from self.write_crashes(logcat_file, self.iter_logcat_file(logcat_file), output_name)
+    
+    def write_crashes(self, logcat_file: str, crashes: Iterable[CrashInfo],
+                      output_name: Optional[str] = None) -> Iterator[CrashInfo]:
+        """Pass crashes through, writing each to the output file of logcat_file (see _output_file) as it arrives"""
+        out = None
+        try:
+            for crash_info in crashes:
+                if self.output_dir:
+                    if out is None:
+                        output_file = self._output_file(logcat_file, output_name)
+                        logging.info(f"Writing parsed output to file: {output_file}")
+                        out = open(output_file, 'w')
+                    else:
+                        out.write('\n')
+                    self._write_crash(out, crash_info)
+                    out.flush()
+                yield crash_info
+        finally:
+            if out:
+                out.close()
+    
     def symbolicate_trace(self, stack_trace: List[str]) -> str:
         """Symbolicate stack trace using addr2line"""
-        if not (self.symbols_dir and self.ndk_path):
+        if not self._can_symbolicate():
             return '\n'.join(stack_trace)
             
-        symbolicated_frames = []
-        for frame in stack_trace:
-            symbolicated_frame = self.symbolicate_frame(frame)
-            symbolicated_frames.append(symbolicated_frame)
-            
-        return '\n'.join(symbolicated_frames)
+        return '\n'.join(self.symbolicate_frames(stack_trace))
 
 def parse_args():
     """Parse command line arguments"""
@@ -361,7 +1128,7 @@ def parse_args():
     
     parser.add_argument(
         'logcat_file',
-        help='Path to the logcat output file containing native crash information'
+        help='Path to the logcat output file containing native crash information (.gz, .zst and bugreport .zip are read directly)'
     )
     parser.add_argument(
         '-s', '--symbols',
@@ -388,41 +1155,181 @@ def parse_args():
         action='store_true',
         help='Disable Build ID verification'
     )
+    parser.add_argument(
+        '--no-line-info',
+        action='store_true',
+        help='Only resolve function name and offset, reading ELF symbol tables in-process instead of running addr2line'
+    )
+    parser.add_argument(
+        '--sidecar-dir',
+        help='Resolve frames from sidecar files compiled by src.symbol_sidecar in DIR before running addr2line',
+        metavar='DIR'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        help='Directory of the persistent symbolication cache (default: ~/.cache/native-toolkit)',
+        metavar='DIR'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the persistent symbolication cache'
+    )
+    parser.add_argument(
+        '-a', '--all',
+        action='store_true',
+        help='Stream the file and report every crash as soon as it is found'
+    )
+    parser.add_argument(
+        '--buckets',
+        help='Group duplicate crashes by stack signature, symbolicating one per bucket, and write '
+             'bucket counts with first/last seen to FILE (implies --all)',
+        metavar='FILE'
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        help='Scan a large plain logcat file in chunks with N processes (0: one per CPU; implies --all)',
+        metavar='N'
+    )
+    parser.add_argument(
+        '--chunk-mb',
+        type=float,
+        default=64,
+        help='Size of the chunks scanned by each process with --jobs (default: 64)',
+        metavar='MB'
+    )
+    parser.add_argument(
+        '--index',
+        action='store_true',
+        help='Keep an offset index of a plain logcat file in the cache directory, so later runs read only '
+             'the crashes (rebuilt automatically when the file changes)'
+    )
+    parser.add_argument(
+        '--package',
+        help='Only report crashes of this package or its processes (implies --index and --all)'
+    )
+    parser.add_argument(
+        '--pid',
+        type=int,
+        help='Only report crashes of this pid (implies --index and --all)'
+    )
+    parser.add_argument(
+        '--since',
+        help='Only report crashes logged at or after this timestamp, e.g. "01-01 12:00" (implies --index and --all)',
+        metavar='TIME'
+    )
+    parser.add_argument(
+        '--until',
+        help='Only report crashes logged up to this timestamp, inclusive (implies --index and --all)',
+        metavar='TIME'
+    )
+    parser.add_argument(
+        '--stats',
+        choices=['text', 'json'],
+        help='Print per-stage timings and counters to stderr when done'
+    )
+    parser.add_argument(
+        '--jsonl',
+        help='Append crashes as JSON Lines records to FILE (.gz to compress) instead of writing .parsed.txt',
+        metavar='FILE'
+    )
+    parser.add_argument(
+        '--jsonl-max-mb',
+        type=float,
+        help='Rotate the JSON Lines output after about this many MB',
+        metavar='MB'
+    )
     
     args = parser.parse_args()
     # 确保 verbose 标志与环境变量同步
     args.verbose = args.verbose or os.environ.get('VERBOSE') == '1'
     return args
 
+def print_crash_info(crash_info: CrashInfo):
+    """Print one crash to stdout"""
+    print(f'\nCrash Information:')
+    print(f'Process: {crash_info.process}')
+    print(f'Signal: {crash_info.signal}')
+    print(f'Signal Detail: {crash_info.signal_detail}')
+    print('\nStack Trace:')
+    for line in crash_info.stack_trace:
+        print(line.strip())
+
 def main():
     """Main entry point"""
-    print("Starting main function...")
     args = parse_args()
-    print(f"Parsed arguments: {args}")  # 现在应该显示正确的 verbose 值
+    logging.debug(f"Parsed arguments: {args}")
     
-    parser = LogcatParser(
+    options = dict(
         symbols_dir=args.symbols,
         ndk_path=args.ndk or os.environ.get('ANDROID_NDK_HOME'),
-        output_dir=args.output,
+        output_dir=None if args.jsonl else args.output,  # JSON Lines 输出替代逐文件的文本结果
         verbose=args.verbose or os.environ.get('VERBOSE') == '1',  # 确保两种方式都能设置 verbose
-        verify_build_id= args.verify_build_id  # 根据命令行参数设置 verify_build_id
+        verify_build_id= args.verify_build_id,  # 根据命令行参数设置 verify_build_id
+        line_info=not args.no_line_info,
+        cache_dir=args.cache_dir,
+        persistent_cache=not args.no_cache,
+        stats=Stats() if args.stats else None,
+        bucket_crashes=bool(args.buckets),
+        sidecar_dir=args.sidecar_dir,
+        log_index=args.index
     )
-    print("Created LogcatParser instance")  # 添加调试输出
+    query = dict(package=args.package, pid=args.pid, since=args.since, until=args.until)
+    if any(value is not None for value in query.values()):
+        options['log_index'] = True
+    else:
+        query = None
+    if args.jobs is not None:
+        from src.parallel_scan import ParallelLogcatParser
+        scanner = ParallelLogcatParser(jobs=args.jobs or None, chunk_size=int(args.chunk_mb * 1024 * 1024), **options)
+        parser = scanner.parser
+    else:
+        scanner = None
+        parser = LogcatParser(**options)
+    
+    sink = None
+    if args.jsonl:
+        from src.jsonl_sink import JsonlSink
+        sink = JsonlSink(args.jsonl, max_bytes=int(args.jsonl_max_mb * 1024 * 1024) if args.jsonl_max_mb else None,
+                         stats=parser.stats)
     
     # 解析日志文件
-    crash_info = parser.parse_logcat_file(args.logcat_file)
+    with parser:
+        if query:
+            crash_count = 0
+            for crash_info in parser.write_crashes(args.logcat_file, parser.query_logcat_file(args.logcat_file, **query)):
+                if sink:
+                    sink.write_crash(crash_info, os.path.abspath(args.logcat_file), crash_count)
+                crash_count += 1
+                print_crash_info(crash_info)
+        elif args.all or args.buckets or scanner:
+            crash_count = 0
+            for crash_info in (scanner or parser).stream_logcat_file(args.logcat_file):
+                if sink:
+                    sink.write_crash(crash_info, os.path.abspath(args.logcat_file), crash_count)
+                crash_count += 1
+                print_crash_info(crash_info)
+        else:
+            crash_info = parser.parse_logcat_file(args.logcat_file)
+            crash_count = 1 if crash_info else 0
+            if crash_info:
+                if sink:
+                    sink.write_crash(crash_info, os.path.abspath(args.logcat_file))
+                print_crash_info(crash_info)
+    if sink:
+        sink.close()
+    if args.buckets:
+        parser.buckets.write(args.buckets)
+        print(f'\n{crash_count} crashes in {len(parser.buckets)} buckets')
+    
+    if args.stats:
+        print_stats(parser.stats, args.stats)
     
     # 输出结果
-    if crash_info:
+    if crash_count:
         if args.verbose:
             logging.debug('Found crash information')
-        print(f'\nCrash Information:')
-        print(f'Process: {crash_info.process}')
-        print(f'Signal: {crash_info.signal}')
-        print(f'Signal Detail: {crash_info.signal_detail}')
-        print('\nStack Trace:')
-        for line in crash_info.stack_trace:
-            print(line.strip())
     else:
         if args.verbose:
             logging.debug('No native crash found')
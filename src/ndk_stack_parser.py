@@ -1,23 +1,80 @@
 import os
+import sys
+import time
+import signal
+import argparse
+import tempfile
+import threading
 import subprocess
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
 from .config import Config
+from .stats import Stats, print_stats
+from .jsonl_sink import JsonlSink, dump_record
+from .log_sources import open_log
+from .ndk_logcat_parser import LogcatParser, Frame, _message
+from .scheduler import SymbolScheduler, get_scheduler
 import logging
 
+ENGINES = ('ndk-stack', 'native')
+# native 引擎输出中符号化结果的缩进，与 ndk-stack 一样写在栈帧下方
+_NATIVE_INDENT = ' ' * 40
+# ndk-stack 原样输出的摘要行
+_SUMMARY_PREFIXES = ('Build fingerprint:', 'Abort message:', 'pid:', 'signal ')
+
+@dataclass
+class DumpResult:
+    """Outcome of running ndk-stack on one dump"""
+    dump_file: str
+    output_file: Optional[str]
+    status: str  # 'ok', 'failed' 或 'timeout'
+    returncode: Optional[int] = None
+    duration: float = 0.0  # 不含等待外部工具槽位的时间
+    error: Optional[str] = None
+    queue_wait: float = 0.0  # 等待外部工具槽位的时间
+
 class NDKStackParser:
-    """Parser for NDK crash dumps using ndk-stack tool"""
+    """Parser for NDK crash dumps using ndk-stack tool
+    
+    With engine='native' dumps are not passed to ndk-stack: their frames
+    are parsed in this process and symbolicated through a LogcatParser
+    (symbolicator, created on first use if not given), so the symbol index,
+    persistent cache and addr2line processes are shared by every dump.
+    The output follows ndk-stack's format.
+    """
     
-    def __init__(self, config: Config, output_dir: Optional[str] = None):
+    def __init__(self, config: Config, output_dir: Optional[str] = None, stats: Optional[Stats] = None,
+                 engine: str = 'ndk-stack', symbolicator: Optional[LogcatParser] = None,
+                 cache_dir: Optional[str] = None, persistent_cache: bool = True,
+                 scheduler: Optional[SymbolScheduler] = None):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine} (expected one of {', '.join(ENGINES)})")
         self.config = config
         self.config.validate()
-        self._ndk_stack_path = self._get_ndk_stack_path()
+        self.engine = engine
+        self._ndk_stack_path = self._get_ndk_stack_path() if engine == 'ndk-stack' else None
         self.verbose = os.environ.get('VERBOSE') == '1'
         self.output_dir = output_dir  # 新增输出目录
+        self.stats = stats or Stats(enabled=False)  # 各阶段耗时与计数
+        self.cache_dir = cache_dir
+        self.persistent_cache = persistent_cache
+        # 与 LogcatParser 共享外部工具并发上限，ndk-stack 与 addr2line 一起计数
+        self.scheduler = scheduler or get_scheduler()
+        self._symbolicator = symbolicator
+        self._owns_symbolicator = symbolicator is None
+        self._symbolicator_lock = threading.Lock()
         
         # 检查是否已经配置过日志
         if not logging.getLogger().handlers:
             self._setup_logging()
     
+    def close(self):
+        """Shut down the symbolicator of the native engine, if this parser created it"""
+        if self._symbolicator and self._owns_symbolicator:
+            self._symbolicator.close()
+            self._symbolicator = None
+    
     def _setup_logging(self):
         """设置日志级别和格式"""
         # 首先配置日志
@@ -64,42 +121,320 @@ class NDKStackParser:
         """Print error message in red"""
         logging.error(f"\033[91m{message}\033[0m")  # 红色文本
     
-    def parse_dump_file(self, dump_file: str) -> str:
-        """Parse a .dmp file and return symbolicated stack trace"""
+    def _build_command(self, dump_file: str) -> List[str]:
+        return [
+            self._ndk_stack_path,
+            '-sym', self.config.symbols_dir,
+            '-dump', dump_file
+        ]
+    
+    def _get_symbolicator(self) -> LogcatParser:
+        with self._symbolicator_lock:
+            if self._symbolicator is None:
+                self._symbolicator = LogcatParser(
+                    symbols_dir=self.config.symbols_dir,
+                    ndk_path=self.config.ndk_path,
+                    verbose=self.verbose,
+                    cache_dir=self.cache_dir,
+                    persistent_cache=self.persistent_cache,
+                    stats=self.stats,
+                    scheduler=self.scheduler
+                )
+            return self._symbolicator
+    
+    @staticmethod
+    def _render_native(frame: Frame) -> List[str]:
+        """ndk-stack style lines of a frame: the frame, then its function and source location"""
+        lines = [f'#{frame.index:02d} 0x{frame.hex_addr} {frame.lib}'
+                 + (f' ({frame.symbol})' if frame.symbol else '')
+                 + (f' (BuildId: {frame.build_id})' if frame.build_id else '')]
+        resolved = frame.resolved
+        if resolved and not resolved.startswith(('??', 'Failed to symbolicate')):
+            function, at, location = resolved.rpartition(' at ')
+            if at:
+                lines.append(_NATIVE_INDENT + function)
+                if not location.startswith('??'):
+                    lines.append(_NATIVE_INDENT + location)
+            else:
+                lines.append(_NATIVE_INDENT + resolved)
+        return lines
+    
+    def symbolicate_native(self, dump_file: str) -> str:
+        """Symbolicate a tombstone in this process, returning ndk-stack style text
+        
+        Every frame of the dump is resolved in one batch per symbol file,
+        through the symbolicator's caches.
+        """
+        with self.stats.stage('read'), open_log(dump_file) as f:
+            lines = f.read().decode('utf-8', 'replace').splitlines()
+        items = []  # 输出行或 Frame，保持原顺序
+        in_crash = False
+        for line in lines:
+            if '*** *** ***' in line:
+                in_crash = True
+                items.append('********** Crash dump: **********')
+                continue
+            if not in_crash:
+                continue
+            frame = Frame.parse(line) if '#' in line else None
+            if frame:
+                items.append(frame)
+                continue
+            text = _message(line)
+            if text.startswith(_SUMMARY_PREFIXES):
+                items.append(text)
+        
+        self._get_symbolicator().resolve_frames([item for item in items if isinstance(item, Frame)])
+        output = []
+        for item in items:
+            if isinstance(item, Frame):
+                output.extend(self._render_native(item))
+            else:
+                output.append(item)
+        output.append('Crash dump is completed')
+        return '\n'.join(output) + '\n'
+    
+    def parse_dump_file(self, dump_file: str, timeout: Optional[float] = None, output_name: Optional[str] = None) -> str:
+        """Parse a .dmp file and return symbolicated stack trace
+        
+        The output file is named after output_name (which may contain
+        directories) instead of the dump's file name if given.
+        """
         logging.info(f"Starting to parse dump file: {dump_file}")
         if not os.path.exists(dump_file):
             self._print_error(f"Dump file not found: {dump_file}")
             raise FileNotFoundError(f"Dump file not found: {dump_file}")
         
+        if self.engine == 'native':
+            self.stats.incr('bytes_read', os.path.getsize(dump_file))
+            symbolicated_trace = self.symbolicate_native(dump_file)
+            self._write_output(dump_file, symbolicated_trace, output_name)
+            return symbolicated_trace
+        
         logging.debug(f"Using ndk-stack path: {self._ndk_stack_path}")
         logging.debug(f"Using symbols directory: {self.config.symbols_dir}")
-        cmd = [
-            self._ndk_stack_path,
-            '-sym', self.config.symbols_dir,
-            '-dump', dump_file
-        ]
+        cmd = self._build_command(dump_file)
         
+        self.stats.incr('bytes_read', os.path.getsize(dump_file))
+        queued = time.monotonic()
+        self.scheduler.slots.acquire()
+        start = time.monotonic()
+        self.stats.add_time('ndk_stack_queue', start - queued)
         try:
             logging.debug(f"Running command: {' '.join(cmd)}")
             result = subprocess.run(
                 cmd,
                 capture_output=True,
                 text=True,
-                check=True
+                check=True,
+                timeout=timeout
             )
+            self.stats.spawn('ndk-stack')
             
             symbolicated_trace = result.stdout
             logging.debug(f"Symbolication successful, output length: {len(symbolicated_trace)}")
             
-            # 如果提供了输出目录，则写入文件
-            if self.output_dir:
-                output_file = os.path.join(self.output_dir, os.path.basename(dump_file) + ".symbolicated.txt")
-                logging.info(f"Writing output to file: {output_file}")
-                with open(output_file, 'w') as f:
-                    f.write(symbolicated_trace)
-                    
+            self._write_output(dump_file, symbolicated_trace, output_name)
             return symbolicated_trace
             
         except subprocess.CalledProcessError as e:
+            self.stats.spawn('ndk-stack', failed=True)
             logging.error(f"Failed to parse dump file: {e.stderr}")
-            raise RuntimeError(f"Failed to parse dump file: {e.stderr}") 
\ No newline at end of file
+            raise RuntimeError(f"Failed to parse dump file: {e.stderr}")
+        except subprocess.TimeoutExpired:
+            self.stats.spawn('ndk-stack', failed=True)
+            logging.error(f"ndk-stack timed out after {timeout}s: {dump_file}")
+            raise RuntimeError(f"ndk-stack timed out after {timeout}s: {dump_file}")
+        finally:
+            self.scheduler.slots.release()
+            self.stats.tool_time('ndk-stack', time.monotonic() - start)
+    
+    def _write_output(self, dump_file: str, symbolicated_trace: str, output_name: Optional[str] = None):
+        # 如果提供了输出目录，则写入文件
+        if self.output_dir:
+            output_file = os.path.join(self.output_dir, (output_name or os.path.basename(dump_file)) + ".symbolicated.txt")
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            logging.info(f"Writing output to file: {output_file}")
+            with self.stats.stage('write'), open(output_file, 'w') as f:
+                f.write(symbolicated_trace)
+            self.stats.incr('bytes_written', len(symbolicated_trace))
+    
+    @staticmethod
+    def _kill(proc: subprocess.Popen):
+        if os.name == 'posix':
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+                return
+            except OSError:
+                pass
+        proc.kill()
+    
+    def _run_to_file(self, dump_file: str, output_dir: Optional[str], timeout: Optional[float],
+                     sink: Optional[JsonlSink] = None) -> DumpResult:
+        """Symbolicate one dump, streaming the output straight into the output directory
+        
+        With a sink the output is written there as a JSON Lines record instead.
+        """
+        output_file = None if sink else os.path.join(output_dir, os.path.basename(dump_file) + ".symbolicated.txt")
+        # 先写入临时文件，成功后再改名，避免下游读到不完整的结果
+        part_file = output_file + '.part' if output_file else None
+        result = DumpResult(dump_file=dump_file, output_file=output_file, status='ok')
+        start = time.monotonic()
+        if not os.path.exists(dump_file):
+            result.status, result.output_file = 'failed', None
+            result.error = f"Dump file not found: {dump_file}"
+            if sink:
+                sink.write(dump_record(dump_file, '', result.status, error=result.error))
+            return result
+        
+        if self.engine == 'native':
+            output = self._native_to_part(dump_file, part_file, result)
+        else:
+            output = self._ndk_stack_to_part(dump_file, part_file, timeout, result, want_output=sink is not None)
+        result.duration = time.monotonic() - start - result.queue_wait
+        if self.engine == 'ndk-stack':
+            self.stats.spawn('ndk-stack', failed=result.status != 'ok')
+            self.stats.tool_time('ndk-stack', result.duration)
+            self.stats.add_time('ndk_stack_queue', result.queue_wait)
+        self.stats.incr(f'dumps_{result.status}')
+        self.stats.incr('bytes_read', os.path.getsize(dump_file))
+        
+        if sink:
+            sink.write(dump_record(dump_file, output, result.status, result.duration, result.error,
+                                   queue_wait=result.queue_wait))
+        elif result.status == 'ok':
+            self.stats.incr('bytes_written', os.path.getsize(part_file))
+            os.replace(part_file, output_file)
+        else:
+            if os.path.exists(part_file):
+                os.remove(part_file)
+            result.output_file = None
+        if result.status != 'ok':
+            logging.error(f"Failed to parse dump file {dump_file}: {result.error}")
+        return result
+    
+    def _ndk_stack_to_part(self, dump_file: str, part_file: Optional[str], timeout: Optional[float],
+                           result: DumpResult, want_output: bool) -> str:
+        """Run ndk-stack with its stdout in part_file, returning the output if want_output"""
+        cmd = self._build_command(dump_file)
+        logging.debug(f"Running command: {' '.join(cmd)}")
+        output = ''
+        with (open(part_file, 'wb') if part_file else tempfile.TemporaryFile()) as out, tempfile.TemporaryFile() as err:
+            queued = time.monotonic()
+            with self.scheduler.slots.slot():
+                result.queue_wait = time.monotonic() - queued
+                # 独立进程组，超时时连同 ndk-stack 启动的子进程一起结束
+                proc = subprocess.Popen(cmd, stdout=out, stderr=err, start_new_session=(os.name == 'posix'))
+                try:
+                    result.returncode = proc.wait(timeout=timeout)
+                except subprocess.TimeoutExpired:
+                    self._kill(proc)
+                    proc.wait()
+                    result.status = 'timeout'
+                    result.error = f"ndk-stack timed out after {timeout}s"
+            if result.status == 'ok' and result.returncode != 0:
+                # 只保留 stderr 末尾部分，避免异常输出占用过多内存
+                err.seek(max(0, err.seek(0, os.SEEK_END) - 4096))
+                result.status = 'failed'
+                result.error = err.read().decode(errors='replace').strip()
+            if want_output and result.status == 'ok':
+                out.seek(0)
+                output = out.read().decode(errors='replace')
+        return output
+    
+    def _native_to_part(self, dump_file: str, part_file: Optional[str], result: DumpResult) -> str:
+        """Symbolicate with the native engine, writing the output to part_file if given"""
+        try:
+            output = self.symbolicate_native(dump_file)
+            if part_file:
+                with self.stats.stage('write'), open(part_file, 'w') as f:
+                    f.write(output)
+            return output
+        except (OSError, EOFError, RuntimeError) as e:
+            # 损坏的压缩文件等错误只影响这一个 dump
+            result.status = 'failed'
+            result.error = f"{type(e).__name__}: {e}"
+            return ''
+    
+    def parse_dump_files(self, dump_files: List[str], output_dir: Optional[str] = None,
+                         max_workers: int = 4, timeout: Optional[float] = 300,
+                         sink: Optional[JsonlSink] = None) -> List[DumpResult]:
+        """Run ndk-stack on many dumps concurrently, with a per-dump timeout
+        
+        At most max_workers ndk-stack processes run at once, further limited
+        by the tool process cap of the scheduler (with the native engine,
+        max_workers threads share one symbolicator and the timeout does not
+        apply). Time spent waiting for the cap is reported as queue_wait,
+        not as part of each dump's duration. Output is written directly to ``<output_dir>/<dump>.symbolicated.txt`` instead of being
+        held in memory, or to sink as one JSON Lines record per dump; results
+        are returned in input order.
+        """
+        output_dir = output_dir or self.output_dir
+        if not output_dir and not sink:
+            raise ValueError("Output directory is required to parse multiple dump files")
+        if not sink:
+            os.makedirs(output_dir, exist_ok=True)
+        logging.info(f"Parsing {len(dump_files)} dump files with up to {max_workers} concurrent {self.engine} workers")
+        limit = self.scheduler.slots.limit
+        if self.engine == 'ndk-stack' and max_workers > limit:
+            logging.warning(f"Only {limit} of {max_workers} ndk-stack processes can run at once: the tool process cap "
+                            f"is {limit} (NDK_TOOLKIT_MAX_TOOLS, or a scheduler with a higher limit)")
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            return list(executor.map(lambda dump: self._run_to_file(dump, output_dir, timeout, sink), dump_files))
+
+
+def main():
+    """Symbolicate a burst of dump files concurrently"""
+    parser = argparse.ArgumentParser(description='Symbolicate .dmp files concurrently using ndk-stack or the native engine.')
+    parser.add_argument('dump_files', nargs='+', help='Dump files to symbolicate')
+    parser.add_argument('-s', '--symbols', help='Path to the directory containing symbol files', metavar='DIR')
+    parser.add_argument('-n', '--ndk', help='Path to Android NDK installation', metavar='PATH')
+    parser.add_argument('-o', '--output', help='Output directory for symbolicated results', metavar='DIR')
+    parser.add_argument('--jsonl', help='Write one JSON Lines record per dump to FILE (.gz to compress) '
+                                        'instead of a text file per dump', metavar='FILE')
+    parser.add_argument('--jsonl-max-mb', type=float, help='Rotate the JSON Lines output after about this many MB',
+                        metavar='MB')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='Maximum concurrent ndk-stack processes, raising the tool process cap if needed (default: 4)',
+                        metavar='N')
+    parser.add_argument('--timeout', type=float, default=300, help='Per-dump timeout in seconds (default: 300)', metavar='SEC')
+    parser.add_argument('--engine', choices=ENGINES, default='ndk-stack',
+                        help='ndk-stack (default), or native to symbolicate in-process with cached, batched lookups')
+    parser.add_argument('--cache-dir', help='Directory of the persistent symbolication cache (native engine)', metavar='DIR')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the persistent symbolication cache')
+    parser.add_argument('--stats', choices=['text', 'json'], help='Print timings and counters to stderr when done')
+    args = parser.parse_args()
+    if not args.output and not args.jsonl:
+        parser.error('one of -o/--output or --jsonl is required')
+    
+    config = Config(
+        ndk_path=args.ndk or os.environ.get('ANDROID_NDK_HOME', ''),
+        symbols_dir=args.symbols or os.environ.get('SYMBOLS_DIR', ''),
+        output_dir=args.output
+    )
+    # 显式指定的 -j 优先于默认的工具进程上限（CPU 核数）
+    scheduler = SymbolScheduler(max(args.jobs, get_scheduler().slots.limit)) if args.jobs else None
+    jobs = args.jobs or 4
+    stack_parser = NDKStackParser(config, output_dir=args.output, stats=Stats() if args.stats else None,
+                                  engine=args.engine, cache_dir=args.cache_dir, persistent_cache=not args.no_cache,
+                                  scheduler=scheduler)
+    try:
+        if args.jsonl:
+            with JsonlSink(args.jsonl, max_bytes=int(args.jsonl_max_mb * 1024 * 1024) if args.jsonl_max_mb else None,
+                           stats=stack_parser.stats) as sink:
+                results = stack_parser.parse_dump_files(args.dump_files, max_workers=jobs, timeout=args.timeout,
+                                                        sink=sink)
+        else:
+            results = stack_parser.parse_dump_files(args.dump_files, max_workers=jobs, timeout=args.timeout)
+    finally:
+        stack_parser.close()
+    if args.stats:
+        print_stats(stack_parser.stats, args.stats)
+    for result in results:
+        print(f'{result.status:8} {result.duration:7.2f}s  {result.dump_file}' + (f'  ({result.error})' if result.error else ''))
+    if any(result.status != 'ok' for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
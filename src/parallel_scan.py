@@ -0,0 +1,161 @@
+import os
+import logging
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .ndk_logcat_parser import LogcatParser, CrashInfo
+from .log_sources import is_compressed
+from .stats import Stats
+
+# 每个任务扫描的字节数；足够大以摊薄任务调度，又能让多个进程均匀分到工作
+DEFAULT_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+def split_chunks(path: str, chunk_size: int) -> List[Tuple[int, int]]:
+    """Split a file into [start, end) byte ranges of about chunk_size, each starting at a line start"""
+    size = os.path.getsize(path)
+    chunks = []
+    start = 0
+    with open(path, 'rb') as f:
+        while start < size:
+            end = start + chunk_size
+            if end < size:
+                # 延伸到下一行的行首
+                f.seek(end - 1)
+                f.readline()
+                end = f.tell()
+            end = min(end, size)
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+# 每个工作进程持有自己的解析器；符号缓存和索引通过磁盘在进程之间共享
+_parser: Optional[LogcatParser] = None
+
+
+def _init_worker(kwargs: dict, stats_enabled: bool, verbose: bool):
+    global _parser
+    logging.basicConfig(format='[%(levelname)s] %(message)s')
+    # fork 出的子进程会继承父进程的日志配置，这里显式降低级别
+    logging.getLogger().setLevel(logging.DEBUG if verbose else logging.WARNING)
+    _parser = LogcatParser(stats=Stats() if stats_enabled else None, **kwargs)
+
+
+def _last_package(logcat_file: str, start: int, end: int) -> Optional[str]:
+    return _parser.last_started_package(logcat_file, start, end)
+
+
+def _scan_chunk(logcat_file: str, start: int, end: int,
+                package: Optional[str]) -> Tuple[List[CrashInfo], Optional[Tuple[int, dict]]]:
+    """Scan and symbolicate one range; also returns this worker's stats so far, keyed by pid"""
+    crashes = _parser.scan_range(logcat_file, start, end, package)
+    for crash_info in crashes:
+        _parser._finish_crash(crash_info, logcat_file)
+    stats = _parser.stats
+    return crashes, (os.getpid(), stats.to_dict()) if stats.enabled else None
+
+
+class ParallelLogcatParser:
+    """Scan one large plain logcat file with a pool of processes
+
+    The file is split at line boundaries into ranges of about chunk_size
+    bytes. A first pass finds the package of the last PROCESS STARTED line
+    of every range, so each range starts with the state of a sequential
+    scan; then the workers scan and symbolicate the ranges. A crash that
+    straddles the end of a range is read whole by the range it starts in,
+    and the next range drops what it saw of it (rescanning from the end of
+    that crash in the rare case its own scan was still inside a crash
+    there). Crashes are yielded in file order, the same as
+    LogcatParser.iter_logcat_file would yield them. Compressed files and
+    files of a single chunk are scanned sequentially. Other keyword
+    arguments are passed to LogcatParser.
+    """
+
+    def __init__(self, jobs: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE, **kwargs):
+        self.parser = LogcatParser(**kwargs)
+        self.stats = self.parser.stats
+        self.jobs = jobs or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size)
+        # Stats 和调度器不能传给其他进程（各进程使用自己的调度器），输出文件由主进程写
+        self._worker_kwargs = {k: v for k, v in kwargs.items() if k not in ('stats', 'output_dir', 'scheduler')}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.parser.close()
+
+    def iter_logcat_file(self, logcat_file: str) -> Iterator[CrashInfo]:
+        """Yield every crash of a logcat file in file order, scanning its chunks in parallel"""
+        chunks = [] if is_compressed(logcat_file) else split_chunks(logcat_file, self.chunk_size)
+        if self.jobs < 2 or len(chunks) < 2:
+            yield from self.parser.iter_logcat_file(logcat_file)
+            return
+
+        workers = min(self.jobs, len(chunks))
+        logging.info(f"Scanning {logcat_file} in {len(chunks)} chunks with {workers} processes")
+        self.stats.incr('chunks', len(chunks))
+        snapshots: Dict[int, dict] = {}
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(self._worker_kwargs, self.stats.enabled, self.parser.verbose))
+        try:
+            with self.stats.stage('chunk_packages'):
+                starts, ends = zip(*chunks)
+                started = list(executor.map(_last_package, itertools.repeat(logcat_file), starts, ends))
+            # 每个范围开始时的包名：之前各范围中最后启动的那个
+            packages = []
+            package = None
+            for last in started:
+                packages.append(package)
+                package = last or package
+
+            pending = deque()
+            submitted = 0
+            resync = 0  # 顺序扫描与各范围的扫描在此偏移之后一致
+            for k, (start, end) in enumerate(chunks):
+                # 限制排队的范围数，避免结果在内存中堆积
+                while submitted < len(chunks) and len(pending) < 2 * workers:
+                    chunk_start, chunk_end = chunks[submitted]
+                    pending.append(executor.submit(_scan_chunk, logcat_file, chunk_start, chunk_end,
+                                                   packages[submitted]))
+                    submitted += 1
+                crashes, snapshot = pending.popleft().result()
+                if snapshot:
+                    snapshots[snapshot[0]] = snapshot[1]
+                if resync >= end:
+                    continue  # 整个范围都在上一个跨界崩溃之内
+                finished = True
+                if start < resync and any(c.offset < resync < c.end_offset for c in crashes):
+                    # 这个范围的扫描在 resync 处仍处于某个崩溃之中，之后的状态与顺序扫描不同
+                    logging.debug(f"Rescanning {logcat_file} from {resync} to {end}")
+                    self.stats.incr('chunks_rescanned')
+                    package = self.parser.last_started_package(logcat_file, start, resync) or packages[k]
+                    crashes = self.parser.scan_range(logcat_file, resync, end, package)
+                    finished = False
+                for crash_info in crashes:
+                    if crash_info.offset < resync:
+                        continue  # 跨界崩溃的后半部分
+                    if not finished:
+                        self.parser._finish_crash(crash_info, logcat_file)
+                    elif self.parser.buckets is not None:
+                        self.parser.buckets.add(crash_info, logcat_file)
+                    yield crash_info
+                if crashes:
+                    resync = max(resync, crashes[-1].end_offset)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            for snapshot in snapshots.values():
+                self.stats.merge(snapshot)
+
+    def stream_logcat_file(self, logcat_file: str, output_name: Optional[str] = None) -> Iterator[CrashInfo]:
+        """Like LogcatParser.stream_logcat_file, scanning the file in parallel"""
+        if not os.path.exists(logcat_file):
+            self.parser._print_error(f"Logcat file not found: {logcat_file}")
+            return
+        yield from self.parser.write_crashes(logcat_file, self.iter_logcat_file(logcat_file), output_name)
@@ -0,0 +1,172 @@
+import os
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+INTERACTIVE = 0  # 用户正在等待的单个崩溃，例如守护进程的 symbolicate 请求
+BATCH = 1  # 批量回填，可以让位于交互请求
+PRIORITIES = {'interactive': INTERACTIVE, 'batch': BATCH}
+
+# 当前线程 / 协程的优先级；asyncio.to_thread 会复制上下文，工作线程沿用调用方的优先级
+_priority: contextvars.ContextVar = contextvars.ContextVar('symbolication_priority', default=BATCH)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+@contextmanager
+def priority(level: int):
+    """Run the enclosed symbolication at the given priority (INTERACTIVE or BATCH)"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class ResolutionAbandoned(Exception):
+    """Set on in-flight keys whose owner was cancelled; waiters compute those keys themselves"""
+
+
+class ToolSlots:
+    """Cap on concurrently running external tool calls (addr2line queries, ndk-stack runs)
+
+    A freed slot goes to a waiting interactive caller first; batch callers
+    only take a slot while no interactive caller is waiting.
+    """
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = max(1, limit or os.cpu_count() or 1)
+        self.running = 0
+        self.waits = 0  # 因没有空闲槽位而等待的次数
+        self._waiting = [0, 0]  # 按优先级统计的等待数
+        self._cond = threading.Condition()
+
+    def _available(self, level: int) -> bool:
+        if self.running >= self.limit:
+            return False
+        return level == INTERACTIVE or not self._waiting[INTERACTIVE]
+
+    def acquire(self, level: Optional[int] = None):
+        level = current_priority() if level is None else level
+        with self._cond:
+            self._waiting[level] += 1
+            try:
+                if not self._available(level):
+                    self.waits += 1
+                    self._cond.wait_for(lambda: self._available(level))
+            finally:
+                self._waiting[level] -= 1
+            self.running += 1
+
+    def release(self):
+        with self._cond:
+            self.running -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, level: Optional[int] = None):
+        """Hold one slot, waiting at the current priority unless level is given"""
+        self.acquire(level)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class SymbolScheduler:
+    """Shared front of symbolication: in-flight deduplication plus the tool process cap
+
+    Concurrent callers asking for the same key (e.g. (Build ID, address))
+    are merged: the first one computes it and the others wait for its
+    result instead of running addr2line again before the cache is filled.
+    """
+
+    def __init__(self, max_tool_processes: Optional[int] = None):
+        self.slots = ToolSlots(max_tool_processes)
+        self._inflight: Dict[Hashable, Future] = {}
+        self.shared = 0  # 等待其他调用方结果而未重复计算的键数
+        self._lock = threading.Lock()
+
+    def claim(self, keys: List[Hashable]) -> Tuple[List[Hashable], Dict[Hashable, Future]]:
+        """Split keys into those this caller must compute and futures of those already in flight
+
+        Every claimed key must later be passed to complete() or fail().
+        """
+        owned = []
+        waiting: Dict[Hashable, Future] = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                future = self._inflight.get(key)
+                if future is None:
+                    self._inflight[key] = Future()
+                    owned.append(key)
+                else:
+                    waiting[key] = future
+            self.shared += len(waiting)
+        return owned, waiting
+
+    def complete(self, results: Dict[Hashable, object]):
+        with self._lock:
+            futures = [(self._inflight.pop(key), value) for key, value in results.items()]
+        for future, value in futures:
+            future.set_result(value)
+
+    def fail(self, keys: List[Hashable], error: BaseException):
+        if not isinstance(error, Exception):
+            # 取消、中断等不应传给其他调用方
+            error = ResolutionAbandoned(repr(error))
+        with self._lock:
+            futures = [self._inflight.pop(key) for key in keys]
+        for future in futures:
+            future.set_exception(error)
+
+    def resolve(self, keys: List[Hashable], compute: Callable[[List[Hashable]], List[object]]) -> Dict[Hashable, object]:
+        """Values of keys, computing with compute(keys) only those no other caller is computing"""
+        owned, waiting = self.claim(keys)
+        results = {}
+        if owned:
+            try:
+                values = compute(owned)
+            except BaseException as e:
+                self.fail(owned, e)
+                raise
+            results = dict(zip(owned, values))
+            self.complete(results)
+        retry = []
+        for key, future in waiting.items():
+            try:
+                results[key] = future.result()
+            except ResolutionAbandoned:
+                retry.append(key)
+        if retry:
+            results.update(self.resolve(retry, compute))
+        return results
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            in_flight = len(self._inflight)
+        return {
+            'in_flight': in_flight,
+            'shared': self.shared,
+            'tools_running': self.slots.running,
+            'tool_limit': self.slots.limit,
+            'tool_waits': self.slots.waits,
+        }
+
+
+_default: Optional[SymbolScheduler] = None
+_default_lock = threading.Lock()
+
+
+def get_scheduler() -> SymbolScheduler:
+    """The scheduler shared by every parser of this process"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            limit = os.environ.get('NDK_TOOLKIT_MAX_TOOLS')
+            _default = SymbolScheduler(int(limit) if limit else None)
+        return _default
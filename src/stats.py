@@ -0,0 +1,165 @@
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, TextIO
+
+
+class _NullStage:
+    """Context manager that does nothing, shared by every disabled stage"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Stats:
+    """Per-stage wall time, counters and subprocess usage of a parser run
+
+    A disabled instance turns every call into an early return, so parsers
+    can be instrumented unconditionally. Stages may nest (``addr2line``
+    runs inside ``symbolicate``) and times of concurrent threads are
+    summed, so stage times may add up to more than the elapsed time.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.started = time.monotonic()
+        self.stages: Dict[str, list] = {}  # 阶段名 -> [调用次数, 累计秒数]
+        self.counters: Dict[str, int] = {}
+        self.subprocesses: Dict[str, Dict[str, float]] = {}
+        self._sources: Dict[str, Callable[[], dict]] = {}
+        self._lock = threading.Lock()
+
+    def add_time(self, stage: str, seconds: float, calls: int = 1):
+        """Record time spent in a stage"""
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                self.stages[stage] = [calls, seconds]
+            else:
+                entry[0] += calls
+                entry[1] += seconds
+
+    @contextmanager
+    def _timed(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def stage(self, name: str):
+        """Context manager timing one call of a stage"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._timed(name)
+
+    def incr(self, counter: str, value: int = 1):
+        """Add value to a counter"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def _tool(self, tool: str) -> Dict[str, float]:
+        entry = self.subprocesses.get(tool)
+        if entry is None:
+            entry = self.subprocesses[tool] = {'spawns': 0, 'failures': 0, 'calls': 0, 'seconds': 0.0}
+        return entry
+
+    def spawn(self, tool: str, failed: bool = False):
+        """Record that a tool process was started"""
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self._tool(tool)
+            entry['spawns'] += 1
+            if failed:
+                entry['failures'] += 1
+
+    def tool_time(self, tool: str, seconds: float):
+        """Record time spent waiting for a tool process"""
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self._tool(tool)
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+
+    def register(self, name: str, source: Callable[[], dict]):
+        """Include the dict returned by source under name, e.g. the counters of a cache"""
+        self._sources[name] = source
+
+    def merge(self, snapshot: dict):
+        """Add the stages, counters and subprocess usage of a to_dict snapshot, e.g. from a worker process"""
+        if not self.enabled:
+            return
+        with self._lock:
+            for name, entry in snapshot.get('stages', {}).items():
+                current = self.stages.setdefault(name, [0, 0.0])
+                current[0] += entry['calls']
+                current[1] += entry['seconds']
+            for name, value in snapshot.get('counters', {}).items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for tool, entry in snapshot.get('subprocesses', {}).items():
+                current = self._tool(tool)
+                for key, value in entry.items():
+                    current[key] += value
+
+    def to_dict(self) -> dict:
+        """Snapshot of everything recorded so far"""
+        with self._lock:
+            result = {
+                'enabled': self.enabled,
+                'elapsed': round(time.monotonic() - self.started, 6),
+                'stages': {name: {'calls': calls, 'seconds': round(seconds, 6)}
+                           for name, (calls, seconds) in self.stages.items()},
+                'counters': dict(self.counters),
+                'subprocesses': {tool: {k: round(v, 6) if isinstance(v, float) else v for k, v in entry.items()}
+                                 for tool, entry in self.subprocesses.items()},
+            }
+        if self.enabled:
+            for name, source in self._sources.items():
+                result[name] = source()
+        return result
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def format_text(self) -> str:
+        """Human readable report"""
+        data = self.to_dict()
+        lines = [f"Elapsed: {data['elapsed']:.3f}s"]
+        if data['stages']:
+            lines.append('Stages:')
+            for name, entry in sorted(data['stages'].items(), key=lambda item: -item[1]['seconds']):
+                lines.append(f"  {name:16} {entry['seconds']:10.3f}s {entry['calls']:10d} calls")
+        if data['subprocesses']:
+            lines.append('Subprocesses:')
+            for tool, entry in data['subprocesses'].items():
+                lines.append(f"  {tool:16} {entry['spawns']:6d} spawned {entry['failures']:4d} failed "
+                             f"{entry['seconds']:10.3f}s in {entry['calls']} calls")
+        if data['counters']:
+            lines.append('Counters:')
+            for name, value in sorted(data['counters'].items()):
+                lines.append(f"  {name:24} {value}")
+        for name in self._sources:
+            if name in data:
+                lines.append(f"{name}: " + ', '.join(
+                    f"{k}={v:.1%}" if k.endswith('rate') else f"{k}={v}" for k, v in data[name].items()))
+        return '\n'.join(lines)
+
+
+def print_stats(stats: Stats, fmt: str = 'text', stream: Optional[TextIO] = None):
+    """Write a report for the --stats option, as 'text' or 'json' (stderr by default)"""
+    stream = stream or sys.stderr
+    stream.write((stats.to_json() if fmt == 'json' else stats.format_text()) + '\n')
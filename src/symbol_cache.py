@@ -0,0 +1,253 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .elf_symbols import read_build_id, ElfError
+from .utils import default_cache_dir
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters of a SymbolCache"""
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+
+    def to_dict(self) -> dict:
+        result = asdict(self)
+        result['hit_rate'] = self.hit_rate
+        return result
+
+
+class SymbolCache:
+    """Two-level symbolication cache: an in-memory LRU in front of an SQLite store
+
+    Entries are keyed by (file key, address), where the file key is the
+    library's GNU build ID, or a content hash when it has none, so results
+    stay valid across runs and across copies of the same library. The
+    SQLite file uses WAL mode and can be shared by several processes.
+    Reads never write: the access times of disk hits are collected in
+    memory and stored with the next write, before eviction, or on close.
+    """
+
+    DB_NAME = 'symbols.db'
+    # 每写入多少条检查一次数据库大小
+    _EVICT_CHECK_INTERVAL = 1000
+    # 内存中最多记录多少条待写回的访问时间，超过后不再记录（只影响淘汰顺序）
+    _MAX_PENDING_ACCESS = 100000
+
+    def __init__(self, cache_dir: Optional[str] = None, memory_entries: int = 100000,
+                 max_disk_bytes: int = 256 * 1024 * 1024, persistent: bool = True):
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.stats = CacheStats()
+        self._memory: 'OrderedDict[Tuple[str, str], str]' = OrderedDict()
+        self._file_keys: Dict[Tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+        self._writes_since_check = 0
+        self._accessed: Dict[Tuple[str, str], int] = {}  # 磁盘命中的最近访问时间，尚未写回
+        self._db: Optional[sqlite3.Connection] = None
+        self.db_path = None
+        if persistent:
+            self.db_path = os.path.join(cache_dir or default_cache_dir(), self.DB_NAME)
+            try:
+                self._db = self._open_db(self.db_path)
+            except (OSError, sqlite3.Error) as e:
+                logging.warning(f"Persistent symbol cache disabled, cannot open {self.db_path}: {e}")
+                self._db = None
+
+    @staticmethod
+    def _open_db(db_path: str) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        db = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        # auto_vacuum 只对新建的数据库生效，必须在建表之前设置
+        db.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS symbols ('
+            ' file_key TEXT NOT NULL,'
+            ' addr TEXT NOT NULL,'
+            ' result TEXT NOT NULL,'
+            ' last_access INTEGER NOT NULL,'
+            ' PRIMARY KEY (file_key, addr)) WITHOUT ROWID'
+        )
+        db.execute('CREATE INDEX IF NOT EXISTS symbols_last_access ON symbols (last_access)')
+        return db
+
+    def _write(self, *statements: Tuple[str, List[tuple]]):
+        """Run (sql, rows) write statements, each for many rows, in one transaction"""
+        self._db.execute('BEGIN IMMEDIATE')
+        try:
+            for sql, rows in statements:
+                if rows:
+                    self._db.executemany(sql, rows)
+        except sqlite3.Error:
+            self._db.execute('ROLLBACK')
+            raise
+        self._db.execute('COMMIT')
+
+    def _access_rows(self) -> List[tuple]:
+        return [(when, file_key, addr) for (file_key, addr), when in self._accessed.items()]
+
+    # 访问时间只会向后推进，不覆盖之后写入的较新时间
+    _TOUCH_SQL = 'UPDATE symbols SET last_access = MAX(last_access, ?) WHERE file_key = ? AND addr = ?'
+
+    def _flush_access_locked(self):
+        """Store the collected access times; best effort, they only order evictions"""
+        if not self._accessed or self._db is None:
+            return
+        try:
+            self._write((self._TOUCH_SQL, self._access_rows()))
+            self._accessed.clear()
+        except sqlite3.Error as e:
+            logging.debug(f"Symbol cache access time update failed: {e}")
+
+    def file_key(self, lib_path: str) -> str:
+        """Get the cache key of a library: its build ID, or a hash of its contents"""
+        st = os.stat(lib_path)
+        stat_key = (os.path.abspath(lib_path), st.st_size, st.st_mtime_ns)
+        key = self._file_keys.get(stat_key)
+        if key is None:
+            try:
+                build_id = read_build_id(lib_path)
+            except (OSError, ElfError):
+                build_id = None
+            if build_id:
+                key = build_id
+            else:
+                digest = hashlib.sha1()
+                with open(lib_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(chunk)
+                key = 'sha1:' + digest.hexdigest()
+            self._file_keys[stat_key] = key
+        return key
+
+    def _remember(self, key: Tuple[str, str], result: str):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, file_key: str, addrs: Iterable[str]) -> Dict[str, str]:
+        """Look up addresses of one library, returning the ones found"""
+        found: Dict[str, str] = {}
+        pending: List[str] = []
+        with self._lock:
+            for addr in addrs:
+                key = (file_key, addr)
+                result = self._memory.get(key)
+                if result is not None:
+                    self._memory.move_to_end(key)
+                    self.stats.memory_hits += 1
+                    found[addr] = result
+                else:
+                    pending.append(addr)
+            if pending and self._db is not None:
+                rows = []
+                try:
+                    # 分批查询，避免超过 SQLite 的参数个数上限
+                    for i in range(0, len(pending), 500):
+                        chunk = pending[i:i + 500]
+                        rows += self._db.execute(
+                            f'SELECT addr, result FROM symbols WHERE file_key = ? AND addr IN ({",".join("?" * len(chunk))})',
+                            [file_key, *chunk]
+                        ).fetchall()
+                except sqlite3.Error as e:
+                    # 已经读到的结果仍然有效
+                    logging.debug(f"Symbol cache read failed: {e}")
+                now = int(time.time())
+                for addr, result in rows:
+                    self._remember((file_key, addr), result)
+                    found[addr] = result
+                    # 读路径不写数据库，访问时间随下一次写入一并保存
+                    if len(self._accessed) < self._MAX_PENDING_ACCESS or (file_key, addr) in self._accessed:
+                        self._accessed[(file_key, addr)] = now
+                self.stats.disk_hits += len(rows)
+            self.stats.misses += len(pending) - sum(1 for addr in pending if addr in found)
+        return found
+
+    def get(self, file_key: str, addr: str) -> Optional[str]:
+        """Look up a single address"""
+        return self.get_many(file_key, [addr]).get(addr)
+
+    def put_many(self, file_key: str, results: Dict[str, str]):
+        """Store symbolication results of one library"""
+        if not results:
+            return
+        with self._lock:
+            for addr, result in results.items():
+                self._remember((file_key, addr), result)
+            self.stats.writes += len(results)
+            if self._db is None:
+                return
+            now = int(time.time())
+            try:
+                self._write(
+                    ('INSERT OR REPLACE INTO symbols (file_key, addr, result, last_access) VALUES (?, ?, ?, ?)',
+                     [(file_key, addr, result, now) for addr, result in results.items()]),
+                    (self._TOUCH_SQL, self._access_rows())
+                )
+            except sqlite3.Error as e:
+                logging.debug(f"Symbol cache write failed: {e}")
+                return
+            self._accessed.clear()
+            self._writes_since_check += len(results)
+            if self._writes_since_check >= self._EVICT_CHECK_INTERVAL:
+                self._writes_since_check = 0
+                self._evict_locked()
+
+    def put(self, file_key: str, addr: str, result: str):
+        """Store a single result"""
+        self.put_many(file_key, {addr: result})
+
+    def disk_size(self) -> int:
+        """Bytes used by live entries of the on-disk store"""
+        if self._db is None:
+            return 0
+        page_count, = self._db.execute('PRAGMA page_count').fetchone()
+        free_count, = self._db.execute('PRAGMA freelist_count').fetchone()
+        page_size, = self._db.execute('PRAGMA page_size').fetchone()
+        return (page_count - free_count) * page_size
+
+    def _evict_locked(self):
+        """Drop the least recently used tenth of the store while it is over its size limit"""
+        self._flush_access_locked()
+        try:
+            while self.disk_size() > self.max_disk_bytes:
+                total, = self._db.execute('SELECT COUNT(*) FROM symbols').fetchone()
+                if not total:
+                    break
+                count = max(1, total // 10)
+                self._db.execute(
+                    'DELETE FROM symbols WHERE (file_key, addr) IN '
+                    '(SELECT file_key, addr FROM symbols ORDER BY last_access LIMIT ?)',
+                    (count,)
+                )
+                self.stats.evictions += count
+            # 归还空闲页，使文件大小真正缩小
+            self._db.execute('PRAGMA incremental_vacuum')
+        except sqlite3.Error as e:
+            logging.debug(f"Symbol cache eviction failed: {e}")
+
+    def close(self):
+        """Close the on-disk store"""
+        with self._lock:
+            if self._db is not None:
+                self._flush_access_locked()
+                self._db.close()
+                self._db = None
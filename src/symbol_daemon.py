@@ -0,0 +1,367 @@
+import io
+import os
+import sys
+import json
+import hmac
+import time
+import socket
+import logging
+import secrets
+import argparse
+import threading
+import socketserver
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 避免循环导入
+if __name__ == '__main__':
+    # 当作为主程序运行时，添加父目录到 Python 路径
+    parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+
+from src.ndk_logcat_parser import LogcatParser, CrashInfo
+from src.daemon_client import DaemonClient, MAX_MESSAGE_BYTES, default_address, parse_address, token_path
+from src.stats import Stats
+from src.scheduler import PRIORITIES, SymbolScheduler, get_scheduler, priority
+
+# 影响符号化结果的参数；每种组合对应一个常驻的 LogcatParser
+_CONFIG_KEYS = ('symbols_dir', 'ndk_path', 'verify_build_id', 'line_info', 'sidecar_dir')
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Answer JSON requests, one per line, until the client disconnects"""
+
+    def handle(self):
+        daemon: 'SymbolDaemon' = self.server.symbol_daemon
+        while True:
+            line = self.rfile.readline(MAX_MESSAGE_BYTES + 1)
+            if not line:
+                break
+            if len(line) > MAX_MESSAGE_BYTES:
+                response = {'ok': False, 'error': f'Request larger than {MAX_MESSAGE_BYTES} bytes'}
+            elif not line.strip():
+                continue
+            else:
+                response = daemon.handle_request(line)
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+            self.wfile.flush()
+            if len(line) > MAX_MESSAGE_BYTES:
+                break
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SymbolDaemon:
+    """Resident symbolication service on a Unix socket or a localhost TCP port
+
+    Keeps one LogcatParser per symbolication config, so the symbol index,
+    caches, ELF tables and addr2line workers stay warm between requests
+    from ndk_parse_logcat.sh and other clients (see daemon_client). Files
+    are read by the daemon itself, so it only serves clients on the same
+    host: a Unix socket is accessible to its owner only, and on TCP every
+    request must carry the session token written to token_path(address),
+    a file only the daemon's user can read. With idle_timeout set the
+    daemon exits after that many seconds without requests. Lookups re-stat
+    the library they resolve, so overwritten libraries are picked up by the
+    next request; a background thread additionally rescans the symbols
+    directories every index_refresh_interval seconds (0: never) to find
+    builds added in new directories.
+    """
+
+    def __init__(self, address: Optional[str] = None, cache_dir: Optional[str] = None,
+                 persistent_cache: bool = True, addr2line_workers: int = 1,
+                 idle_timeout: Optional[float] = None, verbose: bool = False,
+                 sidecar_dir: Optional[str] = None, max_tool_processes: Optional[int] = None,
+                 index_refresh_interval: float = 60.0):
+        self.address = address or default_address()
+        self.cache_dir = cache_dir
+        self.sidecar_dir = sidecar_dir  # 请求未指定 sidecar_dir 时使用
+        # 所有解析器共用：合并并发的相同地址请求，交互请求优先获得外部工具槽位
+        self.scheduler = SymbolScheduler(max_tool_processes) if max_tool_processes else get_scheduler()
+        self.persistent_cache = persistent_cache
+        self.addr2line_workers = addr2line_workers
+        self.idle_timeout = idle_timeout
+        self.index_refresh_interval = index_refresh_interval
+        self.verbose = verbose
+        self.started = time.monotonic()
+        self._parsers: Dict[Tuple, LogcatParser] = {}
+        self._parsers_lock = threading.Lock()  # 创建解析器期间持有
+        self._lock = threading.Lock()
+        self._server: Optional[socketserver.BaseServer] = None
+        self._token: Optional[str] = None  # TCP 监听时每个请求都必须带上的会话令牌
+        self._token_file: Optional[str] = None
+        self._closed = threading.Event()
+        self._active = 0
+        self._last_request = time.monotonic()
+        self._ops: Dict[str, Callable[[dict], dict]] = {
+            'ping': self._ping,
+            'parse_file': self._parse_file,
+            'parse_content': self._parse_content,
+            'symbolicate': self._symbolicate,
+            'stats': self._stats,
+            'shutdown': self._shutdown,
+        }
+
+    def _parser(self, config: Optional[dict]) -> LogcatParser:
+        """Get the warm parser for a config, creating it on first use"""
+        config = config or {}
+        key = tuple(config.get(k) for k in _CONFIG_KEYS)
+        with self._parsers_lock:
+            parser = self._parsers.get(key)
+            if parser is None:
+                symbols_dir, ndk_path, verify_build_id, line_info, sidecar_dir = key
+                logging.info(f"Creating parser for symbols={symbols_dir} ndk={ndk_path}")
+                parser = LogcatParser(
+                    symbols_dir=symbols_dir,
+                    ndk_path=ndk_path or os.environ.get('ANDROID_NDK_HOME'),
+                    verbose=self.verbose,
+                    verify_build_id=bool(verify_build_id),
+                    addr2line_workers=self.addr2line_workers,
+                    line_info=line_info is not False,
+                    sidecar_dir=sidecar_dir or self.sidecar_dir,
+                    cache_dir=self.cache_dir,
+                    persistent_cache=self.persistent_cache,
+                    stats=Stats(),
+                    scheduler=self.scheduler
+                )
+                self._parsers[key] = parser
+        return parser
+
+    def _refresh_indexes(self):
+        """Rescan the symbols directory of every parser every index_refresh_interval seconds"""
+        # 在后台线程中扫描，请求不会因为遍历大目录而等待
+        while not self._closed.wait(self.index_refresh_interval):
+            with self._parsers_lock:
+                indexes = [parser.symbol_index for parser in self._parsers.values() if parser.symbol_index]
+            for index in indexes:
+                try:
+                    # 只检查文件的大小和 mtime，新增或被覆盖的库才重新读取 Build ID
+                    index.refresh()
+                except Exception:
+                    logging.exception(f"Failed to rescan {index.symbols_dir}")
+
+    def handle_request(self, line: bytes) -> dict:
+        """Run one JSON request, returning the response object"""
+        with self._lock:
+            self._active += 1
+        try:
+            request = json.loads(line)
+            if self._token is not None and not self._authorized(request):
+                return {'ok': False, 'error': 'Missing or invalid session token'}
+            op = self._ops.get(request.get('op')) if isinstance(request, dict) else None
+            if op is None:
+                return {'ok': False, 'error': f"Unknown request: {str(request)[:200]}"}
+            level = PRIORITIES.get(request.get('priority') or 'interactive')
+            if level is None:
+                return {'ok': False, 'error': f"Unknown priority: {request.get('priority')}"}
+            with priority(level):
+                return {'ok': True, **op(request)}
+        except Exception as e:  # 单个请求失败不能让守护进程退出
+            logging.exception("Request failed")
+            return {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._last_request = time.monotonic()
+
+    def _authorized(self, request) -> bool:
+        token = request.get('token') if isinstance(request, dict) else None
+        return isinstance(token, str) and hmac.compare_digest(token.encode(), self._token.encode())
+
+    def _ping(self, request: dict) -> dict:
+        return {'pid': os.getpid(), 'uptime': round(time.monotonic() - self.started, 3), 'parsers': len(self._parsers)}
+
+    @staticmethod
+    def _write_output(parser: LogcatParser, output_dir: str, logcat_file: str, crashes: List[CrashInfo]):
+        """Write crashes to <output_dir>/<name>.parsed.txt like LogcatParser does"""
+        os.makedirs(output_dir, exist_ok=True)
+        output_file = os.path.join(output_dir, os.path.basename(logcat_file) + ".parsed.txt")
+        logging.info(f"Writing parsed output to file: {output_file}")
+        with open(output_file, 'w') as f:
+            for i, crash_info in enumerate(crashes):
+                if i:
+                    f.write('\n')
+                parser._write_crash(f, crash_info)
+
+    def _parse_file(self, request: dict) -> dict:
+        parser = self._parser(request.get('config'))
+        logcat_file = request['path']
+        if not os.path.isabs(logcat_file):
+            raise ValueError(f"Path must be absolute: {logcat_file}")
+        if not os.path.isfile(logcat_file):
+            raise FileNotFoundError(f"Logcat file not found: {logcat_file}")
+        if request.get('all'):
+            crashes = list(parser.iter_logcat_file(logcat_file))
+        else:
+            crash_info = parser._last_crash(parser._scan_file(logcat_file))
+            crashes = [crash_info] if crash_info else []
+        if request.get('output_dir') and crashes:
+            self._write_output(parser, request['output_dir'], logcat_file, crashes)
+        return {'crashes': [crash_info.to_dict() for crash_info in crashes]}
+
+    def _parse_content(self, request: dict) -> dict:
+        parser = self._parser(request.get('config'))
+        content = request['content']
+        if request.get('all'):
+            crashes = list(parser.iter_crashes(io.StringIO(content)))
+        else:
+            crash_info = parser.parse_logcat_content(content)
+            crashes = [crash_info] if crash_info else []
+        return {'crashes': [crash_info.to_dict() for crash_info in crashes]}
+
+    def _symbolicate(self, request: dict) -> dict:
+        return {'frames': self._parser(request.get('config')).symbolicate_frames(request['frames'])}
+
+    def _stats(self, request: dict) -> dict:
+        with self._parsers_lock:
+            parsers = list(self._parsers.items())
+        return {'parsers': [{'config': dict(zip(_CONFIG_KEYS, key)), 'stats': parser.stats.to_dict()}
+                            for key, parser in parsers]}
+
+    def _shutdown(self, request: dict) -> dict:
+        logging.info("Shutdown requested")
+        # shutdown() 会等待 serve_forever 退出，不能在处理请求的线程中直接调用
+        threading.Thread(target=self._server.shutdown, daemon=True).start()
+        return {}
+
+    def _make_server(self) -> socketserver.BaseServer:
+        family, address = parse_address(self.address)
+        if family == socket.AF_INET:
+            if address[0] not in ('127.0.0.1', 'localhost', '::1'):
+                # 守护进程会读取客户端指定的任意文件，只应对本机开放
+                logging.warning(f"Listening on non-loopback address {address[0]}")
+            server = _TCPServer(address, _RequestHandler)
+            # 本机的任何用户都能连接 TCP 端口，只有能读取令牌文件的用户（启动守护进程的用户）才能发出请求
+            self._token = secrets.token_hex(32)
+            self._token_file = token_path(self.address)
+            try:
+                self._write_token()
+            except OSError:
+                server.server_close()
+                raise
+            return server
+
+        os.makedirs(os.path.dirname(address) or '.', exist_ok=True)
+        if os.path.exists(address):
+            try:
+                DaemonClient(self.address, timeout=5).ping()
+                raise RuntimeError(f"A daemon is already listening on {address}")
+            except OSError:
+                os.remove(address)  # 上次未正常退出留下的套接字文件
+        old_umask = os.umask(0o177)  # 只允许当前用户连接
+        try:
+            return _UnixServer(address, _RequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def _write_token(self):
+        os.makedirs(os.path.dirname(self._token_file), exist_ok=True)
+        if os.path.exists(self._token_file):
+            os.remove(self._token_file)  # O_CREAT 不会修改已有文件的权限
+        fd = os.open(self._token_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(self._token)
+
+    def _watch_idle(self):
+        while True:
+            time.sleep(min(self.idle_timeout, 5.0))
+            with self._lock:
+                idle = not self._active and time.monotonic() - self._last_request >= self.idle_timeout
+            if idle:
+                logging.info(f"No requests for {self.idle_timeout}s, shutting down")
+                self._server.shutdown()
+                return
+
+    def serve_forever(self):
+        """Listen until a shutdown request, idle timeout or KeyboardInterrupt"""
+        self._server = self._make_server()
+        self._server.symbol_daemon = self
+        logging.info(f"Symbolication daemon listening on {self.address} (pid {os.getpid()})")
+        if self.idle_timeout:
+            threading.Thread(target=self._watch_idle, name='daemon-idle-watch', daemon=True).start()
+        if self.index_refresh_interval:
+            threading.Thread(target=self._refresh_indexes, name='daemon-index-refresh', daemon=True).start()
+        try:
+            self._server.serve_forever(poll_interval=0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        self._closed.set()
+        if self._token_file is not None:
+            try:
+                os.remove(self._token_file)
+            except OSError:
+                pass
+            self._token_file = None
+        if self._server is not None:
+            self._server.server_close()
+            family, address = parse_address(self.address)
+            if family != socket.AF_INET and os.path.exists(address):
+                os.remove(address)
+            self._server = None
+        with self._parsers_lock:
+            parsers, self._parsers = list(self._parsers.values()), {}
+        for parser in parsers:
+            parser.close()
+
+
+def main():
+    """Run the daemon, or query/stop a running one"""
+    parser = argparse.ArgumentParser(description='Resident symbolication daemon for ndk_parse_logcat and other clients.')
+    parser.add_argument('command', nargs='?', default='serve', choices=['serve', 'status', 'stop'],
+                        help='serve (default), status of a running daemon, or stop it')
+    parser.add_argument('--address', help='Unix socket path or host:port (default: $NDK_SYMBOL_DAEMON or '
+                                          '<cache dir>/symbold.sock; 127.0.0.1:47820 on Windows)')
+    parser.add_argument('--cache-dir', help='Directory of the persistent symbolication cache', metavar='DIR')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the persistent symbolication cache')
+    parser.add_argument('--addr2line-workers', type=int, default=1,
+                        help='Resident addr2line processes per symbol file (default: 1)', metavar='N')
+    parser.add_argument('--sidecar-dir', help='Default directory of sidecar files compiled by src.symbol_sidecar',
+                        metavar='DIR')
+    parser.add_argument('--max-tools', type=int,
+                        help='Maximum concurrently running addr2line / ndk-stack calls (default: CPU count)',
+                        metavar='N')
+    parser.add_argument('--idle-timeout', type=float, help='Exit after this many seconds without requests', metavar='SEC')
+    parser.add_argument('--refresh-interval', type=float, default=60.0,
+                        help='Rescan the symbols directories in the background every SEC seconds to find '
+                             'builds added in new directories, 0 to disable (default: 60)', metavar='SEC')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose logging')
+    args = parser.parse_args()
+
+    if args.command != 'serve':
+        try:
+            with DaemonClient(args.address, timeout=10) as client:
+                if args.command == 'stop':
+                    client.shutdown()
+                    print('Daemon stopped')
+                else:
+                    status = client.ping()
+                    status.pop('ok')
+                    status['parsers'] = client.stats()
+                    print(json.dumps(status, indent=2))
+        except OSError as e:
+            print(f'Daemon not running at {args.address or default_address()}: {e}')
+            sys.exit(1)
+        return
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format='[%(levelname)s] %(message)s')
+    daemon = SymbolDaemon(args.address, cache_dir=args.cache_dir, persistent_cache=not args.no_cache,
+                          addr2line_workers=args.addr2line_workers, idle_timeout=args.idle_timeout,
+                          verbose=args.verbose, sidecar_dir=args.sidecar_dir, max_tool_processes=args.max_tools,
+                          index_refresh_interval=args.refresh_interval)
+    daemon.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+import os
+import json
+import stat
+import hashlib
+import logging
+import argparse
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple
+
+from .elf_symbols import read_build_id, ElfError
+from .utils import default_cache_dir
+
+
+@dataclass
+class IndexedLibrary:
+    """One symbol file found in the symbols directory"""
+    path: str  # 相对于 symbols_dir 的路径
+    lib_name: str
+    abi: Optional[str]
+    build_id: Optional[str]
+    size: int
+    mtime_ns: int
+
+
+class SymbolIndex:
+    """Index over a symbols directory mapping (library, ABI, Build ID) to a path
+
+    Build IDs are read from the ELF notes once and persisted in the cache
+    directory; an entry is re-read only when its file's size or mtime
+    changes. lookup() re-stats the file it returns and, on a miss, the
+    directories the library may live in, so files replaced, added or
+    deleted after the index was built are noticed without a full rescan.
+    The directory may hold any number of builds side by side,
+    e.g. ``<symbols_dir>/<version>/arm64-v8a/libfoo.so``.
+    """
+
+    ABIS = ('arm64-v8a', 'armeabi-v7a', 'x86_64', 'x86')
+    # 不校验 Build ID 时沿用原来的查找顺序
+    DEFAULT_ABIS = ('arm64-v8a', 'armeabi-v7a')
+    VERSION = 1
+
+    def __init__(self, symbols_dir: str, cache_dir: Optional[str] = None, persistent: bool = True):
+        self.symbols_dir = os.path.abspath(symbols_dir)
+        self.index_path = None
+        if persistent:
+            digest = hashlib.sha1(self.symbols_dir.encode()).hexdigest()[:16]
+            self.index_path = os.path.join(cache_dir or default_cache_dir(), f'index-{digest}.json')
+        self._entries: Dict[str, IndexedLibrary] = {}
+        self._by_build_id: Dict[Tuple[str, str], str] = {}
+        self._by_name: Dict[str, List[IndexedLibrary]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _load_persisted(self) -> Dict[str, IndexedLibrary]:
+        if not self.index_path or not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') != self.VERSION or data.get('symbols_dir') != self.symbols_dir:
+                return {}
+            return {e['path']: IndexedLibrary(**e) for e in data['entries']}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.debug(f"Ignoring unreadable symbol index {self.index_path}: {e}")
+            return {}
+
+    def _save(self):
+        if not self.index_path:
+            return
+        data = {
+            'version': self.VERSION,
+            'symbols_dir': self.symbols_dir,
+            'entries': [asdict(e) for e in self._entries.values()],
+        }
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            # 先写临时文件再替换，避免并发进程读到写了一半的索引
+            tmp_path = f'{self.index_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logging.debug(f"Failed to save symbol index {self.index_path}: {e}")
+
+    def _abi_of(self, rel_path: str) -> Optional[str]:
+        for part in reversed(rel_path.split(os.sep)[:-1]):
+            if part in self.ABIS:
+                return part
+        return None
+
+    def _walk(self):
+        """Yield the .so files under symbols_dir, following directory symlinks but not loops"""
+        try:
+            st = os.stat(self.symbols_dir)
+        except OSError:
+            return
+        # 每个目录带上其所有上级目录的 (st_dev, st_ino)，指回上级目录的符号链接不再进入
+        stack = [(self.symbols_dir, frozenset([(st.st_dev, st.st_ino)]))]
+        while stack:
+            path, ancestors = stack.pop()
+            try:
+                it = os.scandir(path)
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=True):
+                            st = os.stat(entry.path)
+                            key = (st.st_dev, st.st_ino)
+                            if key in ancestors:
+                                logging.debug(f"Skipping symlink loop at {entry.path}")
+                                continue
+                            stack.append((entry.path, ancestors | {key}))
+                        elif entry.name.endswith('.so') and entry.is_file():
+                            yield entry
+                    except OSError as e:
+                        logging.debug(f"Skipping {entry.path}: {e}")
+
+    def refresh(self):
+        """Scan the symbols directory, reading build IDs only of new or changed files"""
+        with self._lock:
+            previous = self._entries or self._load_persisted()
+            entries: Dict[str, IndexedLibrary] = {}
+            changed = len(previous)
+            for dir_entry in self._walk():
+                try:
+                    st = dir_entry.stat()
+                except OSError as e:  # 扫描期间被删除等
+                    logging.debug(f"Skipping {dir_entry.path}: {e}")
+                    continue
+                rel_path = os.path.relpath(dir_entry.path, self.symbols_dir)
+                old = previous.get(rel_path)
+                if old and old.size == st.st_size and old.mtime_ns == st.st_mtime_ns:
+                    entries[rel_path] = old
+                    changed -= 1
+                    continue
+                try:
+                    build_id = read_build_id(dir_entry.path)
+                except (OSError, ElfError) as e:
+                    logging.debug(f"Cannot read build ID of {dir_entry.path}: {e}")
+                    build_id = None
+                entries[rel_path] = IndexedLibrary(
+                    path=rel_path,
+                    lib_name=dir_entry.name,
+                    abi=self._abi_of(rel_path),
+                    build_id=build_id,
+                    size=st.st_size,
+                    mtime_ns=st.st_mtime_ns,
+                )
+                changed += 1
+            self._entries = entries
+            self._by_build_id = {}
+            self._by_name = {}
+            for entry in entries.values():
+                if entry.build_id:
+                    self._by_build_id.setdefault((entry.lib_name, entry.build_id), entry.path)
+                self._by_name.setdefault(entry.lib_name, []).append(entry)
+            self._loaded = True
+            logging.debug(f"Indexed {len(entries)} symbol files in {self.symbols_dir}")
+            if changed:
+                self._save()
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            # 并发的首次查找只建立一次索引，其余线程等待其完成
+            with self._load_lock:
+                if not self._loaded:
+                    self.refresh()
+
+    def _abs(self, rel_path: str) -> str:
+        return os.path.join(self.symbols_dir, rel_path)
+
+    def find_by_build_id(self, lib_name: str, build_id: str) -> Optional[str]:
+        """Path of the library with exactly this build ID"""
+        self._ensure_loaded()
+        rel_path = self._by_build_id.get((lib_name, build_id.lower()))
+        if not rel_path:
+            return None
+        # 文件可能已被删除或覆盖，返回前核对大小和修改时间
+        entry = self._update_entry(rel_path)
+        return self._abs(entry.path) if entry and entry.build_id == build_id.lower() else None
+
+    def entries(self) -> List[IndexedLibrary]:
+        """Every indexed symbol file"""
+        self._ensure_loaded()
+        return list(self._entries.values())
+
+    def candidates(self, lib_name: str) -> List[IndexedLibrary]:
+        """All indexed copies of a library"""
+        self._ensure_loaded()
+        return self._by_name.get(lib_name, [])
+
+    def _update_entry(self, rel_path: str) -> Optional[IndexedLibrary]:
+        """Re-stat one symbol file and bring its entry up to date; None once the file is gone"""
+        self._ensure_loaded()
+        try:
+            st = os.stat(self._abs(rel_path))
+        except OSError:
+            st = None
+        old = self._entries.get(rel_path)
+        if st is not None and not stat.S_ISREG(st.st_mode):
+            st = None
+        if st is None and old is None:
+            return None
+        if old and st and old.size == st.st_size and old.mtime_ns == st.st_mtime_ns:
+            return old
+        with self._lock:
+            if st is None:
+                logging.debug(f"Symbol file {rel_path} was deleted, dropping it from the index")
+                entry = None
+                self._entries.pop(rel_path, None)
+                lib_name = old.lib_name
+            else:
+                try:
+                    build_id = read_build_id(self._abs(rel_path))
+                except (OSError, ElfError) as e:
+                    logging.debug(f"Cannot read build ID of {rel_path}: {e}")
+                    build_id = None
+                lib_name = os.path.basename(rel_path)
+                entry = IndexedLibrary(
+                    path=rel_path,
+                    lib_name=lib_name,
+                    abi=self._abi_of(rel_path),
+                    build_id=build_id,
+                    size=st.st_size,
+                    mtime_ns=st.st_mtime_ns,
+                )
+                logging.debug(f"Symbol file {rel_path} was added or changed, re-indexed it")
+                self._entries[rel_path] = entry
+            self._reindex_name(lib_name)
+            self._save()
+            return entry
+
+    def _reindex_name(self, lib_name: str):
+        """Rebuild the lookup tables of one library after its entries changed"""
+        copies = [e for e in self._entries.values() if e.lib_name == lib_name]
+        by_build_id = {k: v for k, v in self._by_build_id.items() if k[0] != lib_name}
+        for entry in copies:
+            if entry.build_id:
+                by_build_id.setdefault((lib_name, entry.build_id), entry.path)
+        # 整体替换而不是原地修改，不加锁的查找线程看到的总是一致的表
+        self._by_build_id = by_build_id
+        if copies:
+            self._by_name[lib_name] = copies
+        else:
+            self._by_name.pop(lib_name, None)
+
+    def _rescan_library(self, lib_name: str):
+        """Re-stat every place a library may live: its known copies and <symbols_dir>/<abi>/"""
+        dirs = {os.path.dirname(e.path) for e in self.candidates(lib_name)}
+        dirs.update(self.DEFAULT_ABIS)
+        for directory in sorted(dirs):
+            self._update_entry(os.path.join(directory, lib_name))
+
+    def _lookup_by_abi(self, lib_name: str, build_id: Optional[str],
+                       verify_build_id: bool) -> Optional[str]:
+        by_path = {e.path: e for e in self.candidates(lib_name)}
+        for abi in self.DEFAULT_ABIS:
+            entry = by_path.get(os.path.join(abi, lib_name))
+            if entry:
+                entry = self._update_entry(entry.path)
+            if not entry:
+                continue
+            if verify_build_id and build_id and entry.build_id and entry.build_id != build_id.lower():
+                logging.debug(f"Build ID mismatch for {entry.path}, skipping")
+                continue
+            return self._abs(entry.path)
+        return None
+
+    def lookup(self, lib_name: str, build_id: Optional[str] = None,
+               verify_build_id: bool = False) -> Optional[str]:
+        """Choose the symbol file for a library
+
+        An exact Build ID match is always preferred. Otherwise the library
+        is looked up directly under ``<symbols_dir>/<abi>/``; when
+        verify_build_id is set, a copy whose Build ID differs is skipped,
+        while a copy without a readable Build ID is still accepted. On a
+        miss the library's directories are re-stat'ed and the lookup retried.
+        """
+        rescanned = False
+        if build_id:
+            path = self.find_by_build_id(lib_name, build_id)
+            if path is None:
+                # 精确匹配未命中时先检查该库所在的目录，新拷入的文件不必等整体重建索引
+                self._rescan_library(lib_name)
+                rescanned = True
+                path = self.find_by_build_id(lib_name, build_id)
+            if path:
+                return path
+        path = self._lookup_by_abi(lib_name, build_id, verify_build_id)
+        if path is None and not rescanned:
+            self._rescan_library(lib_name)
+            path = self._lookup_by_abi(lib_name, build_id, verify_build_id)
+        return path
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._entries)
+
+
+def main():
+    """Build or refresh the persistent index of a symbols directory"""
+    parser = argparse.ArgumentParser(description='Index the symbol files of a symbols directory by Build ID.')
+    parser.add_argument('symbols_dir', help='Path to the directory containing symbol files')
+    parser.add_argument('--cache-dir', help='Directory to store the index in', metavar='DIR')
+    args = parser.parse_args()
+
+    index = SymbolIndex(args.symbols_dir, cache_dir=args.cache_dir)
+    index.refresh()
+    print(f'Indexed {len(index)} symbol files, index saved to {index.index_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+import os
+import mmap
+import struct
+import logging
+import argparse
+import threading
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .elf_symbols import ElfSymbolTable, ElfError
+from .dwarf_lines import DwarfError, read_line_table
+from .symbol_index import SymbolIndex
+from .utils import default_cache_dir, file_signature
+
+# 文件格式（小端）：头部，然后依次是
+#   函数起始地址 Q[functions]、函数大小 Q[functions]、行表地址 Q[lines]、
+#   函数名偏移 I[functions]、行表文件偏移 I[lines]、行号 I[lines]、字符串区（以 NUL 结尾的 UTF-8）
+_MAGIC = b'NDKSYM\0\0'
+_VERSION = 1
+_HEADER = struct.Struct('<8sIIIII4x')  # magic, version, flags, functions, lines, strings 大小
+_FLAG_LINES = 1  # 生成时读取了行表（可能为空），可以代替 addr2line 给出源码位置
+_NO_FILE = 0xffffffff  # 行表中指令序列结束的标记
+
+
+class SidecarError(Exception):
+    """Raised when a sidecar file is missing, truncated or of another version"""
+
+
+def _file_size(functions: int, lines: int, strings_size: int) -> int:
+    """Size of a complete sidecar file with the counts of its header"""
+    return _HEADER.size + 20 * functions + 16 * lines + strings_size
+
+
+def compile_library(elf_path: str, out_path: str, line_table: bool = True) -> Tuple[int, int]:
+    """Compile the function symbols (and DWARF line table) of an ELF file into a sidecar file
+
+    Returns the number of functions and line table rows written. The file
+    is written next to out_path and renamed into place, so concurrent
+    readers never see a partial file.
+    """
+    table = ElfSymbolTable(elf_path)
+    rows = None
+    if line_table:
+        try:
+            rows = read_line_table(elf_path) or []
+        except DwarfError as e:
+            # 行表无法解析时只保存函数，需要源码位置时仍由 addr2line 处理
+            logging.warning(f"Skipping line table of {elf_path}: {e}")
+
+    strings = bytearray()
+    offsets: Dict[str, int] = {}
+
+    def intern(text: str) -> int:
+        offset = offsets.get(text)
+        if offset is None:
+            offset = offsets[text] = len(strings)
+            strings.extend(text.encode())
+            strings.append(0)
+        return offset
+
+    names = array('I', (intern(table.name(i)) for i in range(len(table))))
+    line_addrs = array('Q', (row[0] for row in rows or ()))
+    line_files = array('I', (_NO_FILE if row[1] is None else intern(row[1]) for row in rows or ()))
+    line_numbers = array('I', (row[2] for row in rows or ()))
+    flags = _FLAG_LINES if rows is not None else 0
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp_path = f'{out_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, flags, len(table), len(line_addrs), len(strings)))
+        for values in (table.addrs, table.sizes, line_addrs, names, line_files, line_numbers):
+            f.write(values.tobytes())
+        f.write(strings)
+    os.replace(tmp_path, out_path)
+    return len(table), len(line_addrs)
+
+
+class SymbolSidecar:
+    """A compiled sidecar file, memory-mapped and searched in place
+
+    Address arrays are memoryview casts of the mapping, so opening a
+    sidecar reads nothing but its header, and lookups touch only the pages
+    they binary-search.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:  # 空文件
+                raise SidecarError(f"Cannot map {path}: {e}")
+        view = memoryview(self._map)
+        try:
+            if len(view) < _HEADER.size:
+                raise SidecarError(f"Truncated sidecar: {path}")
+            magic, version, flags, functions, lines, strings_size = _HEADER.unpack_from(view)
+            if magic != _MAGIC or version != _VERSION:
+                raise SidecarError(f"Not a version {_VERSION} sidecar: {path}")
+            if len(view) != _file_size(functions, lines, strings_size):
+                raise SidecarError(f"Truncated sidecar: {path}")
+        except SidecarError:
+            view.release()
+            self._map.close()
+            raise
+        self.has_lines = bool(flags & _FLAG_LINES)
+        self._views = [view]
+        pos = _HEADER.size
+
+        def take(fmt: str, count: int) -> memoryview:
+            nonlocal pos
+            size = struct.calcsize(fmt) * count
+            part = view[pos:pos + size].cast(fmt)
+            self._views.append(part)
+            pos += size
+            return part
+
+        self.addrs = take('Q', functions)
+        self.sizes = take('Q', functions)
+        self.line_addrs = take('Q', lines)
+        self._names = take('I', functions)
+        self._line_files = take('I', lines)
+        self._line_numbers = take('I', lines)
+        self._strings = pos
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._map.close()
+
+    def __len__(self) -> int:
+        return len(self.addrs)
+
+    def _string(self, offset: int) -> str:
+        start = self._strings + offset
+        return self._map[start:self._map.find(b'\0', start)].decode(errors='replace')
+
+    def find(self, addr: int) -> int:
+        """Index of the function containing addr, or -1 (same rules as ElfSymbolTable.find)"""
+        i = bisect_right(self.addrs, addr) - 1
+        if i < 0:
+            return -1
+        size = self.sizes[i]
+        if size and addr >= self.addrs[i] + size:
+            return -1
+        if not size and i == len(self.addrs) - 1:
+            return -1
+        return i
+
+    def lookup(self, addr: int) -> Optional[Tuple[str, int]]:
+        """Return (demangled function name, offset into function) for addr"""
+        i = self.find(addr)
+        if i < 0:
+            return None
+        return self._string(self._names[i]), addr - self.addrs[i]
+
+    def line(self, addr: int) -> Optional[Tuple[str, int]]:
+        """Return (source file, line) of addr from the line table"""
+        i = bisect_right(self.line_addrs, addr) - 1
+        if i < 0 or self._line_files[i] == _NO_FILE:
+            return None
+        return self._string(self._line_files[i]), self._line_numbers[i]
+
+    def symbolize(self, addr: int, line_info: bool = True) -> Optional[str]:
+        """Text like llvm-addr2line -f -C -p ('func at file:line'), or 'func+off'; None if unknown"""
+        found = self.lookup(addr)
+        if not line_info:
+            return f"{found[0]}+{found[1]}" if found else None
+        location = self.line(addr)
+        if not found and not location:
+            return None
+        return (f"{found[0] if found else '??'} at "
+                + (f"{location[0]}:{location[1]}" if location else '??:0'))
+
+
+class SidecarStore:
+    """Directory of sidecar files named by Build ID: <dir>/<2 hex digits>/<build id>.sym"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.path.join(default_cache_dir(), 'sidecars')
+        # Build ID -> (映射时文件的 (大小, mtime), 边车)；编译出新文件或重新编译后重新映射
+        self._open: Dict[str, Tuple[Optional[Tuple[int, int]], Optional[SymbolSidecar]]] = {}
+        self._lock = threading.Lock()
+
+    def path(self, build_id: str) -> str:
+        build_id = build_id.lower()
+        return os.path.join(self.directory, build_id[:2], f'{build_id}.sym')
+
+    def get(self, build_id: Optional[str]) -> Optional[SymbolSidecar]:
+        """The mapped sidecar of a Build ID, or None if it was not compiled"""
+        if not build_id:
+            return None
+        path = self.path(build_id)
+        signature = file_signature(path)
+        with self._lock:
+            cached = self._open.get(build_id)
+            if cached is None or cached[0] != signature:
+                # 旧的映射可能仍被其他线程使用，不主动关闭，由垃圾回收释放
+                sidecar = None
+                if signature is not None:
+                    try:
+                        sidecar = SymbolSidecar(path)
+                    except (OSError, SidecarError) as e:
+                        logging.warning(f"Ignoring sidecar {path}: {e}")
+                cached = self._open[build_id] = (signature, sidecar)
+            return cached[1]
+
+    def is_current(self, build_id: str, line_table: bool) -> bool:
+        """Whether a usable sidecar exists, with a line table if one is wanted"""
+        try:
+            with open(self.path(build_id), 'rb') as f:
+                header = f.read(_HEADER.size)
+                size = os.fstat(f.fileno()).st_size
+            magic, version, flags, functions, lines, strings_size = _HEADER.unpack(header)
+        except (OSError, struct.error):
+            return False
+        # 截断的文件（例如磁盘写满时）需要重新编译
+        return (magic == _MAGIC and version == _VERSION and size == _file_size(functions, lines, strings_size)
+                and bool(flags & _FLAG_LINES or not line_table))
+
+    def close(self):
+        with self._lock:
+            for _, sidecar in self._open.values():
+                if sidecar:
+                    sidecar.close()
+            self._open.clear()
+
+
+def _compile_one(task: Tuple[str, str, bool]) -> Tuple[str, Optional[str], int, int]:
+    elf_path, out_path, line_table = task
+    try:
+        functions, lines = compile_library(elf_path, out_path, line_table)
+        return elf_path, None, functions, lines
+    except (OSError, ElfError, DwarfError) as e:
+        return elf_path, str(e), 0, 0
+
+
+def compile_symbols(symbols_dir: str, store: SidecarStore, line_table: bool = True, workers: Optional[int] = None,
+                    cache_dir: Optional[str] = None, persistent: bool = True) -> Tuple[int, int, int]:
+    """Compile every library of a symbols directory that has no current sidecar yet
+
+    Sidecars are keyed by Build ID and never change, so only builds added
+    since the last run are compiled; libraries without a Build ID are
+    skipped. Returns (compiled, up to date, failed).
+    """
+    index = SymbolIndex(symbols_dir, cache_dir=cache_dir, persistent=persistent)
+    index.refresh()
+    tasks: List[Tuple[str, str, bool]] = []
+    seen = set()
+    skipped = 0
+    for entry in index.entries():
+        if not entry.build_id or entry.build_id in seen:
+            continue
+        seen.add(entry.build_id)
+        if store.is_current(entry.build_id, line_table):
+            skipped += 1
+            continue
+        tasks.append((os.path.join(index.symbols_dir, entry.path), store.path(entry.build_id), line_table))
+    logging.info(f"Compiling {len(tasks)} symbol files, {skipped} up to date")
+
+    compiled = failed = 0
+    if not tasks:
+        return compiled, skipped, failed
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(tasks))) as executor:
+        for elf_path, error, functions, lines in executor.map(_compile_one, tasks):
+            if error:
+                failed += 1
+                logging.warning(f"Failed to compile {elf_path}: {error}")
+            else:
+                compiled += 1
+                logging.debug(f"Compiled {elf_path}: {functions} functions, {lines} line rows")
+    return compiled, skipped, failed
+
+
+def main():
+    """Compile the symbol files of a symbols directory into sidecar files"""
+    parser = argparse.ArgumentParser(
+        description='Compile the symbol files of a symbols directory into compact sidecar files keyed by Build ID.')
+    parser.add_argument('symbols_dir', help='Path to the directory containing symbol files')
+    parser.add_argument('-o', '--output', help='Sidecar directory (default: <cache dir>/sidecars)', metavar='DIR')
+    parser.add_argument('--no-line-table', action='store_true',
+                        help='Only store function ranges; source locations still need addr2line')
+    parser.add_argument('-j', '--jobs', type=int, help='Number of compiler processes (default: CPU count)', metavar='N')
+    parser.add_argument('--cache-dir', help='Directory of the persistent symbol index', metavar='DIR')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose logging')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format='[%(levelname)s] %(message)s')
+
+    store = SidecarStore(args.output)
+    compiled, skipped, failed = compile_symbols(args.symbols_dir, store, line_table=not args.no_line_table,
+                                                workers=args.jobs, cache_dir=args.cache_dir)
+    print(f'Compiled {compiled} symbol files into {store.directory} ({skipped} up to date, {failed} failed)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+import os
+import sys
+import gzip
+import json
+import logging
+import argparse
+import itertools
+from array import array
+from collections import Counter
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy
+except ImportError:  # 可选依赖；没有时逐个地址二分查找，结果相同但慢得多
+    numpy = None
+
+# 避免循环导入
+if __name__ == '__main__':
+    # 当作为主程序运行时，添加父目录到 Python 路径
+    parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+
+from src.ndk_logcat_parser import LogcatParser, CrashInfo, Frame
+from src.crash_buckets import _VOLATILE_LIBS, _lib_name
+from src.elf_symbols import ElfSymbolTable
+from src.batch_analyze import collect_files
+from src.stats import Stats, print_stats
+
+
+@dataclass
+class FunctionHits:
+    """How often one function appears in the aggregated crash stacks"""
+    library: str
+    build_id: Optional[str]
+    function: Optional[str]  # None 表示地址不在任何已知函数中
+    hits: int = 0  # 栈帧数
+    crashes: int = 0  # 栈中包含该函数的崩溃数
+    top_frame: int = 0  # 作为 #00 出现的次数
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class _LibraryFrames:
+    """Packed pcs of one (library, Build ID), with the crash each frame belongs to"""
+    __slots__ = ('lib_path', 'pcs', 'crash_ids', 'top', 'symbols')
+
+    def __init__(self, lib_path: str):
+        self.lib_path = lib_path  # 栈帧中出现的路径之一，用于查找符号文件
+        self.pcs = array('Q')
+        self.crash_ids = array('I')
+        self.top = array('B')
+        self.symbols: Dict[int, str] = {}  # 栈帧自带的函数名，符号文件中找不到时使用
+
+
+class TopFunctions:
+    """Fleet-wide histogram of the functions in native crash stacks
+
+    Crashes are added as parsed CrashInfo frames or JSON Lines records;
+    their pcs are packed per (library, Build ID) without symbolicating
+    anything. aggregate() then maps every pc of a library to the function
+    containing it in one pass over the library's ELF symbol table
+    (numpy.searchsorted when NumPy is installed, bisect otherwise), so no
+    addr2line process is run. Symbol files are found through parser, a
+    LogcatParser with symbols_dir set; frames of libraries without one
+    fall back to the symbol printed in the tombstone.
+    """
+
+    def __init__(self, parser: LogcatParser):
+        self.parser = parser
+        self.stats = parser.stats
+        self.crashes = 0
+        self.frames = 0
+        self._libraries: Dict[Tuple[str, Optional[str]], _LibraryFrames] = {}
+
+    def add_frames(self, frames: Iterable[Frame]):
+        """Add the stack of one crash"""
+        crash_id = self.crashes
+        self.crashes += 1
+        libraries = self._libraries
+        for frame in frames:
+            lib = frame.lib
+            if lib.startswith(_VOLATILE_LIBS) or 'dalvik' in lib.lower():
+                continue  # 匿名映射和 Java 代码没有符号文件
+            key = (_lib_name(lib), frame.build_id)
+            group = libraries.get(key)
+            if group is None:
+                group = libraries[key] = _LibraryFrames(lib)
+            group.pcs.append(frame.addr)
+            group.crash_ids.append(crash_id)
+            group.top.append(frame.index == 0)
+            if frame.symbol and frame.addr not in group.symbols:
+                group.symbols[frame.addr] = frame.symbol.rpartition('+')[0] or frame.symbol
+            self.frames += 1
+
+    def add_crash(self, crash_info: CrashInfo):
+        self.add_frames(crash_info.frames)
+
+    def add_record(self, record: dict):
+        """Add a crash exported as a JSON Lines record (see jsonl_sink)"""
+        self.add_frames(Frame(entry['index'], int(entry['addr'], 16), sys.intern(entry['lib']),
+                              entry.get('build_id'), entry.get('symbol'))
+                        for entry in record.get('frames', []))
+
+    def _symbol_table(self, key: Tuple[str, Optional[str]], group: _LibraryFrames) -> Optional[ElfSymbolTable]:
+        p = self.parser
+        lib_name = p._get_lib_name(group.lib_path) or key[0]
+        p.current_build_id = key[1]
+        lib_path = p._get_lib_path(lib_name, key[1])
+        return p._get_elf_table(lib_path) if lib_path else None
+
+    def aggregate(self, top: Optional[int] = None) -> List[FunctionHits]:
+        """Functions ordered by hits, the top ones only if top is given"""
+        results: List[FunctionHits] = []
+        for key, group in self._libraries.items():
+            table = self._symbol_table(key, group)
+            with self.stats.stage('aggregate'):
+                count = _count_numpy if numpy is not None else _count_python
+                for name, hits, crashes, top_frame in count(group, table):
+                    results.append(FunctionHits(key[0], key[1], name, hits, crashes, top_frame))
+        self.stats.incr('frames_aggregated', self.frames)
+        results.sort(key=lambda r: (-r.hits, -r.crashes, r.library, r.function or ''))
+        return results[:top] if top else results
+
+    def to_dict(self, top: Optional[int] = None) -> dict:
+        return {
+            'crashes': self.crashes,
+            'frames': self.frames,
+            'functions': [entry.to_dict() for entry in self.aggregate(top)],
+        }
+
+
+def _function_name(table: Optional[ElfSymbolTable], fallback: List[str], function_id: int) -> Optional[str]:
+    """Name of a function id: 0 is unknown, then the table's symbols, then names from the tombstone"""
+    if function_id == 0:
+        return None
+    size = len(table) if table else 0
+    return table.name(function_id - 1) if function_id <= size else fallback[function_id - size - 1]
+
+
+def _sorted_unique(values: 'numpy.ndarray') -> 'numpy.ndarray':
+    """Distinct values in ascending order (sorting is faster than numpy.unique on large arrays)"""
+    values = numpy.sort(values)
+    if len(values) < 2:
+        return values
+    keep = numpy.empty(len(values), dtype=bool)
+    keep[0] = True
+    numpy.not_equal(values[1:], values[:-1], out=keep[1:])
+    return values[keep]
+
+
+def _count_numpy(group: _LibraryFrames, table: Optional[ElfSymbolTable]):
+    """Yield (function, hits, crashes, top_frame) of one library, all pcs at once"""
+    pcs = numpy.frombuffer(group.pcs, dtype=numpy.uint64)
+    size = len(table) if table else 0
+    ids = numpy.zeros(len(pcs), dtype=numpy.int64)
+    if size:
+        # 与 ElfSymbolTable.find 相同：大小为 0 的符号延伸到下一个符号，最后一个则不确定
+        starts = numpy.frombuffer(table.addrs, dtype=numpy.uint64)
+        sizes = numpy.frombuffer(table.sizes, dtype=numpy.uint64)
+        index = numpy.searchsorted(starts, pcs, side='right').astype(numpy.int64) - 1
+        inside = index >= 0
+        index[~inside] = 0
+        ends = starts[index] + sizes[index]
+        inside &= numpy.where(sizes[index] > 0, pcs < ends, index < size - 1)
+        ids[inside] = index[inside] + 1
+    fallback: List[str] = []
+    unknown = ids == 0
+    if group.symbols and unknown.any():
+        # 只对不同的地址查字典，再按位置展开到每个栈帧
+        unknown_pcs = pcs[unknown]
+        unique = _sorted_unique(unknown_pcs)
+        inverse = numpy.searchsorted(unique, unknown_pcs)
+        names = [group.symbols.get(pc) for pc in unique.tolist()]
+        fallback = sorted(set(name for name in names if name))
+        name_ids = {name: size + 1 + i for i, name in enumerate(fallback)}
+        ids[unknown] = numpy.array([name_ids.get(name, 0) for name in names], dtype=numpy.int64)[inverse]
+
+    hits = numpy.bincount(ids)
+    top_frame = numpy.bincount(ids[numpy.frombuffer(group.top, dtype=numpy.uint8) > 0], minlength=len(hits))
+    # (函数, 崩溃) 去重后按函数计数
+    crash_ids = numpy.frombuffer(group.crash_ids, dtype=numpy.uint32).astype(numpy.int64)
+    pairs = _sorted_unique((ids << 32) | crash_ids)
+    crashes = numpy.bincount(pairs >> 32, minlength=len(hits))
+    for function_id in numpy.flatnonzero(hits).tolist():
+        yield (_function_name(table, fallback, function_id), int(hits[function_id]),
+               int(crashes[function_id]), int(top_frame[function_id]))
+
+
+def _count_python(group: _LibraryFrames, table: Optional[ElfSymbolTable]):
+    """_count_numpy without NumPy: one bisect per distinct pc"""
+    size = len(table) if table else 0
+    fallback: List[str] = []
+    name_ids: Dict[str, int] = {}
+    pc_ids: Dict[int, int] = {}
+    for pc in set(group.pcs):
+        index = table.find(pc) if size else -1
+        if index >= 0:
+            pc_ids[pc] = index + 1
+            continue
+        name = group.symbols.get(pc)
+        if name and name not in name_ids:
+            fallback.append(name)
+            name_ids[name] = size + len(fallback)
+        pc_ids[pc] = name_ids.get(name, 0)
+    ids = [pc_ids[pc] for pc in group.pcs]
+    hits = Counter(ids)
+    crashes = Counter(function_id for function_id, _ in set(zip(ids, group.crash_ids)))
+    top_frame = Counter(itertools.compress(ids, group.top))
+    for function_id, count in hits.items():
+        yield _function_name(table, fallback, function_id), count, crashes[function_id], top_frame[function_id]
+
+
+def _read_records(path: str) -> Iterable[dict]:
+    with (gzip.open(path, 'rt') if path.endswith('.gz') else open(path)) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def add_file(top_functions: TopFunctions, path: str):
+    """Add every crash of a logcat, .dmp or JSON Lines file"""
+    if path.endswith(('.jsonl', '.jsonl.gz')):
+        for record in _read_records(path):
+            top_functions.add_record(record)
+        return
+    crashes = top_functions.parser._scan_file(path)
+    if path.endswith('.dmp'):
+        crashes = itertools.islice(crashes, 1)  # 其余线程的栈不是崩溃
+    for crash_info in crashes:
+        top_functions.add_crash(crash_info)
+
+
+def format_report(results: List[FunctionHits]) -> str:
+    lines = [f"{'hits':>10} {'crashes':>9} {'#00':>8}  function"]
+    for entry in results:
+        function = entry.function or '??'
+        lines.append(f"{entry.hits:10d} {entry.crashes:9d} {entry.top_frame:8d}  {function}  ({entry.library})")
+    return '\n'.join(lines)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Count the native functions that appear most often in crash stacks, '
+                    'from logcat files, .dmp files and JSON Lines records.'
+    )
+    parser.add_argument('inputs', nargs='+', help='Files, directories (searched recursively) or glob patterns')
+    parser.add_argument('-s', '--symbols', help='Path to the directory containing symbol files', metavar='DIR')
+    parser.add_argument('-t', '--top', type=int, default=50, help='Number of functions to report (default: 50, 0 for all)',
+                        metavar='N')
+    parser.add_argument('--json', help='Write the report as JSON to FILE', metavar='FILE')
+    parser.add_argument('--cache-dir', help='Directory of the persistent symbol index', metavar='DIR')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the persistent symbol index')
+    parser.add_argument('--stats', choices=['text', 'json'], help='Print per-stage timings and counters to stderr when done')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose logging')
+    return parser.parse_args()
+
+
+def main():
+    """Main entry point"""
+    args = parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING, format='[%(levelname)s] %(message)s')
+    if numpy is None:
+        logging.warning("NumPy is not installed, aggregating without it (pip install numpy for large inputs)")
+    parser = LogcatParser(
+        symbols_dir=args.symbols or os.environ.get('SYMBOLS_DIR'),
+        verbose=args.verbose,
+        line_info=False,
+        cache_dir=args.cache_dir,
+        persistent_cache=not args.no_cache,
+        stats=Stats() if args.stats else None
+    )
+    top_functions = TopFunctions(parser)
+    with parser:
+        files = collect_files(args.inputs)
+        for path in files:
+            with parser.stats.stage('scan_files'):
+                add_file(top_functions, path)
+        report = top_functions.to_dict(args.top or None)
+    print(format_report([FunctionHits(**entry) for entry in report['functions']]))
+    print(f"\n{top_functions.crashes} crashes, {top_functions.frames} frames in {len(files)} files")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.stats:
+        print_stats(parser.stats, args.stats)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,6 @@
 import os
 import platform
-from typing import Optional
+from typing import Optional, Tuple
 
 def get_platform() -> str:
     """Get current platform name"""
@@ -38,4 +38,23 @@ def find_ndk_path() -> Optional[str]:
                 latest = sorted(versions)[-1]
                 return os.path.join(location, latest)
     
-    return None 
\ No newline at end of file
+    return None 
+
+def default_cache_dir() -> str:
+    """Get the directory for persistent caches (NDK_TOOLKIT_CACHE_DIR overrides it)"""
+    cache_dir = os.getenv('NDK_TOOLKIT_CACHE_DIR')
+    if cache_dir:
+        return cache_dir
+    if get_platform() == 'windows':
+        base = os.getenv('LOCALAPPDATA') or os.path.expanduser('~/AppData/Local')
+    else:
+        base = os.getenv('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'native-toolkit')
+
+def file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """(size, mtime_ns) of a file, or None if it cannot be read; changes when the file is overwritten"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
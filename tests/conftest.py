@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# 添加仓库根目录到 Python 路径，直接运行 pytest 时也能导入 src 和 benchmarks
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.run_benchmarks import prepare_workload
+
+# 与 run_benchmarks 的参数相同，只是规模小到几秒内就能跑完全部测试
+WORKLOAD_PARAMS = {
+    'lines': 4000,
+    'crash_density': 60,
+    'frames': 8,
+    'processes': 4,
+    'libraries': 4,
+    'functions': 400,
+    'dumps': 6,
+    'seed': 0,
+}
+
+
+@pytest.fixture(scope='session')
+def workload(tmp_path_factory) -> dict:
+    """Synthetic symbols, logcat and dumps with a fake NDK, as in the benchmark manifest
+
+    Shared by all tests: tests that modify symbols copy them first.
+    """
+    return prepare_workload(str(tmp_path_factory.mktemp('workload')), dict(WORKLOAD_PARAMS))
@@ -0,0 +1,25 @@
+"""Hand-written logcat lines for tests that need an exact layout"""
+
+
+def line(second: int, pid: int, level: str, tag: str, message: str) -> str:
+    """One `logcat -v threadtime` line"""
+    return f'01-01 00:00:{second:02d}.000  {pid}  {pid} {level} {tag}: {message}\n'
+
+
+CRASH = ''.join([
+    line(1, 1259, 'F', 'libc', 'Fatal signal 11 (SIGSEGV), code 1 (SEGV_MAPERR), fault addr 0x0 in tid 1283 '
+                               '(RenderThread), pid 1259 (com.example.app7)'),
+    line(2, 1359, 'F', 'DEBUG', 'pid: 1259, tid: 1283, name: RenderThread  >>> com.example.app7 <<<'),
+    line(3, 1359, 'F', 'DEBUG', 'backtrace:'),
+    line(4, 1359, 'F', 'DEBUG', '      #00 pc 0000000000042e70  /data/app/~~com.example.app7/lib/arm64/libsynth3.so'),
+    line(5, 1359, 'F', 'DEBUG', '      #01 pc 00000000001d3e58  /apex/com.android.runtime/lib64/bionic/libc.so'),
+])
+
+
+def comparable(crashes) -> list:
+    """Crash dicts without the timings, which differ between runs"""
+    result = []
+    for crash in crashes:
+        crash = crash if isinstance(crash, dict) else crash.to_dict()
+        result.append({k: v for k, v in crash.items() if k != 'timings'})
+    return result
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.fake_toolchain import host_tag
+from src.addr2line_pool import Addr2LinePool, Addr2LineWorker, AsyncAddr2LinePool
+from src.elf_symbols import ElfSymbolTable
+from src.stats import Stats
+
+
+@pytest.fixture
+def tool(workload):
+    """(addr2line path, symbol file, addresses spanning several chunks, one-shot addr2line output)"""
+    addr2line = os.path.join(workload['ndk_path'], 'toolchains', 'llvm', 'prebuilt', host_tag(), 'bin', 'llvm-addr2line')
+    lib = os.path.join(workload['symbols_dir'], 'arm64-v8a', 'libsynth1.so')
+    table = ElfSymbolTable(lib)
+    addrs = [f'{addr + 4:x}' for addr in table.addrs[:2 * Addr2LineWorker.CHUNK_SIZE + 44]] + ['10']
+    proc = subprocess.run([addr2line, '-C', '-f', '-p', '-e', lib], input=''.join(f'{a}\n' for a in addrs),
+                          capture_output=True, text=True, timeout=60, check=True)
+    return addr2line, lib, addrs, proc.stdout.splitlines()
+
+
+def test_pool_resolves_many_addresses_in_chunks_with_one_process(tool):
+    addr2line, lib, addrs, expected = tool
+    stats = Stats()
+    pool = Addr2LinePool(addr2line, stats=stats, idle_timeout=0)
+    try:
+        assert pool.resolve(lib, addrs) == expected
+        assert pool.resolve(lib, addrs[::-1]) == expected[::-1]
+        assert len(pool) == 1
+    finally:
+        pool.close()
+    assert stats.subprocesses['llvm-addr2line']['spawns'] == 1
+    assert stats.subprocesses['llvm-addr2line']['calls'] == 2
+
+
+def test_worker_restarts_after_process_dies_mid_query(tool):
+    addr2line, lib, addrs, expected = tool
+    stats = Stats()
+    worker = Addr2LineWorker(addr2line, lib, stats=stats)
+    # 读到第一行地址后不输出任何结果就退出的进程，模拟 addr2line 崩溃
+    worker._proc = subprocess.Popen([sys.executable, '-c', 'import sys; sys.stdin.readline()'],
+                                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+    try:
+        with worker.lock:
+            assert worker.resolve(addrs) == expected
+    finally:
+        worker.close()
+    assert stats.counters['addr2line_restarts'] == 1
+    assert stats.subprocesses['llvm-addr2line']['spawns'] == 1
+
+
+def test_pool_evicts_idle_and_overwritten_workers(tool, tmp_path):
+    addr2line, lib, addrs, expected = tool
+    copy = str(tmp_path / 'libsynth1.so')
+    with open(lib, 'rb') as src, open(copy, 'wb') as dst:
+        dst.write(src.read())
+    pool = Addr2LinePool(addr2line, idle_timeout=60)
+    try:
+        pool.resolve(copy, addrs[:3])
+        (worker,) = pool._workers[copy]
+        os.utime(copy, ns=(0, 0))  # 符号文件被覆盖：旧进程不再使用
+        assert pool.resolve(copy, addrs[:3]) == expected[:3]
+        assert pool._workers[copy] != [worker] and not worker.alive
+
+        pool.idle_timeout = 0.0
+        pool.evict_idle()
+        assert len(pool) == 0
+    finally:
+        pool.close()
+
+
+def test_async_pool_matches_one_shot_output(tool):
+    addr2line, lib, addrs, expected = tool
+
+    async def run():
+        pool = AsyncAddr2LinePool(addr2line, workers_per_file=2)
+        try:
+            results = await asyncio.gather(pool.resolve(lib, addrs), pool.resolve(lib, addrs[:5]))
+            return results, len(pool)
+        finally:
+            await pool.aclose()
+
+    (full, part), workers = asyncio.run(run())
+    assert full == expected
+    assert part == expected[:5]
+    assert workers == 2
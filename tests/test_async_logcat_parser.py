@@ -0,0 +1,54 @@
+import asyncio
+
+from src.async_logcat_parser import AsyncLogcatParser
+from src.ndk_logcat_parser import LogcatParser
+from src.stats import Stats
+
+from logcat_samples import CRASH, comparable, line
+
+
+def _without_offsets(crashes) -> list:
+    """Offsets are only known when scanning a file"""
+    return [{k: v for k, v in crash.items() if k not in ('offset', 'end_offset')} for crash in comparable(crashes)]
+
+
+def _config(workload) -> dict:
+    return dict(symbols_dir=workload['symbols_dir'], ndk_path=workload['ndk_path'], persistent_cache=False)
+
+
+def test_async_api_matches_sync_api(workload):
+    with open(workload['logcat']) as f:
+        content = f.read()
+    with LogcatParser(**_config(workload)) as parser:
+        expected = _without_offsets(parser.iter_logcat_file(workload['logcat']))
+        expected_last = comparable([parser.parse_logcat_content(content)])
+
+    async def run():
+        async with AsyncLogcatParser(max_concurrency=4, max_addr2line_processes=2, **_config(workload)) as parser:
+            crashes = await parser.parse_crashes(content)
+            last = await parser.parse_logcat_content(content)
+            quiet = await parser.parse_logcat_content(line(0, 1148, 'D', 'okhttp', 'unrelated'))
+            return crashes, last, quiet
+
+    crashes, last, quiet = asyncio.run(run())
+    assert len(expected) == workload['logcat_stats']['crashes']
+    assert _without_offsets(crashes) == expected
+    assert comparable([last]) == expected_last
+    assert quiet is None
+
+
+def test_concurrent_requests_share_addr2line_results(workload):
+    frames = [text for text in CRASH.split('\n') if ' #0' in text]
+    frames = [text[text.index('#') - 6:] for text in frames]
+    with LogcatParser(**_config(workload)) as parser:
+        expected = parser.symbolicate_frames(frames)
+
+    async def run():
+        async with AsyncLogcatParser(stats=Stats(), **_config(workload)) as parser:
+            results = await asyncio.gather(*(parser.symbolicate_frames(frames) for _ in range(5)))
+            return results, parser.stats.counters
+
+    results, counters = asyncio.run(run())
+    assert results == [expected] * 5
+    # 只有 libsynth3.so 有符号文件，5 个并发请求只查询一次
+    assert counters['addr2line_addresses'] == 1
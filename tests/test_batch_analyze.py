@@ -0,0 +1,78 @@
+import json
+import os
+import shutil
+import sys
+
+from src import batch_analyze
+from src.batch_analyze import BatchOptions, collect_files, run_batch
+
+from logcat_samples import CRASH, line
+
+
+def _inputs(workload, root) -> str:
+    """dev1/ and dev2/ with a logcat.txt each, a dump and a log without crashes"""
+    for device in ('dev1', 'dev2'):
+        os.makedirs(root / device)
+    shutil.copy(workload['logcat'], root / 'dev1' / 'logcat.txt')
+    (root / 'dev2' / 'logcat.txt').write_text(CRASH + line(6, 1148, 'D', 'okhttp', 'unrelated'))
+    (root / 'dev2' / 'quiet.log').write_text(line(1, 1148, 'D', 'okhttp', 'nothing to see'))
+    shutil.copy(workload['dumps'][0], root / 'dev1' / 'crash_0000.dmp')
+    return str(root)
+
+
+def test_batch_routes_files_and_names_outputs_by_relative_path(workload, tmp_path):
+    inputs = _inputs(workload, tmp_path / 'in')
+    out = tmp_path / 'out'
+    options = BatchOptions(symbols_dir=workload['symbols_dir'], ndk_path=workload['ndk_path'], output_dir=str(out),
+                           line_info=False, persistent_cache=False)
+    summary = run_batch([inputs], options, workers=2)
+
+    results = {os.path.relpath(result.file, inputs): result for result in summary.files}
+    assert {name: (result.type, result.status) for name, result in results.items()} == {
+        os.path.join('dev1', 'crash_0000.dmp'): ('dmp', 'ok'),
+        os.path.join('dev1', 'logcat.txt'): ('logcat', 'ok'),
+        os.path.join('dev2', 'logcat.txt'): ('logcat', 'ok'),
+        os.path.join('dev2', 'quiet.log'): ('logcat', 'no_crash'),
+    }
+    assert (summary.total, summary.ok, summary.no_crash, summary.failed) == (4, 3, 1, 0)
+    assert results[os.path.join('dev1', 'logcat.txt')].crashes == workload['logcat_stats']['crashes']
+    assert summary.crashes == workload['logcat_stats']['crashes'] + 2
+
+    # 同名的两个 logcat.txt 各自写到对应的子目录，不会互相覆盖
+    dev1 = (out / 'dev1' / 'logcat.txt.parsed.txt').read_text()
+    dev2 = (out / 'dev2' / 'logcat.txt.parsed.txt').read_text()
+    assert dev1.count('Process: ') == workload['logcat_stats']['crashes']
+    assert dev2.count('Process: ') == 1
+    assert 'Crash dump is completed' in (out / 'dev1' / 'crash_0000.dmp.symbolicated.txt').read_text()
+
+
+def test_batch_reports_failures_without_stopping(workload, tmp_path):
+    inputs = _inputs(workload, tmp_path / 'in')
+    # 没有 NDK 时 .dmp 无法处理，其余文件照常分析
+    summary = run_batch([inputs], BatchOptions(persistent_cache=False), workers=2)
+    failed = [result for result in summary.files if result.status == 'failed']
+    assert [result.type for result in failed] == ['dmp']
+    assert failed[0].error.startswith('ValueError')
+    assert (summary.ok, summary.no_crash, summary.failed) == (2, 1, 1)
+
+
+def test_rerun_with_output_inside_inputs_skips_earlier_results(workload, tmp_path, monkeypatch, capsys):
+    inputs = _inputs(workload, tmp_path / 'in')
+    out = os.path.join(inputs, 'out')
+    argv = ['batch_analyze', '-s', workload['symbols_dir'], '-n', workload['ndk_path'], '-o', out,
+            '--no-line-info', '--no-cache', '-j', '2', inputs]
+    monkeypatch.setattr(sys, 'argv', argv)
+    for _ in range(2):
+        batch_analyze.main()
+        with open(os.path.join(out, 'batch_summary.json')) as f:
+            summary = json.load(f)
+        assert summary['total'] == 4
+    assert 'Analyzed 4 files' in capsys.readouterr().out
+
+
+def test_collect_files_skips_outputs_unless_input_is_inside_them(tmp_path):
+    (tmp_path / 'out').mkdir()
+    for name in ('a.log', 'batch_summary.json', 'a.log.parsed.txt', os.path.join('out', 'b.log')):
+        (tmp_path / name).write_text('')
+    assert collect_files([str(tmp_path)], exclude=[str(tmp_path / 'out')]) == [str(tmp_path / 'a.log')]
+    assert collect_files([str(tmp_path / 'out')], exclude=[str(tmp_path / 'out')]) == [str(tmp_path / 'out' / 'b.log')]
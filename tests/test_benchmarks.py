@@ -0,0 +1,36 @@
+import os
+import subprocess
+
+from benchmarks.fake_toolchain import host_tag
+from benchmarks.run_benchmarks import compare
+from src.elf_symbols import ElfSymbolTable, read_build_id
+from src.ndk_logcat_parser import LogcatParser
+
+
+def test_generated_logcat_matches_its_stats(workload):
+    with LogcatParser(persistent_cache=False) as parser:
+        crashes = list(parser.iter_logcat_file(workload['logcat']))
+    assert len(crashes) == workload['logcat_stats']['crashes']
+    assert sum(len(crash.frames) for crash in crashes) == workload['logcat_stats']['frames']
+
+
+def test_fake_addr2line_answers_from_the_symbol_table(workload):
+    lib = os.path.join(workload['symbols_dir'], 'arm64-v8a', 'libsynth0.so')
+    table = ElfSymbolTable(lib)
+    addrs = [table.addrs[1] + 4, table.addrs[-1], 0x10]
+    tool = os.path.join(workload['ndk_path'], 'toolchains', 'llvm', 'prebuilt', host_tag(), 'bin', 'llvm-addr2line')
+    proc = subprocess.run([tool, '-C', '-f', '-p', '-e', lib], input=''.join(f'{addr:x}\n' for addr in addrs),
+                          capture_output=True, text=True, timeout=60, check=True)
+    functions = [output.split(' at ')[0] for output in proc.stdout.splitlines()]
+    assert functions == [table.lookup(addrs[0])[0], table.lookup(addrs[1])[0], '??']
+    assert len(read_build_id(lib)) == 40
+
+
+def test_compare_reports_lines_per_sec_regression(capsys):
+    def results(lines_per_sec: float) -> dict:
+        return {'workload': {'params': {'lines': 1}},
+                'results': {'logcat_scan': {'lines_per_sec': lines_per_sec, 'crashes_per_sec': 1.0}}}
+
+    assert compare(results(85.0), results(100.0), max_regression=0.1) == ['logcat_scan']
+    assert compare(results(95.0), results(100.0), max_regression=0.1) == []
+    assert '-5.0%' in capsys.readouterr().out
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+
+from src.async_logcat_parser import AsyncLogcatParser
+from src.crash_buckets import CrashBucket, CrashBuckets
+from src.ndk_logcat_parser import CrashInfo, LogcatParser
+from src.stats import Stats
+
+from logcat_samples import CRASH, line
+
+
+def _crash_at(minute: int, pid: int = 1259) -> str:
+    """CRASH logged in another minute by another process instance"""
+    return CRASH.replace('01-01 00:00:', f'01-01 00:{minute:02d}:').replace('1259', str(pid))
+
+
+OTHER_CRASH = ''.join([
+    line(1, 2000, 'F', 'libc', 'Fatal signal 6 (SIGABRT), code -1 (SI_QUEUE) in tid 2000 (main), pid 2000 (com.other)'),
+    line(2, 1359, 'F', 'DEBUG', 'pid: 2000, tid: 2000, name: main  >>> com.other <<<'),
+    line(3, 1359, 'F', 'DEBUG', 'backtrace:'),
+    line(4, 1359, 'F', 'DEBUG', '      #00 pc 0000000000021000  /data/app/~~com.other/lib/arm64/libsynth1.so'),
+]).replace('01-01 00:00:', '01-01 00:30:')
+
+
+def test_each_bucket_is_symbolicated_once(workload):
+    content = _crash_at(5, 1259) + OTHER_CRASH + _crash_at(9, 4321) + _crash_at(7, 5555)
+    config = dict(symbols_dir=workload['symbols_dir'], ndk_path=workload['ndk_path'], persistent_cache=False)
+    with LogcatParser(**config) as parser:
+        expected = [crash.frames for crash in parser.iter_crashes(content.splitlines(keepends=True))]
+
+    with LogcatParser(bucket_crashes=True, stats=Stats(), **config) as parser:
+        symbolicated = []
+        resolve_frames = parser.resolve_frames
+        parser.resolve_frames = lambda frames: symbolicated.append(frames) or resolve_frames(frames)
+        crashes = list(parser.iter_crashes(content.splitlines(keepends=True)))
+    assert len(symbolicated) == 2
+    assert parser.stats.counters['crashes_deduplicated'] == 2
+    assert [[frame.render() for frame in crash.frames] for crash in crashes] == \
+           [[frame.render() for frame in frames] for frames in expected]
+    assert all(frame.resolved for frame in crashes[2].frames[:1])
+
+    (largest, other) = parser.buckets.buckets()
+    assert (largest.count, largest.first_seen, largest.last_seen) == \
+           (3, '01-01 00:05:01.000', '01-01 00:09:01.000')
+    assert (other.count, other.process) == (1, 'com.other')
+
+
+def test_first_and_last_seen_compare_parsed_timestamps():
+    bucket = CrashBucket('sig')
+    for timestamp in ('2024-03-01 10:00:00.000', '11-01 09:00:00.000', '2024-03-01 09:59:59.5'):
+        bucket.record(CrashInfo('com.example', '11', '', timestamp=timestamp))
+    # 文本比较会认为 "11-01" 早于 "2024-03-01"
+    assert (bucket.first_seen, bucket.last_seen) == ('2024-03-01 09:59:59.5', '11-01 09:00:00.000')
+
+    bucket.merge({'count': 2, 'first_seen': '2023-12-31 23:00:00.000', 'last_seen': '2024-02-01 00:00:00.000'})
+    assert (bucket.count, bucket.first_seen, bucket.last_seen) == (5, '2023-12-31 23:00:00.000', '11-01 09:00:00.000')
+
+
+def test_async_parser_waits_for_representative_without_blocking_the_loop(workload):
+    config = dict(symbols_dir=workload['symbols_dir'], ndk_path=workload['ndk_path'], persistent_cache=False)
+    with LogcatParser(**config) as parser:
+        representative = parser.parse_logcat_content(CRASH)
+
+    async def run():
+        async with AsyncLogcatParser(bucket_crashes=True, **config) as async_parser:
+            # 另一个线程中的同步解析器已分到该桶，正在符号化代表崩溃
+            buckets: CrashBuckets = async_parser.parser.buckets
+            raw = CrashInfo(representative.process, representative.signal, representative.signal_detail,
+                            frames=representative.frames)
+            bucket, new = buckets.assign(raw)
+            assert new
+            loop_ran = threading.Event()
+            waited = []
+
+            async def heartbeat():
+                # 异步解析器分到该桶之后事件循环仍能继续运行
+                while buckets.crashes < 2:
+                    await asyncio.sleep(0.005)
+                for _ in range(3):
+                    await asyncio.sleep(0.01)
+                loop_ran.set()
+
+            def symbolicate_elsewhere():
+                waited.append(loop_ran.wait(2))
+                bucket.set_representative(representative)
+
+            thread = threading.Thread(target=symbolicate_elsewhere)
+            thread.start()
+            crash, _ = await asyncio.gather(async_parser.parse_logcat_content(CRASH), heartbeat())
+            thread.join()
+            return crash, waited
+
+    crash, waited = asyncio.run(asyncio.wait_for(run(), 30))
+    assert waited == [True]
+    assert [frame.resolved for frame in crash.frames] == [frame.resolved for frame in representative.frames]
+    assert crash.frames[0].resolved
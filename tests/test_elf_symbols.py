@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from benchmarks.fake_elf import write_elf
+from src.elf_symbols import ElfError, ElfSymbolTable, demangle, read_build_id
+from src.ndk_logcat_parser import LogcatParser
+from src.stats import Stats
+
+MANGLED = '_ZN5synth6Module6methodEv'
+FUNCTIONS = [('first', 0x1000, 0x40), (MANGLED, 0x1040, 0x20), ('after_gap', 0x1100, 0x10)]
+
+
+@pytest.fixture
+def elf(tmp_path) -> str:
+    path = str(tmp_path / 'libtiny.so')
+    # 故意打乱顺序：符号表按地址排序
+    write_elf(path, FUNCTIONS[::-1], bytes.fromhex('c0ffee' * 6 + 'ab'))
+    return path
+
+
+def test_lookup_finds_containing_function_and_rejects_gaps(elf):
+    table = ElfSymbolTable(elf)
+    assert list(table.addrs) == [0x1000, 0x1040, 0x1100]
+    assert table.lookup(0x1000) == ('first', 0)
+    assert table.lookup(0x103f) == ('first', 0x3f)
+    assert table.lookup(0x1044)[1] == 4
+    assert table.lookup(0x0fff) is None  # 第一个函数之前
+    assert table.lookup(0x1060) is None  # 两个函数之间的空隙
+    assert table.lookup(0x1110) is None  # 最后一个函数之后
+    assert read_build_id(elf) == 'c0ffee' * 6 + 'ab'
+
+
+def test_cpp_names_are_demangled(elf):
+    if demangle(MANGLED) == MANGLED:
+        pytest.skip('no __cxa_demangle in this environment')
+    assert ElfSymbolTable(elf).lookup(0x1048) == ('synth::Module::method()', 8)
+
+
+def test_non_elf_file_raises_elf_error(tmp_path):
+    path = tmp_path / 'libbroken.so'
+    path.write_bytes(b'not an ELF file' * 10)
+    with pytest.raises(ElfError):
+        ElfSymbolTable(str(path))
+
+
+def test_function_names_need_no_addr2line_without_line_info(workload):
+    lib = os.path.join(workload['symbols_dir'], 'arm64-v8a', 'libsynth2.so')
+    table = ElfSymbolTable(lib)
+    frames = [f'    #{i:02d} pc {table.addrs[i * 10] + 8:016x}  /data/app/lib/arm64/libsynth2.so' for i in range(5)]
+    stats = Stats()
+    with LogcatParser(symbols_dir=workload['symbols_dir'], ndk_path=workload['ndk_path'], line_info=False,
+                      persistent_cache=False, stats=stats) as parser:
+        resolved = [text.split('\n')[1].strip() for text in parser.symbolicate_frames(frames)]
+    assert resolved == [f'{table.name(i * 10)}+8' for i in range(5)]
+    assert 'llvm-addr2line' not in stats.subprocesses
@@ -0,0 +1,75 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+import pytest
+
+from src.jsonl_sink import JsonlSink
+
+
+def _record(i: int) -> dict:
+    # 哈希值几乎不可压缩，压缩后的大小足以触发轮转
+    return {'schema': 1, 'kind': 'logcat', 'index': i, 'build_id': hashlib.sha256(str(i).encode()).hexdigest()}
+
+
+def _read(path: str) -> list:
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_rotated_gzip_parts_hold_every_record_in_order(tmp_path):
+    path = str(tmp_path / 'out' / 'crashes.jsonl.gz')
+    with JsonlSink(path, max_bytes=16 * 1024, batch_size=64) as sink:
+        for i in range(3000):
+            sink.write(_record(i))
+    assert len(sink.files) > 2
+    assert sink.files == [str(tmp_path / 'out' / f'crashes.{part:05d}.jsonl.gz') for part in range(len(sink.files))]
+    # 每批不超过上限的 1/4，最后一批之前的大小都未达到上限
+    for part in sink.files:
+        assert os.path.getsize(part) < 16 * 1024 * 1.5
+    assert [record['index'] for part in sink.files for record in _read(part)] == list(range(3000))
+
+    # 再次运行时编号接在已有文件之后
+    with JsonlSink(path, max_bytes=16 * 1024) as again:
+        again.write(_record(3000))
+    assert again.files == [str(tmp_path / 'out' / f'crashes.{len(sink.files):05d}.jsonl.gz')]
+
+
+def test_unrotated_output_is_appended(tmp_path):
+    path = str(tmp_path / 'crashes.jsonl')
+    for start in (0, 5):
+        with JsonlSink(path) as sink:
+            for i in range(start, start + 5):
+                sink.write(_record(i))
+    assert [record['index'] for record in _read(path)] == list(range(10))
+
+
+@pytest.mark.parametrize('name', ['crashes.jsonl', 'crashes.jsonl.gz'])
+def test_idle_records_are_written_after_flush_interval(tmp_path, name):
+    path = str(tmp_path / name)
+
+    def written() -> bytes:
+        if not os.path.exists(path):
+            return b''
+        with open(path, 'rb') as f:
+            data = f.read()
+        # 压缩流尚未结束，只解压已经同步写出的部分
+        return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(data) if name.endswith('.gz') else data
+
+    sink = JsonlSink(path, batch_size=1000, flush_interval=0.1)
+    try:
+        sink.write(_record(0))
+        assert written() == b''
+        deadline = time.monotonic() + 10
+        while not written() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert json.loads(written())['index'] == 0
+    finally:
+        sink.close()
+    assert not any(thread.name == 'jsonl-flush' and thread.is_alive() for thread in threading.enumerate())
+    assert [record['index'] for record in _read(path)] == [0]
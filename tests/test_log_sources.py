@@ -0,0 +1,85 @@
+import gzip
+import io
+import zipfile
+
+import pytest
+
+from src import log_sources
+from src.log_sources import iter_log_streams
+from src.ndk_logcat_parser import LogcatParser
+
+from logcat_samples import CRASH, comparable, line
+
+
+def _parse(path: str) -> list:
+    with LogcatParser(persistent_cache=False) as parser:
+        return comparable(parser.iter_logcat_file(path))
+
+
+def test_gzip_log_gives_the_same_crashes(workload, tmp_path):
+    path = tmp_path / 'logcat.txt.gz'
+    with open(workload['logcat'], 'rb') as f:
+        path.write_bytes(gzip.compress(f.read()))
+    assert _parse(str(path)) == _parse(workload['logcat'])
+
+
+def test_bugreport_zip_members_are_streamed(workload, tmp_path):
+    path = tmp_path / 'bugreport.zip'
+    with open(workload['logcat'], 'rb') as f:
+        logcat = f.read()
+    with open(workload['dumps'][0], 'rb') as f:
+        tombstone = f.read()
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('FS/data/tombstones/tombstone_00', tombstone)
+        archive.writestr('FS/data/tombstones/tombstone_00.pb', b'\0binary')
+        archive.writestr('bugreport-synth-2024.txt', CRASH)
+        archive.writestr('FS/data/misc/logd/logcat.log.gz', gzip.compress(logcat))
+        # 与 bugreport 主文件中的崩溃相同，只报告一次
+        archive.writestr('FS/data/log/extra.log', line(0, 1148, 'D', 'okhttp', 'unrelated') + CRASH)
+        archive.writestr('version.txt', '1.0')
+
+    streams = [(stream.name.split('!')[1], stream.kind, stream.file.read())
+               for stream in iter_log_streams(str(path))]
+    assert [(name, kind) for name, kind, _ in streams] == [
+        ('bugreport-synth-2024.txt', 'logcat'),
+        ('FS/data/misc/logd/logcat.log.gz', 'logcat'),
+        ('FS/data/log/extra.log', 'logcat'),
+        ('FS/data/tombstones/tombstone_00', 'tombstone'),
+    ]
+    assert streams[1][2] == logcat
+
+    crashes = _parse(str(path))
+    assert len(crashes) == 1 + workload['logcat_stats']['crashes'] + 1
+    assert crashes[0]['process'] == 'com.example.app7'
+    # tombstone 只取崩溃线程的栈
+    assert crashes[-1] == _parse(workload['dumps'][0])[0]
+
+
+def test_zip_without_known_logs_falls_back_to_text_members(tmp_path):
+    path = tmp_path / 'logs.zip'
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('device/crash.txt', CRASH)
+        archive.writestr('device/screenshot.png', b'\x89PNG')
+    assert [stream.name for stream in iter_log_streams(str(path))] == [f'{path}!device/crash.txt']
+    assert [crash['process'] for crash in _parse(str(path))] == ['com.example.app7']
+
+
+def test_zstd_frames_are_read_across(tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+    path = tmp_path / 'logcat.txt.zst'
+    compressor = zstandard.ZstdCompressor()
+    # logrotate 等工具追加写入时会产生多个 frame
+    path.write_bytes(compressor.compress(CRASH[:200].encode()) + compressor.compress(CRASH[200:].encode()))
+    with log_sources.open_log(str(path)) as f:
+        assert f.read().decode() == CRASH
+    assert [crash['process'] for crash in _parse(str(path))] == ['com.example.app7']
+
+
+def test_zstd_without_the_package_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_sources, 'zstandard', None)
+    path = tmp_path / 'logcat.txt.zst'
+    path.write_bytes(b'')
+    with pytest.raises(RuntimeError, match='zstandard'):
+        log_sources.open_log(str(path))
+    with pytest.raises(RuntimeError, match='zstandard'):
+        log_sources._decompress('logcat.zst', io.BytesIO())
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+
+import pytest
+
+from src.logcat_follow import Checkpoint, LogcatFollower
+from src.ndk_logcat_parser import LogcatParser
+
+from logcat_samples import CRASH, line
+
+
+def _follow_in_thread(follower: LogcatFollower, path: str):
+    found = []
+    thread = threading.Thread(target=lambda: found.extend(follower.follow(path)), daemon=True)
+    thread.start()
+    return thread, found
+
+
+def _wait_for(condition, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def test_follow_emits_crash_ended_by_last_line_before_rotation(tmp_path):
+    path = str(tmp_path / 'live.log')
+    with open(path, 'w') as f:
+        # 旧文件的最后一行没有换行符，它结束了前面的崩溃
+        f.write(CRASH + line(6, 1148, 'D', 'okhttp', 'unrelated').rstrip('\n'))
+    with LogcatParser(persistent_cache=False) as parser:
+        follower = LogcatFollower(parser, poll_interval=0.05, idle_flush=60)
+        thread, found = _follow_in_thread(follower, path)
+        time.sleep(0.3)
+        os.rename(path, path + '.1')
+        with open(path, 'w') as f:
+            f.write(line(7, 1148, 'D', 'okhttp', 'new file'))
+        _wait_for(lambda: found)
+        follower.stop()
+        thread.join(10)
+    assert [crash.process for crash in found] == ['com.example.app7']
+
+
+def test_follow_stop_before_file_exists(tmp_path):
+    with LogcatParser(persistent_cache=False) as parser:
+        follower = LogcatFollower(parser, poll_interval=0.05)
+        thread, found = _follow_in_thread(follower, str(tmp_path / 'missing.log'))
+        time.sleep(0.2)
+        follower.stop()
+        thread.join(10)
+    assert not thread.is_alive()
+    assert found == []
+
+
+@pytest.mark.parametrize('first_line', [
+    CRASH.splitlines(keepends=True)[0],  # Fatal signal：扫描器开始收集行
+    CRASH.splitlines(keepends=True)[1],  # 只有 >>> 行：不收集行，由跟随器按行数结束
+], ids=['fatal_signal', 'process_info'])
+def test_follow_moves_checkpoint_past_crash_without_frames(tmp_path, first_line):
+    path = str(tmp_path / 'live.log')
+    checkpoint_file = str(tmp_path / 'ck.json')
+    with open(path, 'w') as f:
+        f.write(first_line)
+        f.writelines(line(i % 60, 1148, 'D', 'okhttp', f'unrelated line {i}') for i in range(50000))
+    size = os.path.getsize(path)
+
+    def checkpoint_offset() -> int:
+        checkpoint = Checkpoint.load(checkpoint_file)
+        return checkpoint.offset if checkpoint else 0
+
+    with LogcatParser(persistent_cache=False) as parser:
+        follower = LogcatFollower(parser, checkpoint_file=checkpoint_file, poll_interval=0.05, idle_flush=60)
+        thread, found = _follow_in_thread(follower, path)
+        _wait_for(lambda: checkpoint_offset() == size)
+        follower.stop()
+        thread.join(10)
+    assert checkpoint_offset() == size
+    assert [(crash.pid, crash.frames) for crash in found] == [(1259, [])]
+
+
+def test_follow_idle_flushes_crash_without_frames(tmp_path):
+    path = str(tmp_path / 'live.log')
+    checkpoint_file = str(tmp_path / 'ck.json')
+    with open(path, 'w') as f:
+        f.write(CRASH.splitlines(keepends=True)[0] + line(2, 1148, 'D', 'okhttp', 'unrelated'))
+    with LogcatParser(persistent_cache=False) as parser:
+        follower = LogcatFollower(parser, checkpoint_file=checkpoint_file, poll_interval=0.05, idle_flush=0.2)
+        thread, found = _follow_in_thread(follower, path)
+        _wait_for(lambda: found)
+        follower.stop()
+        thread.join(10)
+    assert [crash.process for crash in found] == ['com.example.app7']
+    assert Checkpoint.load(checkpoint_file).offset == os.path.getsize(path)
@@ -0,0 +1,90 @@
+import os
+import shutil
+
+from src.logcat_index import index_path
+from src.ndk_logcat_parser import LogcatParser
+from src.stats import Stats
+
+from logcat_samples import CRASH, comparable, line
+
+
+def _query(logcat: str, cache_dir: str, **filters) -> tuple:
+    stats = Stats()
+    with LogcatParser(cache_dir=cache_dir, persistent_cache=False, stats=stats) as parser:
+        crashes = comparable(parser.query_logcat_file(logcat, **filters))
+    return crashes, stats.counters
+
+
+def _scan(logcat: str, **filters) -> list:
+    with LogcatParser(persistent_cache=False) as parser:
+        crashes = comparable(parser.iter_logcat_file(logcat))
+    package = filters.get('package')
+    return [crash for crash in crashes if not package or crash['process'].split(':')[0] == package]
+
+
+def test_queries_read_only_the_selected_crashes_once_indexed(workload, tmp_path):
+    logcat = str(tmp_path / 'logcat.txt')
+    shutil.copy(workload['logcat'], logcat)
+    package = _scan(logcat)[0]['process'].split(':')[0]
+    expected = _scan(logcat, package=package)
+    assert 0 < len(expected) < workload['logcat_stats']['crashes']
+
+    crashes, counters = _query(logcat, str(tmp_path), package=package)
+    assert crashes == expected
+    assert counters['log_index_saved'] == 1
+    assert os.path.exists(index_path(logcat, str(tmp_path)))
+
+    crashes, counters = _query(logcat, str(tmp_path), package=package)
+    assert crashes == expected
+    assert 'log_index_saved' not in counters
+    assert counters['log_index_crashes'] == len(expected)
+    # 只读取选中崩溃的字节范围
+    assert counters['bytes_read'] < os.path.getsize(logcat) / 2
+
+    crashes, _ = _query(logcat, str(tmp_path))
+    assert crashes == _scan(logcat)
+
+
+def test_index_is_rebuilt_when_the_log_changes(workload, tmp_path):
+    logcat = tmp_path / 'logcat.txt'
+    shutil.copy(workload['logcat'], logcat)
+    count = workload['logcat_stats']['crashes']
+    assert len(_query(str(logcat), str(tmp_path))[0]) == count
+
+    # 追加写入：大小变化
+    with open(logcat, 'a') as f:
+        f.write(CRASH + line(6, 1148, 'D', 'okhttp', 'unrelated'))
+    crashes, counters = _query(str(logcat), str(tmp_path))
+    assert counters['log_index_saved'] == 1
+    assert len(crashes) == count + 1
+    assert crashes == _scan(str(logcat))
+
+    # 大小和 mtime 不变的改写由首尾字节的指纹发现
+    st = os.stat(logcat)
+    data = logcat.read_bytes()
+    tail = CRASH.replace('com.example.app7', 'com.example.app8').encode() + line(6, 1148, 'D', 'okhttp', 'unrelated').encode()
+    logcat.write_bytes(data[:-len(tail)] + tail)
+    os.utime(logcat, ns=(st.st_atime_ns, st.st_mtime_ns))
+    crashes, counters = _query(str(logcat), str(tmp_path))
+    assert counters['log_index_saved'] == 1
+    assert crashes[-1]['process'] == 'com.example.app8'
+
+
+def test_unreadable_index_is_ignored(workload, tmp_path):
+    logcat = str(tmp_path / 'logcat.txt')
+    shutil.copy(workload['logcat'], logcat)
+    expected, _ = _query(logcat, str(tmp_path))
+    with open(index_path(logcat, str(tmp_path)), 'w') as f:
+        f.write('{"version": 1, "crashes": [')
+    crashes, counters = _query(logcat, str(tmp_path))
+    assert crashes == expected
+    assert counters['log_index_saved'] == 1
+
+
+def test_indexed_file_scan_matches_a_plain_scan(workload, tmp_path):
+    logcat = str(tmp_path / 'logcat.txt')
+    shutil.copy(workload['logcat'], logcat)
+    expected = _scan(logcat)
+    for _ in range(2):
+        with LogcatParser(cache_dir=str(tmp_path), persistent_cache=False, log_index=True) as parser:
+            assert comparable(parser.iter_logcat_file(logcat)) == expected
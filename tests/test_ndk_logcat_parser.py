@@ -0,0 +1,145 @@
+import itertools
+import os
+import sys
+
+import pytest
+
+from src import ndk_logcat_parser
+from src.ndk_logcat_parser import MAX_HEADER_LINES, CrashInfo, LogcatParser, _LogcatScanner, _candidate_lines
+from src.stats import Stats
+
+from logcat_samples import CRASH, comparable, line
+
+
+def test_crash_without_frames_stops_collecting_lines():
+    fatal = CRASH.splitlines(keepends=True)[0]
+    noise = [line(30, 1148, 'D', 'okhttp', f'unrelated line {i}') for i in range(3 * _LogcatScanner.MAX_LINES_BEFORE_FRAMES)]
+    with LogcatParser(persistent_cache=False) as parser:
+        scanner = _LogcatScanner(parser)
+        crashes = [crash for crash in map(scanner.feed, [fatal] + noise) if crash]
+        assert len(scanner.lines) == 0
+        crashes += parser.iter_crashes(CRASH.splitlines(keepends=True))
+    assert [(crash.process, len(crash.frames)) for crash in crashes] == [('com.example.app7', 0), ('com.example.app7', 2)]
+
+
+def test_header_keeps_only_lines_of_the_crash():
+    lines = CRASH.splitlines(keepends=True)
+    log = ''.join([
+        lines[0],
+        line(1, 1000, 'I', 'system_server', 'some unrelated system_server line'),
+        line(1, 1259, 'F', 'libc', 'Abort message: bad state'),
+        lines[1],
+        line(2, 2048, 'D', 'chatty', 'another unrelated chatter line'),
+        *lines[2:],
+    ])
+    with LogcatParser(persistent_cache=False) as parser:
+        crash = parser.parse_logcat_content(log)
+    assert crash.header == ['Abort message: bad state',
+                            'pid: 1259, tid: 1283, name: RenderThread  >>> com.example.app7 <<<',
+                            'backtrace:']
+    assert crash.stack_trace[:3] == crash.header
+    assert len(crash.frames) == 2
+
+
+def test_header_is_capped():
+    lines = CRASH.splitlines(keepends=True)
+    registers = [line(2, 1359, 'F', 'DEBUG', f'    x{i:<2} 0000000000000000') for i in range(500)]
+    with LogcatParser(persistent_cache=False) as parser:
+        crash = parser.parse_logcat_content(''.join(lines[:2] + registers + lines[2:]))
+    assert len(crash.header) == MAX_HEADER_LINES
+    assert len(crash.frames) == 2
+
+
+def test_stack_trace_lines_are_parsed_into_frames():
+    rendered = '#00 pc 0000000000001000  /data/app/lib/arm64/libfoo.so (BuildId: abcd)\n    foo+4'
+    crash = CrashInfo('com.example', 'Fatal signal 6 (SIGABRT)', '', stack_trace=['backtrace:', rendered])
+    assert crash.header == ['backtrace:']
+    assert [(frame.index, frame.addr, frame.lib, frame.build_id, frame.resolved) for frame in crash.frames] == \
+        [(0, 0x1000, '/data/app/lib/arm64/libfoo.so', 'abcd', 'foo+4')]
+    assert crash.stack_trace == ['backtrace:', rendered]
+
+    # 早期版本的位置参数与属性赋值
+    positional = CrashInfo('com.example', '', '', ['#00 pc 00001000  /system/lib/libc.so (abort+12)'])
+    assert positional.frames[0].symbol == 'abort+12'
+    positional.stack_trace = crash.stack_trace
+    assert positional.to_dict()['frames'] == crash.to_dict()['frames']
+    assert CrashInfo('com.example', '', '').stack_trace == []
+
+
+@pytest.mark.parametrize('block_size', [64, 4096, 1 << 20])
+def test_keyword_prefilter_finds_the_same_crashes(workload, block_size):
+    with LogcatParser(persistent_cache=False) as parser:
+        with open(workload['logcat']) as f:
+            expected = list(parser._scan(f))
+        stats = Stats()
+        scanner = _LogcatScanner(parser)
+        with open(workload['logcat'], 'rb') as f:
+            decoded = []
+            lines = _candidate_lines(f, scanner, block_size, stats)
+            crashes = list(parser._scan((decoded.append(text) or text for text in lines), scanner))
+    def without_offsets(found) -> list:
+        # 按行扫描时没有字节偏移，其余字段应完全一致
+        return [{k: v for k, v in crash.items() if k not in ('offset', 'end_offset')} for crash in comparable(found)]
+
+    assert without_offsets(crashes) == without_offsets(expected)
+    assert len(crashes) == workload['logcat_stats']['crashes']
+    # 不在收集堆栈时，不含关键字的行不会被解码
+    assert len(decoded) < stats.counters['lines_read'] / 2
+
+
+def test_main_prints_only_crash_information(tmp_path, monkeypatch, capsys):
+    log = tmp_path / 'crash.log'
+    log.write_text(line(0, 1148, 'D', 'okhttp', 'unrelated') + CRASH)
+    monkeypatch.setattr(sys, 'argv', ['ndk_logcat_parser.py', str(log), '--no-cache'])
+    ndk_logcat_parser.main()
+    out = capsys.readouterr().out
+    assert out.lstrip('\n').startswith('Crash Information:')
+    assert 'Process: com.example.app7' in out
+    for debug_output in ('Starting main function', 'Parsed arguments', 'Created LogcatParser instance'):
+        assert debug_output not in out
+
+
+def test_frames_are_symbolicated_with_one_addr2line_call_per_library(workload):
+    config = dict(symbols_dir=workload['symbols_dir'], ndk_path=workload['ndk_path'], persistent_cache=False)
+    with LogcatParser(**config) as parser, open(workload['logcat']) as f:
+        crashes = list(parser._scan(f))[:5]
+    lines = ['    ' + frame.render() for crash in crashes for frame in crash.frames]
+    libs = {frame.lib.rsplit('/', 1)[1] for crash in crashes for frame in crash.frames if 'libsynth' in frame.lib}
+
+    with LogcatParser(stats=Stats(), **config) as parser:
+        trace = parser.symbolicate_trace(lines)
+    assert parser.stats.subprocesses['llvm-addr2line']['calls'] == len(libs) == 4
+    with LogcatParser(**config) as parser:
+        one_by_one = [parser.symbolicate_frame(text) for text in lines]
+    assert trace.split('\n') == '\n'.join(one_by_one).split('\n')
+    # 每个有符号文件的栈帧都得到了源码位置
+    assert trace.count(' at jni/') == sum('libsynth' in frame.lib for crash in crashes for frame in crash.frames)
+
+
+def test_crashes_are_yielded_while_the_log_is_still_being_read():
+    def endless_log():
+        yield from CRASH.splitlines(keepends=True)
+        for i in itertools.count():
+            yield line(i % 60, 1148, 'D', 'okhttp', f'unrelated line {i}')
+
+    with LogcatParser(persistent_cache=False) as parser:
+        # 第一条无关日志结束了崩溃，不必读完（永远读不完的）日志
+        crash = next(parser.iter_crashes(endless_log()))
+    assert (crash.process, len(crash.frames)) == ('com.example.app7', 2)
+
+
+def test_file_and_streaming_apis_agree(workload, tmp_path):
+    with open(workload['logcat']) as f:
+        content = f.read()
+    with LogcatParser(persistent_cache=False, output_dir=str(tmp_path)) as parser:
+        output = tmp_path / (os.path.basename(workload['logcat']) + '.parsed.txt')
+        stream = parser.stream_logcat_file(workload['logcat'])
+        first = next(stream)
+        # 输出文件在返回每个崩溃时就已写入
+        assert output.read_text().count('Process: ') == 1
+        streamed = [first, *stream]
+        assert output.read_text().count('Process: ') == len(streamed) == workload['logcat_stats']['crashes']
+        last = parser.parse_logcat_file(workload['logcat'])
+        from_content = parser.parse_logcat_content(content)
+    assert comparable([last]) == comparable(streamed[-1:])
+    assert comparable([from_content])[0]['stack_trace'] == comparable([last])[0]['stack_trace']
@@ -0,0 +1,112 @@
+import gzip
+import os
+import re
+import shutil
+import time
+
+import pytest
+
+from src.config import Config
+from src.ndk_stack_parser import NDKStackParser
+from src.scheduler import SymbolScheduler
+from src.stats import Stats
+
+
+def _slow_ndk(tmp_path, seconds: float) -> str:
+    """An NDK whose ndk-stack sleeps before printing the dump"""
+    ndk = tmp_path / 'slow-ndk'
+    ndk.mkdir()
+    tool = ndk / 'ndk-stack'
+    tool.write_text(f'#!/bin/sh\nsleep {seconds}\nexec cat "$4"\n')
+    tool.chmod(0o755)
+    return str(ndk)
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='shell script ndk-stack')
+def test_dumps_run_concurrently_in_input_order(workload, tmp_path):
+    dumps = workload['dumps'][:4]
+    config = Config(ndk_path=_slow_ndk(tmp_path, 1), symbols_dir=workload['symbols_dir'])
+    out = tmp_path / 'out'
+    stats = Stats()
+    parser = NDKStackParser(config, stats=stats, scheduler=SymbolScheduler(4))
+    start = time.monotonic()
+    results = parser.parse_dump_files(dumps, output_dir=str(out), max_workers=4, timeout=30)
+    # 顺序执行至少需要 4 秒
+    assert time.monotonic() - start < 3
+    assert [result.dump_file for result in results] == dumps
+    assert [result.status for result in results] == ['ok'] * 4
+    for dump, result in zip(dumps, results):
+        assert result.output_file == str(out / (os.path.basename(dump) + '.symbolicated.txt'))
+        with open(dump) as expected, open(result.output_file) as actual:
+            assert actual.read() == expected.read()
+    assert not [name for name in os.listdir(out) if name.endswith('.part')]
+    assert stats.subprocesses['ndk-stack']['spawns'] == 4
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='shell script ndk-stack')
+def test_timed_out_and_missing_dumps_fail_alone(workload, tmp_path):
+    config = Config(ndk_path=_slow_ndk(tmp_path, 30), symbols_dir=workload['symbols_dir'])
+    out = tmp_path / 'out'
+    stats = Stats()
+    parser = NDKStackParser(config, stats=stats, scheduler=SymbolScheduler(2))
+    start = time.monotonic()
+    results = parser.parse_dump_files([workload['dumps'][0], str(tmp_path / 'missing.dmp')], output_dir=str(out),
+                                      max_workers=2, timeout=0.5)
+    assert time.monotonic() - start < 10
+    assert [(result.status, result.output_file) for result in results] == [('timeout', None), ('failed', None)]
+    assert 'timed out' in results[0].error
+    assert os.listdir(out) == []
+    assert stats.counters['dumps_timeout'] == 1
+    with pytest.raises(RuntimeError, match='timed out'):
+        parser.parse_dump_file(workload['dumps'][0], timeout=0.5)
+
+
+def test_fake_ndk_stack_output_is_written_per_dump(workload, tmp_path):
+    config = Config(ndk_path=workload['ndk_path'], symbols_dir=workload['symbols_dir'])
+    parser = NDKStackParser(config, output_dir=str(tmp_path / 'one'))
+    expected = parser.parse_dump_file(workload['dumps'][0])
+    results = parser.parse_dump_files(workload['dumps'], output_dir=str(tmp_path / 'all'), max_workers=3)
+    assert all(result.status == 'ok' for result in results)
+    with open(results[0].output_file) as f:
+        assert f.read() == expected
+    assert (tmp_path / 'one' / (os.path.basename(workload['dumps'][0]) + '.symbolicated.txt')).read_text() == expected
+
+
+def _normalized(output: str) -> str:
+    """Drop the details in which the fake ndk-stack differs from the real one
+
+    It prints no column and leaves out the function names of unsymbolicated frames.
+    """
+    output = re.sub(r':(\d+):0$', r':\1', output, flags=re.M)
+    return re.sub(r' \([^()]+\+\d+\)(?= \(BuildId)', '', output)
+
+
+def test_native_engine_matches_ndk_stack(workload, tmp_path):
+    config = Config(ndk_path=workload['ndk_path'], symbols_dir=workload['symbols_dir'])
+    ndk_stack = NDKStackParser(config)
+    stats = Stats()
+    native = NDKStackParser(config, engine='native', stats=stats, persistent_cache=False)
+    try:
+        results = native.parse_dump_files(workload['dumps'], output_dir=str(tmp_path), max_workers=3)
+        for dump, result in zip(workload['dumps'], results):
+            with open(result.output_file) as f:
+                assert _normalized(f.read()) == _normalized(ndk_stack.parse_dump_file(dump))
+    finally:
+        native.close()
+    assert 'ndk-stack' not in stats.subprocesses
+    # 所有 dump 共用一个符号化器，每个库最多启动一个 addr2line 进程
+    assert stats.subprocesses['llvm-addr2line']['spawns'] <= 4
+    assert stats.counters['dumps_ok'] == len(workload['dumps'])
+
+
+def test_native_engine_reads_compressed_dumps(workload, tmp_path):
+    dump = tmp_path / 'crash.dmp.gz'
+    with open(workload['dumps'][0], 'rb') as f:
+        dump.write_bytes(gzip.compress(f.read()))
+    shutil.copy(workload['dumps'][0], tmp_path / 'crash.dmp')
+    config = Config(ndk_path=workload['ndk_path'], symbols_dir=workload['symbols_dir'])
+    native = NDKStackParser(config, engine='native', persistent_cache=False)
+    try:
+        assert native.symbolicate_native(str(dump)) == native.symbolicate_native(str(tmp_path / 'crash.dmp'))
+    finally:
+        native.close()
@@ -0,0 +1,50 @@
+import pytest
+
+from src.ndk_logcat_parser import LogcatParser
+from src.parallel_scan import ParallelLogcatParser
+from src.stats import Stats
+
+from logcat_samples import comparable, line
+
+
+# 第二块从 Fatal signal 之后开始：该块的扫描在顺序扫描的崩溃结束处仍在另一个崩溃之中，必须重新扫描
+STRADDLING_LOG = ''.join([
+    line(20, 9, 'F', 'DEBUG', '      #02 pc 000000000000cd6  /data/app/lib/arm64/libfoo.so'),
+    line(21, 9, 'F', 'DEBUG', '      #04 pc 000000000000249  /data/app/lib/arm64/libfoo.so'),
+    line(22, 100, 'F', 'libc', 'Fatal signal 11 (SIGSEGV), code 1, fault addr 0x0 in tid 100 (x), pid 100 (com.a100)'),
+    line(23, 200, 'I', 'tag', 'hello world'),
+    line(24, 9, 'F', 'DEBUG', 'pid: 100, tid: 100, name: x  >>> com.a100 <<<'),
+    line(25, 9, 'F', 'DEBUG', 'Cmdline: com.c200'),
+    line(26, 9, 'F', 'DEBUG', '      #03 pc 000000000000355  /data/app/lib/arm64/libfoo.so'),
+    line(27, 9, 'F', 'DEBUG', 'Cmdline: com.c200'),
+    line(28, 9, 'F', 'DEBUG', 'pid: 200, tid: 200, name: x  >>> com.a200 <<<'),
+    line(29, 200, 'I', 'tag', 'hello world'),
+    line(30, 200, 'I', 'tag', 'hello world'),
+    line(31, 200, 'I', 'tag', 'hello world'),
+])
+
+
+@pytest.mark.parametrize('chunk_size', [300, 2000, 7777])
+def test_parallel_scan_matches_sequential(workload, chunk_size):
+    kwargs = dict(symbols_dir=workload['symbols_dir'], line_info=False, persistent_cache=False)
+    with LogcatParser(**kwargs) as parser:
+        expected = comparable(parser.iter_logcat_file(workload['logcat']))
+    stats = Stats()
+    with ParallelLogcatParser(jobs=3, chunk_size=chunk_size, stats=stats, **kwargs) as parser:
+        crashes = comparable(parser.iter_logcat_file(workload['logcat']))
+    assert expected
+    assert crashes == expected
+    assert stats.counters['chunks'] > 1
+
+
+def test_parallel_scan_rescans_chunk_inside_straddling_crash(tmp_path):
+    logcat = tmp_path / 'straddling.log'
+    logcat.write_text(STRADDLING_LOG)
+    with LogcatParser(persistent_cache=False) as parser:
+        expected = comparable(parser.iter_logcat_file(str(logcat)))
+    stats = Stats()
+    with ParallelLogcatParser(jobs=2, chunk_size=310, stats=stats, persistent_cache=False) as parser:
+        crashes = comparable(parser.iter_logcat_file(str(logcat)))
+    assert crashes == expected
+    assert stats.counters['chunks_rescanned'] == 1
+
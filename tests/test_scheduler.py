@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+
+import pytest
+
+from benchmarks.fake_toolchain import host_tag
+from src.ndk_logcat_parser import LogcatParser
+from src.scheduler import BATCH, INTERACTIVE, SymbolScheduler, ToolSlots, priority
+from src.stats import Stats
+
+
+class _Caller(threading.Thread):
+    """Runs call in a thread that is already waiting when the constructor returns"""
+
+    def __init__(self, call):
+        super().__init__()
+        self._call = call
+        self._outcome = None
+        self.start()
+        time.sleep(0.05)
+
+    def run(self):
+        try:
+            self._outcome = (True, self._call())
+        except BaseException as e:
+            self._outcome = (False, e)
+
+    def result(self):
+        self.join(10)
+        ok, value = self._outcome
+        if not ok:
+            raise value
+        return value
+
+
+def test_concurrent_callers_compute_each_key_once():
+    scheduler = SymbolScheduler(4)
+    computed = []
+
+    def compute(keys):
+        computed.extend(keys)
+        time.sleep(0.5)  # 让其他调用方在计算期间到达
+        return [key * 2 for key in keys]
+
+    callers = [_Caller(lambda i=i: scheduler.resolve([1, 2, 3, i + 10], compute)) for i in range(4)]
+    assert [caller.result() for caller in callers] == [{1: 2, 2: 4, 3: 6, i + 10: 2 * (i + 10)} for i in range(4)]
+    assert sorted(computed) == [1, 2, 3, 10, 11, 12, 13]
+    assert scheduler.shared == 9
+    assert scheduler.to_dict()['in_flight'] == 0
+
+
+def test_errors_reach_waiters_and_abandoned_keys_are_recomputed():
+    scheduler = SymbolScheduler(1)
+    scheduler.claim(['a', 'b'])
+    waiter = _Caller(lambda: scheduler.resolve(['a'], lambda keys: ['computed'] * len(keys)))
+    scheduler.fail(['a'], ValueError('addr2line failed'))
+    with pytest.raises(ValueError):
+        waiter.result()
+
+    # 被取消的调用方不把取消传给其他调用方，由等待者自己计算
+    waiter = _Caller(lambda: scheduler.resolve(['b'], lambda keys: ['computed'] * len(keys)))
+    scheduler.fail(['b'], KeyboardInterrupt())
+    assert waiter.result() == {'b': 'computed'}
+
+
+def test_interactive_callers_take_freed_slots_first():
+    slots = ToolSlots(1)
+    order = []
+    slots.acquire(BATCH)
+
+    def take(name):
+        with slots.slot():
+            order.append(name)
+
+    def take_interactive():
+        with priority(INTERACTIVE):
+            take('interactive')
+
+    # 默认优先级是 BATCH，后到的交互请求先拿到释放的槽位
+    waiters = [_Caller(lambda: take('batch')), _Caller(take_interactive)]
+    slots.release()
+    for waiter in waiters:
+        waiter.result()
+    assert order == ['interactive', 'batch']
+    assert slots.waits == 2
+
+
+def _slow_ndk(workload, tmp_path) -> str:
+    """The fake NDK with an addr2line that takes a while to start, so concurrent parsers overlap"""
+    bin_dir = tmp_path / 'ndk' / 'toolchains' / 'llvm' / 'prebuilt' / host_tag() / 'bin'
+    bin_dir.mkdir(parents=True)
+    real = os.path.join(workload['ndk_path'], 'toolchains', 'llvm', 'prebuilt', host_tag(), 'bin', 'llvm-addr2line')
+    tool = bin_dir / 'llvm-addr2line'
+    tool.write_text(f'#!/bin/sh\nsleep 0.5\nexec "{real}" "$@"\n')
+    tool.chmod(0o755)
+    return str(tmp_path / 'ndk')
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='shell script addr2line')
+def test_parsers_sharing_a_scheduler_run_addr2line_once_per_address(workload, tmp_path):
+    scheduler = SymbolScheduler(8)
+    with LogcatParser(persistent_cache=False, line_info=False) as parser, open(workload['logcat']) as f:
+        crashes = list(parser._scan(f))
+    frames = ['    ' + frame.render() for crash in crashes for frame in crash.frames]
+    config = dict(symbols_dir=workload['symbols_dir'], ndk_path=_slow_ndk(workload, tmp_path), persistent_cache=False,
+                  scheduler=scheduler)
+    parsers = [LogcatParser(stats=Stats(), **config) for _ in range(3)]
+    try:
+        callers = [_Caller(lambda parser=parser: parser.symbolicate_frames(frames)) for parser in parsers]
+        results = [caller.result() for caller in callers]
+    finally:
+        for parser in parsers:
+            parser.close()
+    assert results[0] == results[1] == results[2]
+    unique = {(frame.lib.rsplit('/', 1)[1], frame.addr) for crash in crashes for frame in crash.frames
+              if 'libsynth' in frame.lib}
+    assert sum(parser.stats.counters.get('addr2line_addresses', 0) for parser in parsers) == len(unique)
+    assert scheduler.shared == 2 * len(unique)
@@ -0,0 +1,48 @@
+import json
+import os
+import sys
+
+from src import ndk_logcat_parser
+from src.stats import Stats
+
+
+def test_disabled_stats_record_nothing():
+    stats = Stats(enabled=False)
+    with stats.stage('read'):
+        stats.incr('lines_read', 10)
+    stats.spawn('llvm-addr2line')
+    stats.tool_time('llvm-addr2line', 1.0)
+    stats.merge({'counters': {'crashes': 1}})
+    assert (stats.stages, stats.counters, stats.subprocesses) == ({}, {}, {})
+
+
+def test_worker_snapshots_merge_into_totals():
+    stats = Stats()
+    worker = Stats()
+    for recorder in (stats, worker):
+        with recorder.stage('scan'):
+            recorder.incr('crashes', 2)
+        recorder.spawn('llvm-addr2line', failed=recorder is worker)
+        recorder.tool_time('llvm-addr2line', 0.5)
+    stats.merge(json.loads(worker.to_json()))
+    data = stats.to_dict()
+    assert data['stages']['scan']['calls'] == 2
+    assert data['counters'] == {'crashes': 4}
+    assert data['subprocesses']['llvm-addr2line'] == {'spawns': 2, 'failures': 1, 'calls': 2, 'seconds': 1.0}
+    assert 'crashes' in stats.format_text()
+
+
+def test_cli_reports_stats_on_stderr(workload, monkeypatch, capsys):
+    argv = ['ndk_logcat_parser.py', workload['logcat'], '-s', workload['symbols_dir'], '-n', workload['ndk_path'],
+            '--all', '--no-cache', '--stats', 'json']
+    monkeypatch.setattr(sys, 'argv', argv)
+    ndk_logcat_parser.main()
+    captured = capsys.readouterr()
+    report = json.loads(captured.err[captured.err.index('{'):])
+    assert report['counters']['crashes'] == workload['logcat_stats']['crashes']
+    assert report['counters']['bytes_read'] == os.path.getsize(workload['logcat'])
+    assert report['subprocesses']['llvm-addr2line']['spawns'] >= 1
+    assert {'read', 'scan', 'symbolicate'} <= set(report['stages'])
+    assert report['symbol_cache']['misses'] > 0
+    # 报告只写到 stderr，不混入崩溃信息
+    assert '"counters"' not in captured.out
@@ -0,0 +1,64 @@
+import os
+import shutil
+import sqlite3
+import time
+
+from src.ndk_logcat_parser import LogcatParser
+from src.stats import Stats
+from src.symbol_cache import SymbolCache
+
+
+def test_results_persist_across_instances(tmp_path):
+    cache = SymbolCache(cache_dir=str(tmp_path))
+    cache.put_many('build-id', {'1000': 'foo', '2000': 'bar'})
+    assert cache.get('build-id', '1000') == 'foo'
+    assert (cache.stats.memory_hits, cache.stats.writes) == (1, 2)
+    cache.close()
+
+    cache = SymbolCache(cache_dir=str(tmp_path))
+    assert cache.get_many('build-id', ['1000', '3000']) == {'1000': 'foo'}
+    assert cache.get('other-build', '2000') is None
+    assert (cache.stats.disk_hits, cache.stats.misses) == (1, 2)
+    cache.close()
+
+
+def test_copies_of_a_library_share_a_file_key(workload, tmp_path):
+    lib = os.path.join(workload['symbols_dir'], 'arm64-v8a', 'libsynth0.so')
+    shutil.copy(lib, tmp_path / 'libsynth0.so')
+    other = os.path.join(workload['symbols_dir'], 'arm64-v8a', 'libsynth1.so')
+    cache = SymbolCache(persistent=False)
+    assert cache.file_key(lib) == cache.file_key(str(tmp_path / 'libsynth0.so'))
+    assert cache.file_key(lib) != cache.file_key(other)
+    # 没有 build ID 的文件按内容哈希
+    (tmp_path / 'libplain.so').write_bytes(b'\0' * 64)
+    assert cache.file_key(str(tmp_path / 'libplain.so')).startswith('sha1:')
+
+
+def test_second_run_needs_no_addr2line(workload, tmp_path):
+    kwargs = dict(symbols_dir=workload['symbols_dir'], ndk_path=workload['ndk_path'], cache_dir=str(tmp_path))
+    with LogcatParser(**kwargs) as parser:
+        first = [crash.stack_trace for crash in parser.iter_logcat_file(workload['logcat'])]
+    stats = Stats()
+    with LogcatParser(stats=stats, **kwargs) as parser:
+        second = [crash.stack_trace for crash in parser.iter_logcat_file(workload['logcat'])]
+    assert second == first
+    assert 'llvm-addr2line' not in stats.subprocesses
+    assert parser.symbol_cache.stats.disk_hits > 0
+
+
+def test_symbol_cache_reads_while_another_process_writes(tmp_path):
+    cache = SymbolCache(cache_dir=str(tmp_path))
+    cache.put_many('build-id', {'1000': 'foo', '2000': 'bar'})
+    cache.close()
+
+    cache = SymbolCache(cache_dir=str(tmp_path))
+    writer = sqlite3.connect(str(tmp_path / SymbolCache.DB_NAME), isolation_level=None)
+    writer.execute('BEGIN IMMEDIATE')
+    try:
+        start = time.monotonic()
+        assert cache.get_many('build-id', ['1000', '2000', '3000']) == {'1000': 'foo', '2000': 'bar'}
+        assert time.monotonic() - start < 1
+    finally:
+        writer.execute('COMMIT')
+        writer.close()
+    cache.close()
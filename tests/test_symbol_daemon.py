@@ -0,0 +1,142 @@
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+
+import pytest
+
+from benchmarks.synth_logcat import generate_symbols
+from src.daemon_client import DaemonClient, DaemonError, token_path
+from src.ndk_logcat_parser import LogcatParser
+from src.symbol_daemon import SymbolDaemon
+
+from logcat_samples import comparable
+
+
+def _wait_until_serving(address: str):
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            DaemonClient(address, timeout=5).ping()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+@pytest.fixture
+def start_daemon(tmp_path):
+    daemons = []
+
+    def start(address: str = None, **kwargs) -> SymbolDaemon:
+        if address is None:
+            if not hasattr(socket, 'AF_UNIX'):
+                pytest.skip('needs Unix sockets')
+            address = str(tmp_path / 'symbold.sock')
+        daemon = SymbolDaemon(address, cache_dir=str(tmp_path / 'cache'), **kwargs)
+        thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        thread.start()
+        daemons.append((daemon, thread))
+        _wait_until_serving(address)
+        return daemon
+
+    yield start
+    for daemon, thread in daemons:
+        try:
+            DaemonClient(daemon.address, timeout=5).shutdown()
+        except OSError:  # 测试中已经停止
+            pass
+        thread.join(10)
+
+
+def _local_stack_traces(workload, cache_dir: str) -> list:
+    with LogcatParser(symbols_dir=workload['symbols_dir'], ndk_path=workload['ndk_path'], cache_dir=cache_dir) as parser:
+        return [crash.to_dict()['stack_trace'] for crash in parser.iter_logcat_file(workload['logcat'])]
+
+
+def test_daemon_round_trip(workload, start_daemon, tmp_path):
+    daemon = start_daemon()
+    config = dict(symbols_dir=workload['symbols_dir'], ndk_path=workload['ndk_path'])
+    with DaemonClient(daemon.address) as client:
+        assert client.ping()['pid'] == os.getpid()
+        crashes = client.parse_file(workload['logcat'], all_crashes=True, **config)
+        assert [crash['stack_trace'] for crash in crashes] == _local_stack_traces(workload, str(tmp_path / 'local'))
+        last = client.parse_file(workload['logcat'], **config)
+        assert comparable(last) == comparable(crashes[-1:])
+
+
+def test_daemon_picks_up_overwritten_symbol_file(workload, start_daemon, tmp_path):
+    # 不做后台扫描：被覆盖的库由查找时的重新 stat 发现
+    daemon = start_daemon(index_refresh_interval=0)
+    symbols_dir = str(tmp_path / 'symbols')
+    shutil.copytree(workload['symbols_dir'], symbols_dir)
+    config = dict(symbols_dir=symbols_dir, ndk_path=workload['ndk_path'], line_info=False)
+    with DaemonClient(daemon.address) as client:
+        before = client.parse_file(workload['logcat'], all_crashes=True, **config)
+        other = generate_symbols(str(tmp_path / 'other'), libraries=2, functions=400, seed=7)
+        shutil.copy(os.path.join(str(tmp_path / 'other'), 'arm64-v8a', other[1].name),
+                    os.path.join(symbols_dir, 'arm64-v8a', 'libsynth3.so'))
+        after = client.parse_file(workload['logcat'], all_crashes=True, **config)
+    with LogcatParser(persistent_cache=False, **config) as parser:
+        expected = [crash.to_dict()['stack_trace'] for crash in parser.iter_logcat_file(workload['logcat'])]
+    assert [crash['stack_trace'] for crash in after] == expected
+    assert after != before
+
+
+def test_daemon_background_rescan_finds_build_in_new_directory(workload, start_daemon, tmp_path):
+    daemon = start_daemon(index_refresh_interval=0.1)
+    symbols_dir = str(tmp_path / 'symbols')
+    shutil.copytree(workload['symbols_dir'], os.path.join(symbols_dir, 'v1'))
+    config = dict(symbols_dir=symbols_dir, ndk_path=workload['ndk_path'], line_info=False)
+    with DaemonClient(daemon.address) as client:
+        client.symbolicate([], **config)  # 建立该配置的解析器和索引
+        lib = generate_symbols(os.path.join(symbols_dir, 'v2'), libraries=1, functions=400, seed=7)[0]
+        func, addr, _ = lib.functions[4]
+        frames = [f'      #00 pc {addr + 4:016x}  /data/app/lib/arm64/{lib.name} (BuildId: {lib.build_id})']
+        with LogcatParser(persistent_cache=False, **config) as parser:
+            expected = parser.symbolicate_frames(frames)
+        assert func in expected[0]
+        deadline = time.monotonic() + 10
+        while client.symbolicate(frames, **config) != expected and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert client.symbolicate(frames, **config) == expected
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_tcp_daemon_requires_session_token(start_daemon, tmp_path, monkeypatch):
+    monkeypatch.setenv('NDK_TOOLKIT_CACHE_DIR', str(tmp_path / 'client-cache'))
+    address = f'127.0.0.1:{_free_port()}'
+    start_daemon(address)
+    token_file = token_path(address)
+    if os.name != 'nt':
+        assert os.stat(token_file).st_mode & 0o077 == 0
+
+    def raw_request(request: dict) -> dict:
+        with socket.create_connection(('127.0.0.1', int(address.rsplit(':', 1)[1])), timeout=5) as sock:
+            sock.sendall(json.dumps(request).encode() + b'\n')
+            return json.loads(sock.makefile('rb').readline())
+
+    # 读不到令牌文件的本机用户无法让守护进程读取文件
+    request = {'op': 'parse_content', 'content': ''}
+    assert raw_request(request) == {'ok': False, 'error': 'Missing or invalid session token'}
+    assert raw_request({**request, 'token': '0' * 64})['ok'] is False
+    with open(token_file) as f:
+        assert raw_request({**request, 'token': f.read()}) == {'ok': True, 'crashes': []}
+    with DaemonClient(address) as client:
+        assert client.parse_content('') == []
+        with pytest.raises(DaemonError):
+            client.request('no_such_op')
+
+    DaemonClient(address, timeout=5).shutdown()
+    deadline = time.monotonic() + 10
+    while os.path.exists(token_file) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not os.path.exists(token_file)
@@ -0,0 +1,70 @@
+import os
+import shutil
+
+import pytest
+
+from src.elf_symbols import read_build_id
+from src.symbol_index import SymbolIndex
+
+
+def _symbols(workload, tmp_path) -> str:
+    symbols_dir = str(tmp_path / 'symbols')
+    shutil.copytree(workload['symbols_dir'], symbols_dir)
+    return symbols_dir
+
+
+def test_symbol_index_skips_symlink_loop(workload, tmp_path):
+    symbols_dir = _symbols(workload, tmp_path)
+    try:
+        os.symlink('..', os.path.join(symbols_dir, 'arm64-v8a', 'up'))
+        os.symlink('arm64-v8a', os.path.join(symbols_dir, 'latest'))
+    except (OSError, NotImplementedError):
+        pytest.skip('cannot create symlinks')
+    index = SymbolIndex(symbols_dir, persistent=False)
+    index.refresh()
+    paths = sorted(entry.path for entry in index.entries())
+    assert paths == sorted([os.path.join('arm64-v8a', f'libsynth{i}.so') for i in range(4)]
+                           + [os.path.join('latest', f'libsynth{i}.so') for i in range(4)])
+    assert index.lookup('libsynth0.so') == os.path.join(symbols_dir, 'arm64-v8a', 'libsynth0.so')
+
+
+def test_lookup_finds_library_added_after_indexing(workload, tmp_path):
+    symbols_dir = _symbols(workload, tmp_path)
+    lib = os.path.join(symbols_dir, 'arm64-v8a', 'libsynth1.so')
+    os.rename(lib, str(tmp_path / 'libsynth1.so'))
+    index = SymbolIndex(symbols_dir, cache_dir=str(tmp_path / 'cache'))
+    assert index.lookup('libsynth1.so') is None
+
+    shutil.copy(str(tmp_path / 'libsynth1.so'), lib)
+    assert index.lookup('libsynth1.so', read_build_id(lib)) == lib
+    assert len(index) == 4
+    # 单个条目的更新也写回了持久化的索引
+    persisted = SymbolIndex(symbols_dir, cache_dir=str(tmp_path / 'cache'))._load_persisted()
+    assert os.path.join('arm64-v8a', 'libsynth1.so') in persisted
+
+
+def test_lookup_drops_deleted_library(workload, tmp_path):
+    symbols_dir = _symbols(workload, tmp_path)
+    lib = os.path.join(symbols_dir, 'arm64-v8a', 'libsynth0.so')
+    build_id = read_build_id(lib)
+    index = SymbolIndex(symbols_dir, persistent=False)
+    assert index.lookup('libsynth0.so', build_id) == lib
+
+    os.remove(lib)
+    assert index.lookup('libsynth0.so', build_id) is None
+    assert index.find_by_build_id('libsynth0.so', build_id) is None
+    assert index.candidates('libsynth0.so') == []
+
+
+def test_lookup_rereads_build_id_of_overwritten_library(workload, tmp_path):
+    symbols_dir = _symbols(workload, tmp_path)
+    lib = os.path.join(symbols_dir, 'arm64-v8a', 'libsynth0.so')
+    other = os.path.join(symbols_dir, 'arm64-v8a', 'libsynth1.so')
+    old_id, new_id = read_build_id(lib), read_build_id(other)
+    index = SymbolIndex(symbols_dir, persistent=False)
+    assert index.lookup('libsynth0.so', old_id, verify_build_id=True) == lib
+
+    shutil.copy(other, lib)
+    os.utime(lib, ns=(0, 0))  # 保证修改时间一定变化
+    assert index.lookup('libsynth0.so', old_id, verify_build_id=True) is None
+    assert index.lookup('libsynth0.so', new_id, verify_build_id=True) == lib
@@ -0,0 +1,69 @@
+import os
+import shutil
+
+from src.elf_symbols import ElfSymbolTable, read_build_id
+from src.ndk_logcat_parser import LogcatParser
+from src.stats import Stats
+from src.symbol_sidecar import SidecarStore, compile_symbols
+
+
+def _frames(table: ElfSymbolTable, lib_name: str, count: int = 6) -> list:
+    return [f'    #{i:02d} pc {table.addrs[i * 7] + 4:016x}  /data/app/lib/arm64/{lib_name}' for i in range(count)]
+
+
+def test_compiled_sidecars_match_elf_symbols(workload, tmp_path):
+    store = SidecarStore(str(tmp_path / 'sidecars'))
+    assert compile_symbols(workload['symbols_dir'], store, workers=2, persistent=False) == (4, 0, 0)
+    # 按 Build ID 命名，第二次运行不再编译
+    assert compile_symbols(workload['symbols_dir'], store, workers=2, persistent=False) == (0, 4, 0)
+
+    lib = os.path.join(workload['symbols_dir'], 'arm64-v8a', 'libsynth1.so')
+    table = ElfSymbolTable(lib)
+    sidecar = store.get(read_build_id(lib))
+    assert len(sidecar) == len(table)
+    end = table.addrs[-1] + table.sizes[-1]
+    for addr in [0, table.addrs[0] - 1, *table.addrs, *(a + 3 for a in table.addrs), end - 1, end, end + 64]:
+        assert sidecar.lookup(addr) == table.lookup(addr)
+    assert sidecar.symbolize(table.addrs[5] + 2, line_info=False) == f'{table.name(5)}+2'
+    store.close()
+
+
+def test_parser_resolves_from_sidecars_without_tools(workload, tmp_path):
+    store = SidecarStore(str(tmp_path / 'sidecars'))
+    compile_symbols(workload['symbols_dir'], store, line_table=False, persistent=False)
+    table = ElfSymbolTable(os.path.join(workload['symbols_dir'], 'arm64-v8a', 'libsynth2.so'))
+    frames = _frames(table, 'libsynth2.so')
+    with LogcatParser(symbols_dir=workload['symbols_dir'], line_info=False, persistent_cache=False) as parser:
+        expected = parser.symbolicate_frames(frames)
+
+    stats = Stats()
+    with LogcatParser(symbols_dir=workload['symbols_dir'], line_info=False, persistent_cache=False,
+                      sidecar_dir=store.directory, stats=stats) as parser:
+        assert parser.symbolicate_frames(frames) == expected
+    assert stats.counters['sidecar_addresses'] == len(frames)
+    assert 'elf_load' not in stats.stages
+
+    # 只有函数表的边车不能给出源码位置，仍由 addr2line 处理
+    stats = Stats()
+    with LogcatParser(symbols_dir=workload['symbols_dir'], ndk_path=workload['ndk_path'], persistent_cache=False,
+                      sidecar_dir=store.directory, stats=stats) as parser:
+        assert all(' at ' in text for text in parser.symbolicate_frames(frames))
+    assert stats.subprocesses['llvm-addr2line']['spawns'] == 1
+    assert 'sidecar_addresses' not in stats.counters
+
+
+def test_damaged_sidecar_is_ignored_and_recompiled(workload, tmp_path):
+    symbols = tmp_path / 'symbols'
+    shutil.copytree(os.path.join(workload['symbols_dir'], 'arm64-v8a'), symbols / 'arm64-v8a')
+    store = SidecarStore(str(tmp_path / 'sidecars'))
+    compile_symbols(str(symbols), store, persistent=False)
+    build_id = read_build_id(str(symbols / 'arm64-v8a' / 'libsynth0.so'))
+    with open(store.path(build_id), 'r+b') as f:
+        f.truncate(100)
+
+    assert store.get(build_id) is None
+    assert not store.is_current(build_id, line_table=False)
+    assert compile_symbols(str(symbols), store, persistent=False) == (1, 3, 0)
+    # 重新编译后文件签名变化，重新映射
+    assert len(store.get(build_id)) == len(ElfSymbolTable(str(symbols / 'arm64-v8a' / 'libsynth0.so')))
+    store.close()
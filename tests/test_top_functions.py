@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from benchmarks.fake_elf import write_elf
+from src import top_functions
+from src.ndk_logcat_parser import Frame, LogcatParser
+from src.top_functions import TopFunctions, add_file
+
+LIB = '/data/app/~~com.example/lib/arm64/libtiny.so'
+# beta 的大小为 0，延伸到下一个符号 gamma
+FUNCTIONS = [('alpha', 0x1000, 0x100), ('beta', 0x1200, 0), ('gamma', 0x1300, 0x80)]
+
+
+def _aggregate(top: TopFunctions, with_numpy: bool) -> list:
+    with pytest.MonkeyPatch.context() as patch:
+        if not with_numpy:
+            patch.setattr(top_functions, 'numpy', None)
+        return [entry.to_dict() for entry in top.aggregate()]
+
+
+@pytest.fixture
+def tiny_parser(tmp_path):
+    os.makedirs(tmp_path / 'arm64-v8a')
+    write_elf(str(tmp_path / 'arm64-v8a' / 'libtiny.so'), FUNCTIONS, bytes(range(20)))
+    with LogcatParser(symbols_dir=str(tmp_path), line_info=False, persistent_cache=False) as parser:
+        yield parser
+
+
+def test_numpy_and_bisect_paths_agree_on_edge_cases(tiny_parser):
+    pytest.importorskip('numpy')
+    top = TopFunctions(tiny_parser)
+    top.add_frames([Frame(0, 0x1010, LIB), Frame(1, 0x10ff, LIB), Frame(2, 0x1250, LIB)])
+    # 0x1150 在空隙中，0xf00 在第一个函数之前，0x2000 在最后一个函数之后
+    top.add_frames([Frame(0, 0x1150, LIB, symbol='from_tombstone+16'), Frame(1, 0xf00, LIB),
+                    Frame(2, 0x1010, LIB), Frame(3, 0x2000, LIB, symbol='from_tombstone+4')])
+    top.add_frames([Frame(0, 0x1300, LIB), Frame(1, 0x4000, '[anon:dalvik-jit-code-cache]')])
+
+    with_numpy = _aggregate(top, True)
+    assert _aggregate(top, False) == with_numpy
+    counts = {entry['function']: (entry['hits'], entry['crashes'], entry['top_frame']) for entry in with_numpy}
+    assert counts == {
+        'alpha': (3, 2, 1),
+        'from_tombstone': (2, 1, 1),
+        'beta': (1, 1, 0),
+        'gamma': (1, 1, 1),
+        None: (1, 1, 0),
+    }
+    assert top.frames == 8
+
+
+def test_numpy_and_bisect_paths_agree_on_workload(workload):
+    pytest.importorskip('numpy')
+    with LogcatParser(symbols_dir=workload['symbols_dir'], line_info=False, persistent_cache=False) as parser:
+        top = TopFunctions(parser)
+        add_file(top, workload['logcat'])
+        for dump in workload['dumps']:
+            add_file(top, dump)
+        with_numpy = _aggregate(top, True)
+        assert _aggregate(top, False) == with_numpy
+    assert top.crashes == workload['logcat_stats']['crashes'] + len(workload['dumps'])
+    assert sum(entry['hits'] for entry in with_numpy) == top.frames
+    assert any(entry['function'] and entry['function'].startswith('synth') for entry in with_numpy)